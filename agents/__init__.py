@@ -1,6 +1,6 @@
 from .interviewer_agent import InterviewerAgent
 from .observer_agent import ObserverAgent
-from .feedback_agent import FeedbackAgent
+from .feedback_agent import FeedbackAgent, FeedbackParseError
 from .rag_agent import RAGAgent
 
-__all__ = ['InterviewerAgent', 'ObserverAgent', 'FeedbackAgent', 'RAGAgent']
\ No newline at end of file
+__all__ = ['InterviewerAgent', 'ObserverAgent', 'FeedbackAgent', 'FeedbackParseError', 'RAGAgent']
\ No newline at end of file
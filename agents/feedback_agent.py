@@ -1,11 +1,73 @@
 
 import json
-from config import MISTRAL_CLIENT
+from llm_cache import complete
+from position_resolver import resolve_category
+from token_budget import count_tokens, pack_transcript
+
+
+class FeedbackParseError(ValueError):
+    """Ответ модели не разобрался как фидбэк (нет JSON или неверная структура)"""
+
+
+def extract_json(content):
+    """JSON-объект из ответа модели (текст вокруг фигурных скобок отбрасывается)"""
+    start, end = content.find('{'), content.rfind('}') + 1
+    if start == -1 or end == 0:
+        raise FeedbackParseError("Не удалось найти JSON в ответе Mistral")
+    try:
+        return json.loads(content[start:end])
+    except ValueError as e:
+        raise FeedbackParseError(f"Некорректный JSON в ответе Mistral: {e}") from e
+
+
+FEEDBACK_SYSTEM_PROMPT = "Ты эксперт по оценке IT специалистов. Анализируй ответы и давай структурированный фидбэк в JSON формате."
+
+FEEDBACK_JSON_FORMAT = """{
+  "verdict": {
+    "grade": "Junior / Middle / Senior",
+    "recommendation": "Hire / No Hire / Strong Hire",
+    "confidence_score": "число от 0 до 100"
+  },
+  "hard_skills": {
+    "confirmed_skills": ["список тем, где кандидат дал точные ответы"],
+    "knowledge_gaps": ["список тем, где были ошибки или кандидат сказал 'не знаю'"],
+    "corrections": ["правильные ответы на вопросы, которые кандидат завалил"]
+  },
+  "soft_skills": {
+    "clarity": "Low / Medium / High",
+    "honesty": "Low / Medium / High", 
+    "engagement": "Low / Medium / High"
+  },
+  "roadmap": {
+    "topics": ["конкретные темы/технологии для изучения"],
+    "resources": ["ссылки на документацию или статьи"]
+  }
+}"""
+
+TURN_JSON_FORMAT = """{
+  "topic": "тема вопроса (2-4 слова)",
+  "score": "число от 0 до 10",
+  "strengths": ["что кандидат знает верно"],
+  "gaps": ["ошибки и пробелы"],
+  "correction": "краткий правильный ответ, если были ошибки, иначе пустая строка",
+  "clarity": "Low / Medium / High",
+  "honesty": "Low / Medium / High",
+  "engagement": "Low / Medium / High"
+}"""
 
 
 class FeedbackAgent:
-    def generate(self, interview_log, position, user_responses=None):
-        """Генерация структурированного фидбэка с выводом в консоль"""
+    def __init__(self, knowledge_base=None):
+        # База знаний нужна только для определения категории позиции по эмбеддингам
+        self.knowledge_base = knowledge_base
+
+    def generate(self, interview_log, position, user_responses=None, console=True, strict=False, use_cache=True):
+        """Генерация структурированного фидбэка с выводом в консоль.
+
+        strict=True — ошибки API и ответ без JSON пробрасываются как исключения
+        вместо резервного фидбэка (нужно для повторных попыток в rescore.py).
+        use_cache=False — ответ запрашивается у модели заново, мимо кэша.
+        """
         user_responses = user_responses or []
 
         # Получаем имя кандидата из лога
@@ -22,6 +84,8 @@ class FeedbackAgent:
                     "answer": turn["user_message"]
                 })
 
+        transcript, transcript_stats = self._format_qa_pairs(qa_pairs)
+
         prompt = f"""Ты - эксперт по оценке IT специалистов. Проанализируй интервью и создай детализированный фидбэк.
 
 КОНТЕКСТ:
@@ -30,79 +94,156 @@ class FeedbackAgent:
 - Количество вопросов: {len(qa_pairs)}
 
 ВОПРОСЫ И ОТВЕТЫ:
-{self._format_qa_pairs(qa_pairs)}
+{transcript}
 
 Проанализируй ответы кандидата и верни фидбэк в формате JSON со следующей структурой:
-{{
-  "verdict": {{
-    "grade": "Junior / Middle / Senior",
-    "recommendation": "Hire / No Hire / Strong Hire",
-    "confidence_score": "число от 0 до 100"
-  }},
-  "hard_skills": {{
-    "confirmed_skills": ["список тем, где кандидат дал точные ответы"],
-    "knowledge_gaps": ["список тем, где были ошибки или кандидат сказал 'не знаю'"],
-    "corrections": ["правильные ответы на вопросы, которые кандидат завалил"]
-  }},
-  "soft_skills": {{
-    "clarity": "Low / Medium / High",
-    "honesty": "Low / Medium / High", 
-    "engagement": "Low / Medium / High"
-  }},
-  "roadmap": {{
-    "topics": ["конкретные темы/технологии для изучения"],
-    "resources": ["ссылки на документацию или статьи"]
-  }}
-}}
+{FEEDBACK_JSON_FORMAT}
 
 Важно: Для каждого knowledge_gap предоставь краткий правильный ответ в corrections."""
 
+        return self._request_feedback(prompt, transcript_stats, candidate_name, position, qa_pairs,
+                                      console, strict, use_cache)
+
+    def assess_turn(self, question, answer, position):
+        """Map-шаг: оценка одного ответа сразу после хода (выполняется в фоне во время интервью)"""
+        prompt = f"""Оцени ответ кандидата на позицию {position}.
+
+Вопрос: {question}
+Ответ: {answer}
+
+Верни JSON:
+{TURN_JSON_FORMAT}"""
+
         try:
-            response = MISTRAL_CLIENT.chat.complete(
+            content = complete(
+                "feedback",
                 model="mistral-large-latest",
                 messages=[
-                    {"role": "system",
-                     "content": "Ты эксперт по оценке IT специалистов. Анализируй ответы и давай структурированный фидбэк в JSON формате."},
+                    {"role": "system", "content": FEEDBACK_SYSTEM_PROMPT},
                     {"role": "user", "content": prompt}
                 ],
-                temperature=0.3
+                temperature=0.3,
+                response_format={"type": "json_object"},
+                validate=extract_json
             )
+            assessment = extract_json(content)
+        except Exception as e:
+            print(f"⚠️ Не удалось оценить ответ: {e}")
+            # Ход без оценки всё равно попадёт в reduce — по исходному тексту
+            assessment = {"topic": "", "score": None, "gaps": [], "strengths": []}
+
+        assessment.update(question=question, answer=answer)
+        return assessment
 
-            content = response.choices[0].message.content.strip()
+    def reduce(self, interview_log, position, assessments, console=True, strict=False, use_cache=True):
+        """Reduce-шаг: итоговый фидбэк по оценкам отдельных ходов.
 
-            # Извлекаем JSON из ответа
-            json_start = content.find('{')
-            json_end = content.rfind('}') + 1
+        Промпт содержит только краткие оценки, поэтому время финального вызова
+        почти не зависит от длины интервью.
+        """
+        candidate_name = interview_log.get("participant_name", "Кандидат")
+        qa_pairs = [{"question": a.get("question", ""), "answer": a.get("answer", "")} for a in assessments]
+
+        lines = []
+        for i, assessment in enumerate(assessments, 1):
+            # score=None — оценка хода не удалась (assess_turn), по ответу судит reduce
+            score = assessment.get("score")
+            score_text = "оценки нет" if score is None else f"оценка {score}/10"
+            lines.append(f"Ход {i}: тема «{assessment.get('topic') or assessment.get('question', '')[:80]}», "
+                         f"{score_text}")
+            for field, title in (("strengths", "верно"), ("gaps", "пробелы")):
+                if assessment.get(field):
+                    lines.append(f"  {title}: {'; '.join(map(str, assessment[field]))}")
+            if assessment.get("correction"):
+                lines.append(f"  правильный ответ: {assessment['correction']}")
+            if score is None:
+                lines.append(f"  ответ (без оценки): {assessment.get('answer', '')[:300]}")
+            soft = [f"{k}={assessment[k]}" for k in ("clarity", "honesty", "engagement") if assessment.get(k)]
+            if soft:
+                lines.append(f"  коммуникация: {', '.join(soft)}")
+        summary = "\n".join(lines) or "Нет оценённых ответов."
+
+        prompt = f"""Ты - эксперт по оценке IT специалистов. По оценкам отдельных ответов составь итоговый фидбэк.
 
-            if json_start != -1 and json_end != 0:
-                json_str = content[json_start:json_end]
-                feedback_data = json.loads(json_str)
+КОНТЕКСТ:
+- Кандидат: {candidate_name}
+- Позиция: {position}
+- Количество вопросов: {len(assessments)}
 
-                # Валидация и форматирование данных
-                feedback_data = self._validate_and_format_feedback(feedback_data)
+ОЦЕНКИ ОТВЕТОВ:
+{summary}
 
-                # Добавляем расширенные ресурсы
-                feedback_data["roadmap_with_resources"] = self._add_learning_resources(
-                    feedback_data.get("hard_skills", {}).get("knowledge_gaps", []),
-                    position
-                )
+Верни фидбэк в формате JSON со следующей структурой:
+{FEEDBACK_JSON_FORMAT}
 
-                # Выводим фидбэк в консоль
-                self._print_feedback_to_console(candidate_name, position, feedback_data)
+Важно: Для каждого knowledge_gap предоставь краткий правильный ответ в corrections."""
 
-                return feedback_data
-            else:
-                print("⚠️ Не удалось найти JSON в ответе Mistral.")
-                feedback_data = self._get_default_feedback(position, qa_pairs, candidate_name)
+        stats = {"turns": len(assessments), "compressed_turns": 0, "tokens": count_tokens(summary),
+                 "mode": "map_reduce"}
+        feedback_data = self._request_feedback(prompt, stats, candidate_name, position, qa_pairs, console, strict,
+                                               use_cache)
+        feedback_data["turn_assessments"] = assessments
+        return feedback_data
+
+    def _request_feedback(self, prompt, transcript_stats, candidate_name, position, qa_pairs, console, strict,
+                          use_cache=True):
+        """Вызов модели, разбор JSON и резервный фидбэк при ошибке"""
+        messages = [
+            {"role": "system", "content": FEEDBACK_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ]
+        # Размер промпта сохраняется в фидбэке — стоимость вызова видна в логах
+        prompt_stats = dict(transcript_stats, prompt_tokens=sum(count_tokens(m["content"]) for m in messages))
+        if console:
+            print(f"📏 Промпт фидбэка: {prompt_stats['prompt_tokens']} токенов, "
+                  f"ходов {prompt_stats['turns']}, сжато {prompt_stats['compressed_turns']}")
+
+        try:
+            # Ответ, который не разбирается как фидбэк, не попадает в кэш
+            content = complete(
+                "feedback",
+                model="mistral-large-latest",
+                messages=messages,
+                temperature=0.3,
+                validate=self._parse_feedback,
+                use_cache=use_cache
+            )
+            feedback_data = self._parse_feedback(content)
+
+            # Добавляем расширенные ресурсы
+            feedback_data["roadmap_with_resources"] = self._add_learning_resources(
+                feedback_data.get("hard_skills", {}).get("knowledge_gaps", []),
+                position
+            )
+
+            feedback_data["prompt_stats"] = prompt_stats
+
+            # Выводим фидбэк в консоль
+            if console:
                 self._print_feedback_to_console(candidate_name, position, feedback_data)
-                return feedback_data
+
+            return feedback_data
 
         except Exception as e:
-            print(f"Ошибка генерации фидбэка: {e}")
+            if strict:
+                raise
+            print(f"⚠️ Ошибка генерации фидбэка: {e}")
             feedback_data = self._get_default_feedback(position, qa_pairs, candidate_name)
-            self._print_feedback_to_console(candidate_name, position, feedback_data)
+            feedback_data["prompt_stats"] = prompt_stats
+            if console:
+                self._print_feedback_to_console(candidate_name, position, feedback_data)
             return feedback_data
 
+    def _parse_feedback(self, content):
+        """JSON фидбэка из ответа модели, с недостающими полями; FeedbackParseError — если не разобрался"""
+        feedback_data = extract_json(content.strip())
+        if not isinstance(feedback_data, dict):
+            raise FeedbackParseError("Фидбэк в ответе Mistral не является JSON-объектом")
+        try:
+            return self._validate_and_format_feedback(feedback_data)
+        except (AttributeError, KeyError, TypeError) as e:
+            raise FeedbackParseError(f"Неверная структура фидбэка: {e}") from e
+
     def _print_feedback_to_console(self, candidate_name, position, feedback_data):
         """Выводит фидбэк в консоль в красивом формате"""
         print("\n" + "=" * 60)
@@ -209,16 +350,8 @@ class FeedbackAgent:
         return feedback_data
 
     def _format_qa_pairs(self, qa_pairs):
-        """Форматирует вопросы и ответы для промпта"""
-        if not qa_pairs:
-            return "Нет вопросов и ответов в логе."
-
-        formatted = []
-        for i, pair in enumerate(qa_pairs[:6], 1):  # Берем первые 6 пар
-            formatted.append(f"Вопрос {i}: {pair['question'][:200]}")
-            formatted.append(f"Ответ {i}: {pair['answer'][:200]}")
-            formatted.append("")
-        return "\n".join(formatted)
+        """Все вопросы и ответы для промпта в пределах Config.FEEDBACK_TOKEN_BUDGET"""
+        return pack_transcript(qa_pairs)
 
     def _add_learning_resources(self, knowledge_gaps, position):
         """Добавляет расширенные ссылки на обучающие материалы"""
@@ -284,20 +417,8 @@ class FeedbackAgent:
         return roadmap_with_resources
 
     def _detect_category(self, position):
-        """Определяет IT категорию позиции"""
-        pos_lower = position.lower()
-        if any(word in pos_lower for word in ['ml', 'машин', 'data', 'ai', 'нейрон']):
-            return 'ml'
-        elif any(word in pos_lower for word in ['backend', 'бэкенд', 'api', 'server', 'java', 'python']):
-            return 'backend'
-        elif any(word in pos_lower for word in ['frontend', 'фронтенд', 'react', 'vue', 'javascript']):
-            return 'frontend'
-        elif any(word in pos_lower for word in ['qa', 'тестиров', 'test', 'quality']):
-            return 'qa'
-        elif any(word in pos_lower for word in ['devops', 'sre', 'инфраструктур', 'docker']):
-            return 'devops'
-        else:
-            return 'backend'
+        """Определяет IT категорию позиции (по умолчанию backend — для него больше всего ресурсов)"""
+        return resolve_category(position, self.knowledge_base, default='backend')
 
     def _get_default_feedback(self, position, qa_pairs, candidate_name):
         """Резервный фидбэк при ошибке"""
@@ -1,6 +1,10 @@
 
-from config import MISTRAL_CLIENT
-import re
+from config import Config
+from llm_cache import complete
+from llm_client import chat_stream
+from question_sanitizer import StreamingQuestionCleaner, sanitize_question
+from tracing import current
+import time
 
 
 class InterviewerAgent:
@@ -8,11 +12,18 @@ class InterviewerAgent:
         self.name = name
         self.position = position
         self.asked_questions = []
+        self.knowledge_base = knowledge_base
 
-    def generate_question(self, instruction, question_count=1, asked_questions=None):
-        """Генерация вопроса БЕЗ пояснений"""
+    def generate_question(self, instruction, question_count=1, asked_questions=None, on_token=None, record=True,
+                          recent_answers=None):
+        """Генерация вопроса БЕЗ пояснений (потоково, если передан on_token), уже очищенного.
+
+        record=False — вопрос не попадает в asked_questions (спекулятивные варианты)
+        recent_answers — последние ответы кандидата: по ним выбирается контекст позиции из базы знаний
+        """
         if asked_questions:
             self.asked_questions = asked_questions
+        knowledge = self._position_context(recent_answers)
 
         prompt = f"""Ты - IT интервьюер. Сгенерируй ОДИН технический вопрос.
 
@@ -20,7 +31,7 @@ class InterviewerAgent:
 - Позиция: {self.position}
 - Номер вопроса: {question_count}
 - Инструкция Observer: {instruction}
-
+{knowledge}
 ПРАВИЛА:
 1. генерируй вопрос и поддержку кандидату
 2. Максимум 2 предложения
@@ -33,33 +44,78 @@ class InterviewerAgent:
 "Какие методы оптимизации вы применяли при работе с большими данными?"
 
 """
+        messages = [
+            {"role": "system",
+             "content": "Ты строгий интервьюер. Возвращай ТОЛЬКО вопрос, без пояснений, без форматирования, без маркеров."},
+            {"role": "user", "content": prompt}
+        ]
+
+        if on_token:
+            question = self._stream_question(messages, on_token)
+        else:
+            content = complete(
+                "interviewer",
+                model="mistral-large-latest",
+                messages=messages,
+                temperature=0.7
+            )
+            question = sanitize_question(content)
+
+        if record:
+            self.asked_questions.append(question)
 
-        response = MISTRAL_CLIENT.chat.complete(
+        return question
+
+    def _position_context(self, recent_answers):
+        """Документы базы знаний для позиции, ближайшие к последним ответам (пустая строка без базы)"""
+        if self.knowledge_base is None:
+            return ""
+        answers = (recent_answers or [])[-Config.POSITION_CONTEXT_ANSWERS:]
+        context = self.knowledge_base.get_position_context(self.position, answers,
+                                                           limit=Config.POSITION_CONTEXT_DOCS)
+        return f"\n{context}\n" if context else ""
+
+    def _stream_question(self, messages, on_token):
+        """Отдаёт токены вопроса по мере генерации и обрывает поток на стоп-маркере"""
+        cleaner = StreamingQuestionCleaner()
+        raw_text = ""
+
+        with chat_stream(
             model="mistral-large-latest",
-            messages=[
-                {"role": "system",
-                 "content": "Ты строгий интервьюер. Возвращай ТОЛЬКО вопрос, без пояснений, без форматирования, без маркеров."},
-                {"role": "user", "content": prompt}
-            ],
+            messages=messages,
             temperature=0.7
-        )
-
-        question = response.choices[0].message.content.strip()
-
-        # Очищаем от возможных кавычек и маркеров
-        question = question.replace('"', '').replace("'", "")
-        question = question.replace('*', '').replace('**', '')
-        question = question.replace('---', '').replace('___', '')
-        question = re.sub(r'^\d+[\.\)]\s*', '', question)  # Убираем нумерацию
-
-        # Убираем всё после пояснений
-        for stop_word in ['Почему', 'Например', 'Задача:', 'Цель:', 'Пример:', 'Если', '//', '---']:
-            if stop_word in question:
-                question = question.split(stop_word)[0].strip()
-
-        self.asked_questions.append(question)
-
-        return question
+        ) as stream:
+            started = time.perf_counter()
+            for event in stream:
+                usage = getattr(event.data, "usage", None)
+                if usage is not None:
+                    current().set("prompt_tokens", usage.prompt_tokens)
+                    current().set("completion_tokens", usage.completion_tokens)
+                delta = event.data.choices[0].delta.content
+                if not isinstance(delta, str) or not delta:
+                    continue
+
+                if not raw_text:
+                    current().set("first_token_ms", round((time.perf_counter() - started) * 1000, 1))
+                raw_text += delta
+                text = cleaner.feed(delta)
+                if text:
+                    on_token(text)
+                if cleaner.stopped:
+                    # Выход из with закрывает соединение — лишние токены не генерируются
+                    break
+
+        text = cleaner.finish()
+        if text:
+            on_token(text)
+
+        if not cleaner.question:
+            # Поток не дал ничего похожего на вопрос — чистим целиком, как обычно
+            question = sanitize_question(raw_text)
+            on_token(question)
+            return question
+
+        return cleaner.question
 
     def handle_offtopic(self, user_input):
         """Обработка оффтопика"""
@@ -68,7 +124,8 @@ class InterviewerAgent:
         Одним предложением вежливо направь к теме
         """
 
-        response = MISTRAL_CLIENT.chat.complete(
+        content = complete(
+            "interviewer",
             model="mistral-large-latest",
             messages=[
                 {"role": "system", "content": "Ты вежливый интервьюер. Возвращай к теме двумя предложением."},
@@ -76,4 +133,4 @@ class InterviewerAgent:
             ]
         )
 
-        return response.choices[0].message.content.strip()
\ No newline at end of file
+        return content.strip()
\ No newline at end of file
@@ -1,36 +1,69 @@
+import json
+from llm_cache import complete
 
-from config import MISTRAL_CLIENT
+DIFFICULTY_INSTRUCTIONS = {
+    "harder": "Задай более сложный вопрос.",
+    "same": "Задай вопрос того же уровня сложности.",
+    "simpler": "Задай более простой вопрос об основах.",
+    "redirect": "Вежливо верни кандидата к теме собеседования.",
+}
 
 
 class ObserverAgent:
     def analyze(self, user_response, position, question):
-        """Анализ ответа кандидата с определением сложности следующего вопроса"""
+        """Анализ ответа одним вызовом в JSON режиме: оценка, направление сложности,
+        инструкция для следующего вопроса и мысли для лога"""
 
         prompt = f"""Ты - Observer на IT собеседовании для позиции {position}.
 
 ВОПРОС ИНТЕРВЬЮЕРА: "{question}"
 ОТВЕТ КАНДИДАТА: "{user_response}"
 
-Проанализируй ответ и дай направление интервьюеру:
+Проанализируй ответ и верни JSON:
+{{
+  "score": число от 0 до 10,
+  "difficulty": "harder" (ответ глубокий, с примерами) / "same" (знает основы) / "simpler" (ответ слабый) / "redirect" (ответ не по теме),
+  "instruction": "инструкция интервьюеру для следующего вопроса: похвала или поддержка и конкретная тема (2 предложения)",
+  "thoughts": "мысли интервьюера для лога: качество ответа и почему следующий вопрос такой сложности (2 предложения)"
+}}
 
-1. Оцени качество ответа по шкале 1-10
-2. Определи, нужно ли повысить или понизить сложность следующего вопроса
-3. Дай конкретную рекомендацию по теме следующего вопроса
+Примеры instruction:
+- "Кандидат показал глубокое понимание с примерами. Похвали его и задай более сложный вопрос о микросервисной архитектуре."
+- "Ответ поверхностный. Поддержи кандидата и задай более простой вопрос о базовых концепциях."
+- "Ответ не по теме. Вежливо верни к теме {position}.\""""
 
-Примеры правильных рекомендаций:
-- "Ответ отличный (9/10). Кандидат показал глубокое понимание с примерами. Задай более сложный вопрос о микросервисной архитектуре."
-- "Ответ хороший (7/10). Кандидат знает основы, но без деталей. Задай вопрос средней сложности о REST API."
-- "Ответ слабый (4/10). Кандидат неуверен в теме. Задай более простой вопрос о базовых концепциях."
-- "Ответ не по теме. Вежливо верни к теме {position}."
-
-Твой анализ (2 предложения):"""
-
-        response = MISTRAL_CLIENT.chat.complete(
+        content = complete(
+            "observer",
             model="mistral-large-latest",
             messages=[
-                {"role": "system", "content": "Ты аналитик собеседований. Оценивай ответы и давай конкретные рекомендации по сложности."},
+                {"role": "system", "content": "Ты аналитик собеседований. Оценивай ответы и давай конкретные рекомендации по сложности. Отвечай только JSON."},
                 {"role": "user", "content": prompt}
-            ]
+            ],
+            response_format={"type": "json_object"}
         )
 
-        return response.choices[0].message.content.strip()
\ No newline at end of file
+        return self._parse_analysis(content)
+
+    def _parse_analysis(self, content):
+        """Приводит ответ модели к полям score / difficulty / instruction / thoughts"""
+        try:
+            data = json.loads(content[content.find('{'):content.rfind('}') + 1])
+        except ValueError:
+            # Модель вернула не JSON — текст всё равно годится как инструкция
+            data = {"instruction": content.strip()}
+
+        try:
+            score = max(0, min(10, int(float(data.get("score")))))
+        except (TypeError, ValueError):
+            score = None
+
+        difficulty = str(data.get("difficulty", "")).strip().lower()
+        if difficulty not in DIFFICULTY_INSTRUCTIONS:
+            difficulty = "same"
+
+        return {
+            "score": score,
+            "difficulty": difficulty,
+            "instruction": str(data.get("instruction") or "").strip() or DIFFICULTY_INSTRUCTIONS[difficulty],
+            "thoughts": str(data.get("thoughts") or "").strip(),
+        }
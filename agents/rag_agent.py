@@ -1,27 +1,83 @@
-
-from config import MISTRAL_CLIENT
+import numpy as np
+from config import Config, MISTRAL_CLIENT
+from position_resolver import resolve_category
+from retrieval_cache import RetrievalCache
+from tracing import span
 
 
 class RAGAgent:
     """Агент с доступом к базе знаний через RAG"""
 
-    def __init__(self, knowledge_base):
+    def __init__(self, knowledge_base, cache=None):
         self.kb = knowledge_base
+        # Кэш можно передать общий для нескольких агентов над одной базой знаний
+        self.cache = cache if cache is not None else RetrievalCache()
 
     def retrieve_context(self, position, user_response, topic=None):
         """Извлекает контекст из базы знаний для вопроса интервьюера"""
+        return self.retrieve_contexts(position, user_response, [topic])[0]
+
+    def retrieve_contexts(self, position, user_response, topics):
+        """Контекст сразу по нескольким темам: один проход эмбеддингов и один поиск"""
         # Определяем IT категорию по позиции
         category = self._detect_category(position)
 
-        # Формируем запрос
-        if topic:
-            query = f"{topic} тестирование проверка {user_response}"
-        else:
-            query = f"{position} {user_response}"
+        # Формируем запросы
+        queries = [self._build_query(position, user_response, topic) for topic in topics]
 
         # Ищем релевантные знания
-        results = self.kb.search(query, category=category, k=2)
+        batch_results = self._search_cached(queries, category=category, k=2)
+
+        return [self._format_context(results) for results in batch_results]
+
+    def _search_cached(self, queries, category, k):
+        """Поиск через кэш: кодируются и ищутся только запросы, которых нет в кэше.
+
+        Семантический уровень кэша — только для режима "vector": в "lexical" и
+        "hybrid" близкий по смыслу запрос может совпасть с другими терминами BM25.
+        В режиме "lexical" запросы не кодируются вовсе.
+        """
+        mode = Config.RETRIEVAL_MODE
+        with span("rag.retrieve", queries=len(queries)) as trace:
+            scope = (category, k, mode)
+            results = [self.cache.get_exact(query, scope) for query in queries]
+
+            missing = [i for i, result in enumerate(results) if result is None]
+            if not missing:
+                trace.set("cache_hits", len(queries))
+                return results
+
+            if mode == "lexical":
+                embeddings = [None] * len(missing)
+            else:
+                embeddings = self.kb.encode([queries[i] for i in missing])
+            to_search = []
+            for i, embedding in zip(missing, embeddings):
+                if mode == "vector":
+                    results[i] = self.cache.get_similar(embedding, scope)
+                else:
+                    self.cache.record_miss()
+                if results[i] is None:
+                    to_search.append((i, embedding))
+
+            trace.set("cache_hits", len(queries) - len(to_search))
+            trace.set("cache_misses", len(to_search))
+            if to_search:
+                query_embeddings = None if mode == "lexical" else np.stack([e for _, e in to_search])
+                found = self.kb.search_encoded([queries[i] for i, _ in to_search], query_embeddings,
+                                               category=category, k=k, mode=mode)
+                for (i, embedding), hits in zip(to_search, found):
+                    results[i] = hits
+                    self.cache.put(queries[i], scope, embedding, hits)
+
+            return results
+
+    def _build_query(self, position, user_response, topic=None):
+        if topic:
+            return f"{topic} тестирование проверка {user_response}"
+        return f"{position} {user_response}"
 
+    def _format_context(self, results):
         if results:
             context_items = []
             for r in results:
@@ -35,17 +91,4 @@ class RAGAgent:
 
     def _detect_category(self, position):
         """Определяет IT категорию позиции"""
-        pos_lower = position.lower()
-
-        if any(word in pos_lower for word in ['backend', 'бэкенд', 'api', 'server']):
-            return 'backend'
-        elif any(word in pos_lower for word in ['frontend', 'фронтенд', 'javascript', 'react', 'vue']):
-            return 'frontend'
-        elif any(word in pos_lower for word in ['ml', 'машин', 'data', 'ai', 'нейрон']):
-            return 'ml'
-        elif any(word in pos_lower for word in ['devops', 'sre', 'инфраструктур', 'docker']):
-            return 'devops'
-        elif any(word in pos_lower for word in ['qa', 'тестиров', 'test', 'quality']):
-            return 'qa'
-        else:
-            return 'general'
\ No newline at end of file
+        return resolve_category(position, self.kb)
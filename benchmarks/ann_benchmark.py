@@ -0,0 +1,120 @@
+"""Recall и задержка ANN индексов (HNSW, IVF-PQ) относительно точного IndexFlatL2.
+
+Корпус синтетический (кластеры в пространстве размерности эмбеддингов MiniLM),
+поэтому бенчмарк не требует модели и воспроизводим между коммитами.
+Пример: python benchmarks/ann_benchmark.py --docs 200000 --queries 500
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from knowledge_base import build_faiss_index, rerank_exact
+
+
+def make_corpus(n_docs, n_queries, dimension, n_categories, seed=0):
+    """Кластеризованные векторы + запросы рядом с документами"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(1, n_docs // 500), dimension)).astype('float32')
+    assignment = rng.integers(0, len(centers), size=n_docs)
+    docs = centers[assignment] + 0.3 * rng.normal(size=(n_docs, dimension)).astype('float32')
+    queries = docs[rng.integers(0, n_docs, size=n_queries)] + 0.1 * rng.normal(
+        size=(n_queries, dimension)).astype('float32')
+    categories = rng.integers(0, n_categories, size=n_docs)
+    return docs.astype('float32'), queries.astype('float32'), categories
+
+
+def search_params(backend, ids=None):
+    import faiss
+
+    selector = faiss.IDSelectorBatch(ids) if ids is not None else None
+    if backend == "hnsw":
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=Config.HNSW_EF_SEARCH)
+    if backend == "ivfpq":
+        return faiss.SearchParametersIVF(sel=selector, nprobe=Config.IVF_NPROBE)
+    return faiss.SearchParameters(sel=selector)
+
+
+def run_queries(index, queries, k, params, rerank_embeddings=None):
+    """Поиск по одному запросу (как в интервью), возвращает ID и задержки в мс"""
+    labels = np.empty((len(queries), k), dtype='int64')
+    latencies = []
+    fetch_k = k * Config.IVF_RERANK_FACTOR if rerank_embeddings is not None else k
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        _, found = index.search(query[None, :], fetch_k, params=params)
+        if rerank_embeddings is not None:
+            _, found = rerank_exact(query[None, :], found, rerank_embeddings, k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        labels[i] = found[0]
+    return labels, np.array(latencies)
+
+
+def recall(found, truth):
+    hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall vs latency для FAISS индексов базы знаний")
+    parser.add_argument("--docs", type=int, default=50_000)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--categories", type=int, default=6)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--backends", default="flat,hnsw,ivfpq")
+    parser.add_argument("--json", dest="json_path", default=None)
+    args = parser.parse_args()
+
+    docs, queries, categories = make_corpus(args.docs, args.queries, args.dimension, args.categories)
+    filter_ids = np.flatnonzero(categories == 0).astype('int64')
+
+    results = {"docs": args.docs, "queries": args.queries, "k": args.k, "backends": {}}
+    truth = truth_filtered = None
+
+    for backend in args.backends.split(","):
+        start = time.perf_counter()
+        index = build_faiss_index(docs, backend)
+        build_s = time.perf_counter() - start
+
+        # IVF-PQ переранжируется по эмбеддингам так же, как в ITKnowledgeBase
+        rerank = docs if backend == "ivfpq" else None
+        found, latencies = run_queries(index, queries, args.k, search_params(backend), rerank)
+        found_filtered, latencies_filtered = run_queries(
+            index, queries, args.k, search_params(backend, filter_ids), rerank)
+
+        if truth is None:
+            if backend != "flat":
+                exact = build_faiss_index(docs, "flat")
+                truth, _ = run_queries(exact, queries, args.k, search_params("flat"))
+                truth_filtered, _ = run_queries(exact, queries, args.k, search_params("flat", filter_ids))
+            else:
+                truth, truth_filtered = found, found_filtered
+
+        stats = {
+            "build_s": round(build_s, 2),
+            "recall_at_k": round(recall(found, truth), 4),
+            "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+            "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+            "filtered_recall_at_k": round(recall(found_filtered, truth_filtered), 4),
+            "filtered_p50_ms": round(float(np.percentile(latencies_filtered, 50)), 3),
+            "filtered_p95_ms": round(float(np.percentile(latencies_filtered, 95)), 3),
+        }
+        results["backends"][backend] = stats
+        print(f"{backend:6} build {stats['build_s']:>7}s | recall@{args.k} {stats['recall_at_k']:.3f} "
+              f"p50 {stats['p50_ms']:.3f}ms p95 {stats['p95_ms']:.3f}ms | "
+              f"filtered recall {stats['filtered_recall_at_k']:.3f} p50 {stats['filtered_p50_ms']:.3f}ms")
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
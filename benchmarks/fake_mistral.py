@@ -0,0 +1,191 @@
+"""Локальная замена API Mistral для нагрузочных тестов.
+
+Отвечает на POST /v1/chat/completions (обычный ответ и SSE поток) с
+настраиваемой задержкой первого токена (логнормальное распределение),
+скоростью генерации токенов и долей ошибок 429/503. Содержимое ответа
+выбирается по промпту, чтобы агенты получали разбираемые JSON и вопросы.
+
+Отдельно: python benchmarks/fake_mistral.py --port 8089 --ttft-ms 300 --tokens-per-sec 80 --error-rate 0.02
+Клиент: MISTRAL_SERVER_URL=http://127.0.0.1:8089 MISTRAL_API_KEY=test python main.py
+"""
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+import uuid
+
+from aiohttp import web
+
+QUESTIONS = [
+    "Как бы вы спроектировали кэширование для высоконагруженного API?",
+    "Чем отличается градиентный бустинг от случайного леса?",
+    "Как вы диагностируете утечку памяти в сервисе на Python?",
+    "Какие уровни изоляции транзакций вы знаете и когда их применять?",
+    "Как устроен event loop в asyncio и что блокирует его работу?",
+]
+
+
+class FakeMistral:
+    def __init__(self, ttft_ms=300.0, ttft_sigma=0.5, tokens_per_sec=80.0, error_rate=0.0,
+                 rate_limit_share=0.5, seed=None):
+        self.ttft_ms = ttft_ms
+        self.ttft_sigma = ttft_sigma
+        self.tokens_per_sec = tokens_per_sec
+        self.error_rate = error_rate
+        # Доля 429 среди внедрённых ошибок, остальные — 503
+        self.rate_limit_share = rate_limit_share
+        self.random = random.Random(seed)
+        self.stats = {"requests": 0, "streams": 0, "errors_429": 0, "errors_503": 0}
+
+    # --- содержимое ответов ---
+
+    def reply_for(self, body):
+        messages = body.get("messages") or [{}]
+        system = messages[0].get("content", "")
+        prompt = messages[-1].get("content", "")
+        json_mode = (body.get("response_format") or {}).get("type") == "json_object" or "JSON" in system
+
+        if not json_mode:
+            # Как настоящая модель: вопрос и лишние пояснения после него
+            return f"{self.random.choice(QUESTIONS)}\nПочему это важно: проверяет понимание основ."
+        if "ВОПРОС ИНТЕРВЬЮЕРА" in prompt:
+            difficulty = self.random.choice(["harder", "same", "simpler"])
+            return json.dumps({"score": self.random.randint(3, 9), "difficulty": difficulty,
+                               "instruction": "Похвали кандидата и задай вопрос о масштабировании.",
+                               "thoughts": "Ответ по существу, уровень кандидата подтверждается."},
+                              ensure_ascii=False)
+        if "Оцени ответ кандидата" in prompt:
+            return json.dumps({"topic": "архитектура", "score": self.random.randint(3, 9),
+                               "strengths": ["основы"], "gaps": ["детали реализации"], "correction": "",
+                               "clarity": "Medium", "honesty": "High", "engagement": "Medium"},
+                              ensure_ascii=False)
+        return json.dumps({
+            "verdict": {"grade": "Middle", "recommendation": "Hire", "confidence_score": 80},
+            "hard_skills": {"confirmed_skills": ["Python"], "knowledge_gaps": ["Docker"],
+                            "corrections": ["Docker изолирует процессы через namespaces и cgroups"]},
+            "soft_skills": {"clarity": "High", "honesty": "High", "engagement": "Medium"},
+            "roadmap": {"topics": ["Docker"], "resources": ["https://docs.docker.com/"]},
+        }, ensure_ascii=False)
+
+    @staticmethod
+    def count_tokens(text):
+        return max(1, len(text) // 4)
+
+    def ttft(self):
+        """Задержка до первого токена, секунды"""
+        if not self.ttft_ms:
+            return 0.0
+        return self.random.lognormvariate(0, self.ttft_sigma) * self.ttft_ms / 1000
+
+    def injected_error(self):
+        if self.random.random() >= self.error_rate:
+            return None
+        if self.random.random() < self.rate_limit_share:
+            self.stats["errors_429"] += 1
+            return web.json_response({"message": "Rate limit exceeded"}, status=429, headers={"Retry-After": "0.2"})
+        self.stats["errors_503"] += 1
+        return web.json_response({"message": "Service unavailable"}, status=503)
+
+    # --- HTTP ---
+
+    async def handle_chat(self, request):
+        body = await request.json()
+        self.stats["requests"] += 1
+        error = self.injected_error()
+        if error is not None:
+            await asyncio.sleep(self.ttft() / 4)
+            return error
+
+        content = self.reply_for(body)
+        prompt_tokens = sum(self.count_tokens(m.get("content") or "") for m in body.get("messages", []))
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": self.count_tokens(content),
+                 "total_tokens": prompt_tokens + self.count_tokens(content)}
+        base = {"id": uuid.uuid4().hex, "model": body.get("model", "fake"), "created": int(time.time())}
+
+        if body.get("stream"):
+            return await self.stream(request, base, content, usage)
+
+        await asyncio.sleep(self.ttft() + usage["completion_tokens"] / self.tokens_per_sec)
+        return web.json_response(dict(base, object="chat.completion", usage=usage, choices=[{
+            "index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}]))
+
+    async def stream(self, request, base, content, usage):
+        self.stats["streams"] += 1
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        await asyncio.sleep(self.ttft())
+
+        pieces = [content[i:i + 4] for i in range(0, len(content), 4)]
+        try:
+            for i, piece in enumerate(pieces):
+                last = i == len(pieces) - 1
+                chunk = dict(base, object="chat.completion.chunk", choices=[{
+                    "index": 0, "delta": {"content": piece}, "finish_reason": "stop" if last else None}])
+                if last:
+                    chunk["usage"] = usage
+                await response.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode())
+                await asyncio.sleep(1 / self.tokens_per_sec)
+            await response.write(b"data: [DONE]\n\n")
+        except (ConnectionResetError, asyncio.CancelledError):
+            # Клиент закрыл поток на стоп-маркере — так и задумано
+            return response
+        return response
+
+    async def handle_stats(self, request):
+        return web.json_response(self.stats)
+
+    def create_app(self):
+        app = web.Application()
+        app.add_routes([
+            web.post("/v1/chat/completions", self.handle_chat),
+            web.get("/stats", self.handle_stats),
+        ])
+        return app
+
+    def start_in_thread(self, host="127.0.0.1", port=0):
+        """Запускает сервер в фоновом потоке, возвращает его URL"""
+        ready = threading.Event()
+        address = {}
+
+        def run():
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            runner = web.AppRunner(self.create_app(), access_log=None)
+            loop.run_until_complete(runner.setup())
+            site = web.TCPSite(runner, host, port)
+            loop.run_until_complete(site.start())
+            address["url"] = f"http://{host}:{site._server.sockets[0].getsockname()[1]}"
+            ready.set()
+            loop.run_forever()
+
+        threading.Thread(target=run, daemon=True, name="fake-mistral").start()
+        ready.wait()
+        return address["url"]
+
+
+def add_arguments(parser):
+    parser.add_argument("--ttft-ms", type=float, default=300.0, help="медиана задержки первого токена")
+    parser.add_argument("--ttft-sigma", type=float, default=0.5, help="разброс (sigma логнормального распределения)")
+    parser.add_argument("--tokens-per-sec", type=float, default=80.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="доля ответов 429/503")
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def from_args(args):
+    return FakeMistral(ttft_ms=args.ttft_ms, ttft_sigma=args.ttft_sigma, tokens_per_sec=args.tokens_per_sec,
+                       error_rate=args.error_rate, seed=args.seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Локальная замена API Mistral")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    add_arguments(parser)
+    args = parser.parse_args()
+    web.run_app(from_args(args).create_app(), host=args.host, port=args.port, access_log=None)
+
+
+if __name__ == "__main__":
+    main()
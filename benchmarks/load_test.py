@@ -0,0 +1,244 @@
+"""Нагрузочный тест интервью целиком на локальной замене API Mistral.
+
+N сессий параллельно проходят start_interview -> process_response (скриптовые
+ответы) -> "стоп" (_end_interview) против benchmarks/fake_mistral.py.
+Отчёт: ходов в секунду, перцентили задержки хода и этапов (по tracing.py),
+память на сессию и QPS поиска по базе знаний. Результат — JSON, который
+удобно сравнивать между коммитами.
+
+Логи сессий пишутся во временный каталог, а не в sessions/.
+Пример: python benchmarks/load_test.py --sessions 20 --turns 5 --ttft-ms 300 --error-rate 0.02 --output load.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import fake_mistral
+import tracing
+from config import Config
+from dispatcher import InterviewDispatcher
+from interview_loop import InterviewSystem
+from knowledge_base import ITKnowledgeBase
+from llm_client import get_client_stats
+from speculation import get_speculation_stats
+
+ANSWERS = [
+    "Я три года писал бэкенд на Python: Django, PostgreSQL, Redis для кэша, Celery для фоновых задач.",
+    "Индексы B-tree ускоряют поиск по диапазонам, но замедляют запись; я смотрю EXPLAIN ANALYZE.",
+    "Не уверен, но кажется, GIL мешает только CPU-bound коду, для I/O помогают потоки и asyncio.",
+    "Для масштабирования выносил состояние в Redis и ставил несколько инстансов за балансировщиком.",
+    "Docker изолирует процессы через namespaces и cgroups, образы собираю многоэтапной сборкой.",
+    "Не знаю.",
+    "Тесты пишу на pytest с фикстурами, внешние сервисы мокаю, в CI гоняю линтеры и покрытие.",
+]
+KB_QUERIES = ["Python GIL потоки", "индексы PostgreSQL", "Docker контейнеры", "градиентный бустинг",
+              "REST API проектирование", "React хуки", "Kubernetes деплой", "SQL оконные функции"]
+
+
+def percentiles(values_ms):
+    if not values_ms:
+        return {}
+    ordered = sorted(values_ms)
+
+    def pick(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 1)
+
+    return {"p50": pick(0.5), "p95": pick(0.95), "p99": pick(0.99),
+            "mean": round(statistics.fmean(ordered), 1), "count": len(ordered)}
+
+
+def rss_bytes():
+    """Текущий RSS процесса (Linux /proc, иначе пиковый из resource)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def run_session(index, knowledge_base, turns, think_time, position):
+    """Одна сессия от приветствия до фидбэка: задержки в мс и интервалы (начало, конец) каждого запроса"""
+    system = InterviewSystem(InterviewDispatcher(knowledge_base), echo=False)
+    start = time.perf_counter()
+    system.start_interview(f"Кандидат {index}", position)
+    end = time.perf_counter()
+    result = {"start_ms": (end - start) * 1000, "turn_ms": [], "intervals": [(start, end)], "system": system}
+
+    for turn in range(turns):
+        # Кандидат печатает: фоновые задачи и спекуляция успевают поработать
+        time.sleep(think_time)
+        start = time.perf_counter()
+        system.process_response(ANSWERS[(index + turn) % len(ANSWERS)])
+        end = time.perf_counter()
+        result["turn_ms"].append((end - start) * 1000)
+        result["intervals"].append((start, end))
+
+    start = time.perf_counter()
+    system.process_response("стоп")
+    end = time.perf_counter()
+    result["end_ms"] = (end - start) * 1000
+    result["intervals"].append((start, end))
+    return result
+
+
+def busy_seconds(intervals):
+    """Время, когда обрабатывался хотя бы один запрос (объединение интервалов всех сессий)"""
+    total, busy_start, busy_end = 0.0, None, None
+    for start, end in sorted(intervals):
+        if busy_end is None or start > busy_end:
+            if busy_end is not None:
+                total += busy_end - busy_start
+            busy_start, busy_end = start, end
+        else:
+            busy_end = max(busy_end, end)
+    if busy_end is not None:
+        total += busy_end - busy_start
+    return total
+
+
+def measure_kb(knowledge_base, seconds):
+    """QPS поиска по базе знаний: по одному запросу и пачкой (нужна модель эмбеддингов)"""
+    try:
+        knowledge_base.ensure_loaded()
+        embeddings = knowledge_base.encode(KB_QUERIES)
+    except Exception as e:
+        return {"error": f"база знаний недоступна: {e}"}
+
+    report = {"documents": len(knowledge_base.documents)}
+    for mode in ("single", "batch"):
+        done, start = 0, time.perf_counter()
+        while time.perf_counter() - start < seconds:
+            if mode == "single":
+                knowledge_base.search_embeddings(embeddings[done % len(embeddings)][None, :], k=3)
+                done += 1
+            else:
+                knowledge_base.search_embeddings(embeddings, k=3)
+                done += len(embeddings)
+        report[f"{mode}_qps"] = round(done / (time.perf_counter() - start), 1)
+    return report
+
+
+def since(before, after):
+    """Счётчики за время замера (без прогревочной сессии)"""
+    delta = {key: value - before.get(key, 0) for key, value in after.items() if key != "hit_rate"}
+    if "hits" in delta:
+        served = delta["hits"] + delta["misses"]
+        delta["hit_rate"] = round(delta["hits"] / served, 3) if served else 0.0
+    return delta
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест интервью на локальной замене Mistral")
+    parser.add_argument("--sessions", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=None, help="одновременных сессий (по умолчанию все)")
+    parser.add_argument("--turns", type=int, default=5, help="ответов кандидата на сессию (до 'стоп')")
+    parser.add_argument("--think-ms", type=float, default=500.0, help="пауза кандидата перед ответом")
+    parser.add_argument("--position", default="Backend Developer")
+    parser.add_argument("--server-url", help="внешний сервер вместо встроенной замены")
+    parser.add_argument("--llm-rps", type=float, default=Config.LLM_RATE_LIMIT_RPS, help="лимит запросов в секунду")
+    parser.add_argument("--speculative", action="store_true", help="включить спекулятивные вопросы")
+    parser.add_argument("--feedback-mode", default=Config.FEEDBACK_MODE, choices=("map_reduce", "single"))
+    parser.add_argument("--kb-seconds", type=float, default=2.0, help="0 — не измерять поиск по базе знаний")
+    parser.add_argument("--output", help="файл для JSON результата")
+    fake_mistral.add_arguments(parser)
+    args = parser.parse_args()
+
+    fake = None
+    if args.server_url:
+        Config.MISTRAL_SERVER_URL = args.server_url
+    else:
+        fake = fake_mistral.from_args(args)
+        Config.MISTRAL_SERVER_URL = fake.start_in_thread()
+    Config.MISTRAL_API_KEY = Config.MISTRAL_API_KEY or "load-test"
+    Config.LLM_RATE_LIMIT_RPS = args.llm_rps
+    Config.SPECULATIVE_QUESTIONS = args.speculative
+    Config.FEEDBACK_MODE = args.feedback_mode
+    Config.TRACING = True
+
+    output = os.path.abspath(args.output) if args.output else None
+    # Общая база знаний, как в server.py; логи — во временный каталог
+    knowledge_base = ITKnowledgeBase(Config.EMBEDDING_MODEL, index_dir=os.path.join(ROOT, Config.KNOWLEDGE_INDEX_DIR))
+    workdir = tempfile.mkdtemp(prefix="interview-load-")
+    os.chdir(workdir)
+    Config.LOGS_DIR = os.path.join(workdir, "sessions")
+    Config.SESSION_DB_PATH = os.path.join(Config.LOGS_DIR, "sessions.db")
+
+    # Прогревочная сессия: импорты, клиент и пулы потоков не должны попасть в замер
+    run_session(-1, knowledge_base, 1, 0, args.position)
+    tracing.get_metrics().reset()
+    baseline = {"llm_client": get_client_stats(), "speculation": get_speculation_stats(),
+                "fake_server": dict(fake.stats) if fake else {}}
+    rss_before = rss_bytes()
+    concurrency = args.concurrency or args.sessions
+    print(f"⏳ {args.sessions} сессий по {args.turns} ответов, параллельно {concurrency}, API: {Config.MISTRAL_SERVER_URL}")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(run_session, i, knowledge_base, args.turns, args.think_ms / 1000, args.position)
+                   for i in range(args.sessions)]
+        results, errors = [], []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                errors.append(f"{type(e).__name__}: {e}")
+    wall = time.perf_counter() - start
+    # Сессии ещё в памяти — прирост RSS делится на их число
+    rss_after = rss_bytes()
+
+    turn_ms = [ms for r in results for ms in r["turn_ms"]]
+    # Время кандидата (think) не считается работой системы: считаем только время внутри запросов.
+    # Вычитать turns * think из wall нельзя — при concurrency < sessions сессии идут волнами
+    busy = busy_seconds([interval for r in results for interval in r["intervals"]])
+    stages = {name: {"count": s["count"], "p50_ms": round(s["p50"] * 1000, 1), "p95_ms": round(s["p95"] * 1000, 1),
+                     "p99_ms": round(s["p99"] * 1000, 1), "prompt_tokens": s["prompt_tokens"],
+                     "completion_tokens": s["completion_tokens"], "cache_hits": s["cache_hits"]}
+              for name, s in sorted(tracing.get_metrics().summary().items())}
+
+    report = {
+        "meta": {"commit": git_commit(), "timestamp": datetime.now().isoformat(timespec="seconds"),
+                 "params": {k: v for k, v in vars(args).items() if k != "output"}},
+        "throughput": {"sessions_ok": len(results), "sessions_failed": len(errors), "turns": len(turn_ms),
+                       "wall_seconds": round(wall, 2), "busy_seconds": round(busy, 2),
+                       "turns_per_sec": round(len(turn_ms) / busy, 2) if busy > 0 else None},
+        "latency_ms": {"start": percentiles([r["start_ms"] for r in results]),
+                       "turn": percentiles(turn_ms),
+                       "end_interview": percentiles([r["end_ms"] for r in results])},
+        "stages": stages,
+        "memory": {"rss_before_mb": round(rss_before / 2 ** 20, 1), "rss_after_mb": round(rss_after / 2 ** 20, 1),
+                   "per_session_kb": round((rss_after - rss_before) / max(len(results), 1) / 1024, 1)},
+        "knowledge_base": measure_kb(knowledge_base, args.kb_seconds) if args.kb_seconds else None,
+        "llm_client": since(baseline["llm_client"], get_client_stats()),
+        "speculation": since(baseline["speculation"], get_speculation_stats()) if args.speculative else None,
+        "fake_server": since(baseline["fake_server"], fake.stats) if fake else None,
+        "errors": errors[:10],
+    }
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Recall@k и задержка поиска по базе знаний: lexical (BM25), vector (FAISS) и hybrid (RRF).
+
+Замеряется ITKnowledgeBase.search(mode=...) — тот же путь, что у агентов.
+Размеченные запросы — benchmarks/data/retrieval_relevance.json: запрос и
+начала текстов релевантных документов из ITKnowledgeBase.default_knowledge().
+--distractors добавляет синтетические документы из слов того же корпуса
+(как чанки ingest.py во временном каталоге индекса), чтобы recall и задержка
+мерились не только на 36 документах.
+Для vector и hybrid нужна модель эмбеддингов; без неё замеряется только lexical.
+Пример: python benchmarks/retrieval_benchmark.py --distractors 20000 --output retrieval.json
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from config import Config
+from knowledge_base import ITKnowledgeBase
+
+LABELS_PATH = os.path.join(ROOT, "benchmarks", "data", "retrieval_relevance.json")
+KS = (1, 3, 5)
+MODES = ("lexical", "vector", "hybrid")
+
+
+def write_distractors(index_dir, distractors, seed=0):
+    """Синтетические документы из слов базы знаний — чанками, которые база подхватит при загрузке"""
+    texts = [item["text"] for item in ITKnowledgeBase.default_knowledge()]
+    rng = np.random.default_rng(seed)
+    words = " ".join(texts).split()
+    with open(os.path.join(index_dir, ITKnowledgeBase.CHUNKS_FILE), 'w', encoding='utf-8') as f:
+        for _ in range(distractors):
+            text = " ".join(rng.choice(words, size=rng.integers(10, 30)))
+            f.write(json.dumps({"text": text, "category": "distractor", "topic": "distractor",
+                                "position": "distractor"}, ensure_ascii=False) + "\n")
+
+
+def resolve_labels(cases, documents):
+    """Начала текстов из разметки -> ID документов"""
+    labelled = []
+    for case in cases:
+        relevant = {i for i, text in enumerate(documents[:len(ITKnowledgeBase.default_knowledge())])
+                    if any(text.startswith(prefix) for prefix in case["relevant"])}
+        if not relevant:
+            raise ValueError(f"В корпусе нет документа для запроса {case['query']!r}")
+        labelled.append((case["query"], relevant))
+    return labelled
+
+
+def evaluate(search, labelled, k_max):
+    """search(query) -> ID по убыванию релевантности; recall@k, MRR и задержки"""
+    recalls = {k: [] for k in KS}
+    reciprocal_ranks, latencies = [], []
+    for query, relevant in labelled:
+        start = time.perf_counter()
+        found = search(query)[:k_max]
+        latencies.append((time.perf_counter() - start) * 1000)
+        for k in KS:
+            recalls[k].append(len(relevant & set(found[:k])) / len(relevant))
+        rank = next((i for i, doc_id in enumerate(found, 1) if doc_id in relevant), None)
+        reciprocal_ranks.append(1.0 / rank if rank else 0.0)
+
+    ordered = sorted(latencies)
+    report = {f"recall@{k}": round(statistics.fmean(values), 3) for k, values in recalls.items()}
+    report.update({
+        "mrr": round(statistics.fmean(reciprocal_ranks), 3),
+        "latency_p50_ms": round(ordered[len(ordered) // 2], 3),
+        "latency_p95_ms": round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))], 3),
+    })
+    return report
+
+
+def benchmark_mode(knowledge_base, mode, labelled, k_max):
+    """Первый запрос (загрузка модели, индексов) отдельно, затем recall и задержки"""
+    start = time.perf_counter()
+    knowledge_base.search(labelled[0][0], k=k_max, mode=mode)
+    first_query_seconds = time.perf_counter() - start
+
+    def search_ids(query):
+        return [hit["id"] for hit in knowledge_base.search(query, k=k_max, mode=mode)]
+
+    report = evaluate(search_ids, labelled, k_max)
+    report["first_query_seconds"] = round(first_query_seconds, 2)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall и задержка lexical / vector / hybrid поиска")
+    parser.add_argument("--labels", default=LABELS_PATH)
+    parser.add_argument("--distractors", type=int, default=0, help="синтетических документов в корпусе")
+    parser.add_argument("--output", help="файл для JSON результата")
+    args = parser.parse_args()
+
+    with open(args.labels, encoding='utf-8') as f:
+        cases = json.load(f)
+
+    with tempfile.TemporaryDirectory() as index_dir:
+        write_distractors(index_dir, args.distractors)
+        knowledge_base = ITKnowledgeBase(Config.EMBEDDING_MODEL, index_dir=index_dir).ensure_documents()
+        labelled = resolve_labels(cases, knowledge_base.documents)
+        k_max = max(KS)
+        report = {"documents": len(knowledge_base.documents), "queries": len(labelled)}
+
+        for mode in MODES:
+            try:
+                report[mode] = benchmark_mode(knowledge_base, mode, labelled, k_max)
+            except Exception as e:
+                # vector и hybrid без модели эмбеддингов не работают
+                report[mode] = {"error": f"{type(e).__name__}: {e}"}
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Очистка вопросов: сверка с эталонами и скорость относительно прежней цепочки.
+
+Эталоны (benchmarks/data/question_sanitizer_golden.json) получены прежним
+кодом — InterviewerAgent._clean_question, затем InterviewSystem._clean_question —
+на вопросах из логов sessions/ с типичным оформлением модели (кавычки,
+нумерация, **жирный**, пояснения, заголовки, эмодзи) и на мыслях агентов.
+expected_stream — результат потоковой очистки при фрагментах по 3 символа.
+При расхождении с эталоном скрипт завершается с кодом 1.
+Пример: python benchmarks/sanitizer_benchmark.py --repeat 2000
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from question_sanitizer import StreamingQuestionCleaner, sanitize_question
+
+GOLDEN_PATH = os.path.join(ROOT, "benchmarks", "data", "question_sanitizer_golden.json")
+
+
+def legacy_sanitize(question):
+    """Прежняя двойная очистка (для сравнения скорости)"""
+    # InterviewerAgent._clean_question
+    question = question.strip()
+    question = question.replace('"', '').replace("'", "")
+    question = question.replace('*', '').replace('**', '')
+    question = question.replace('---', '').replace('___', '')
+    question = re.sub(r'^\d+[\.\)]\s*', '', question)
+    for stop_word in ['Почему', 'Например', 'Задача:', 'Цель:', 'Пример:', 'Если', '//', '---']:
+        if stop_word in question:
+            question = question.split(stop_word)[0].strip()
+
+    # InterviewSystem._clean_question
+    stop_markers = ['Почему', 'Например', 'Пример:', 'Если', 'Задача:', 'Цель:', '---', '###', '**Почему',
+                    '📌', '💡', '🎯', '🤔', '🔍']
+    clean_q = question.strip()
+    for line in clean_q.split('\n'):
+        line = line.strip()
+        if line and len(line) > 10:
+            if not any(marker in line for marker in ['---', '###', '***']):
+                clean_q = line
+                break
+    for marker in stop_markers:
+        if marker in clean_q:
+            clean_q = clean_q.split(marker)[0].strip()
+    clean_q = clean_q.replace('"', '').replace("'", "")
+    clean_q = re.sub(r'\s+', ' ', clean_q)
+    if len(clean_q) < 15 and len(question) > 30:
+        for line in question.split('\n'):
+            line = line.strip()
+            if len(line) > 20 and not line.startswith(('*', '-', '#', 'Почему')):
+                clean_q = line
+                break
+    return clean_q.strip()
+
+
+def stream_sanitize(text, chunk_size=3):
+    cleaner = StreamingQuestionCleaner()
+    for i in range(0, len(text), chunk_size):
+        cleaner.feed(text[i:i + chunk_size])
+        if cleaner.stopped:
+            break
+    cleaner.finish()
+    return cleaner.question
+
+
+def check(cases):
+    failures = []
+    for case in cases:
+        for kind, actual in (("expected", sanitize_question(case["input"])),
+                             ("expected_stream", stream_sanitize(case["input"]))):
+            if actual != case[kind]:
+                failures.append({"input": case["input"], "kind": kind, "expected": case[kind], "actual": actual})
+    return failures
+
+
+def timed(fn, inputs, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in inputs:
+            fn(text)
+    return (time.perf_counter() - start) / (repeat * len(inputs)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сверка и скорость очистки вопросов")
+    parser.add_argument("--golden", default=GOLDEN_PATH)
+    parser.add_argument("--repeat", type=int, default=500, help="прогонов всего набора на замер")
+    args = parser.parse_args()
+
+    with open(args.golden, encoding='utf-8') as f:
+        cases = json.load(f)
+
+    failures = check(cases)
+    inputs = [case["input"] for case in cases]
+    legacy_us = timed(legacy_sanitize, inputs, args.repeat)
+    new_us = timed(sanitize_question, inputs, args.repeat)
+    report = {
+        "cases": len(cases),
+        "mismatches": len(failures),
+        "legacy_us_per_question": round(legacy_us, 2),
+        "sanitizer_us_per_question": round(new_us, 2),
+        "speedup": round(legacy_us / new_us, 2) if new_us else None,
+        "stream_us_per_question": round(timed(stream_sanitize, inputs, max(1, args.repeat // 10)), 2),
+    }
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+    for failure in failures[:10]:
+        print(f"❌ {failure['kind']}: {failure['input'][:80]!r}\n   ждали {failure['expected']!r}\n"
+              f"   получили {failure['actual']!r}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
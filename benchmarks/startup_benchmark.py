@@ -0,0 +1,78 @@
+"""Замер холодного старта: от запуска `python main.py` до первого вопроса в консоли.
+
+Первый вопрос фиксированный, поэтому замер не обращается к API Mistral.
+Пример: python benchmarks/startup_benchmark.py --runs 5 --max-seconds 2
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIRST_QUESTION_MARKER = "🤖:"
+
+
+def measure_once(timeout):
+    """Один запуск main.py, возвращает секунды до первого вопроса"""
+    env = dict(os.environ, PYTHONUNBUFFERED="1", PYTHONIOENCODING="utf-8")
+    env.setdefault("MISTRAL_API_KEY", "startup-benchmark")
+
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "main.py"],
+        cwd=ROOT,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        env=env
+    )
+    try:
+        proc.stdin.write("Benchmark\nData Scientist\n".encode("utf-8"))
+        proc.stdin.flush()
+
+        while time.perf_counter() - start < timeout:
+            line = proc.stdout.readline()
+            if not line:
+                raise RuntimeError("main.py завершился до первого вопроса")
+            if FIRST_QUESTION_MARKER in line.decode("utf-8", errors="ignore"):
+                return time.perf_counter() - start
+        raise TimeoutError(f"Первый вопрос не появился за {timeout} с")
+    finally:
+        proc.kill()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк холодного старта main.py")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--max-seconds", type=float, default=None,
+                        help="порог для медианы; при превышении код возврата 1")
+    parser.add_argument("--json", dest="json_path", default=None, help="куда сохранить результаты")
+    args = parser.parse_args()
+
+    timings = [measure_once(args.timeout) for _ in range(args.runs)]
+    result = {
+        "runs": args.runs,
+        "min_s": round(min(timings), 3),
+        "median_s": round(statistics.median(timings), 3),
+        "max_s": round(max(timings), 3),
+    }
+
+    print(f"⏱ Холодный старт до первого вопроса: "
+          f"median {result['median_s']} с (min {result['min_s']}, max {result['max_s']}, runs {args.runs})")
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+    if args.max_seconds is not None and result["median_s"] > args.max_seconds:
+        print(f"❌ Регрессия: медиана {result['median_s']} с > {args.max_seconds} с")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,7 @@
 #config
 import os
+import threading
 from dotenv import load_dotenv
-from mistralai import Mistral
 
 load_dotenv()
 
@@ -9,6 +9,8 @@ load_dotenv()
 class Config:
     # API ключи
     MISTRAL_API_KEY = os.getenv("MISTRAL_API_KEY")
+    # Другой адрес API (например, локальная замена из benchmarks/fake_mistral.py); None — официальный
+    MISTRAL_SERVER_URL = os.getenv("MISTRAL_SERVER_URL")
 
     # Модели
     MODEL_INTERVIEWER = "mistral-large-latest"
@@ -18,17 +20,143 @@ class Config:
     # RAG настройки
     EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
     KNOWLEDGE_BASE_PATH = "knowledge/"
+    # Кэш эмбеддингов и FAISS индекса между запусками
+    KNOWLEDGE_INDEX_DIR = os.path.join(KNOWLEDGE_BASE_PATH, ".index")
+
+    # Тип FAISS индекса: "auto" (по размеру корпуса), "flat", "hnsw" или "ivfpq"
+    INDEX_BACKEND = "auto"
+    INDEX_HNSW_MIN_DOCS = 10_000
+    INDEX_IVFPQ_MIN_DOCS = 200_000
+    HNSW_M = 32
+    HNSW_EF_CONSTRUCTION = 80
+    HNSW_EF_SEARCH = 64
+    IVF_NPROBE = 16
+    # IVF-PQ достаёт k * factor кандидатов и переранжирует их по точным эмбеддингам
+    IVF_RERANK_FACTOR = 4
+    # Кэш результатов поиска RAG (точный текст + семантическая близость)
+    RETRIEVAL_CACHE_SIZE = 512
+    RETRIEVAL_CACHE_TTL = 3600
+    RETRIEVAL_CACHE_SIMILARITY = 0.95
+    # Фильтр по категории/позиции меньше этого размера ищется точно по эмбеддингам
+    INDEX_EXACT_FILTER_MAX = 4096
+    # Режим поиска: "vector" (FAISS), "lexical" (BM25) или "hybrid" (оба + reciprocal rank fusion)
+    RETRIEVAL_MODE = "hybrid"
+    BM25_K1 = 1.2
+    BM25_B = 0.75
+    RRF_K = 60
+    # Гибридный поиск берёт k * factor кандидатов из каждого списка перед слиянием
+    HYBRID_FETCH_FACTOR = 4
+    # Позиция без ключевых слов относится к ближайшей категории при такой косинусной близости
+    POSITION_EMBEDDING_MIN_SIMILARITY = 0.3
+    # Контекст позиции в промпте интервьюера: документов и последних ответов кандидата для их ранжирования
+    POSITION_CONTEXT_DOCS = 3
+    POSITION_CONTEXT_ANSWERS = 3
 
     # Логирование
     LOGS_DIR = "sessions/"
+    # Журнал JSONL, дописываемый после каждого хода (переживает падение процесса)
+    LOG_WAL = True
+    # fsync журнала раз в N записей (1 — после каждого хода)
+    LOG_FSYNC_EVERY = 1
+    # Хранилище завершённых сессий: "sqlite" или "json"; JSON файлы можно писать дополнительно как экспорт
+    SESSION_STORE = "sqlite"
+    SESSION_DB_PATH = os.path.join(LOGS_DIR, "sessions.db")
+    SESSION_EXPORT_JSON = True
+
+    # Бюджет токенов на транскрипт в промпте фидбэка: последние ходы целиком,
+    # остальные ответы сжимаются до ключевых предложений (лимит на ответ)
+    FEEDBACK_TOKEN_BUDGET = 3000
+    FEEDBACK_RECENT_TURNS = 3
+    FEEDBACK_SUMMARY_TOKENS = 60
+    # "single" — один вызов по всему транскрипту в конце интервью;
+    # "map_reduce" — каждый ответ оценивается в фоне сразу после хода (+1 вызов LLM на ход),
+    # в конце только сводка оценок
+    FEEDBACK_MODE = "single"
+
+    # Спекулятивная генерация: пока кандидат печатает, заранее готовятся вопросы
+    # для исходов Observer; лимиты — генераций на сессию и одновременных на процесс
+    SPECULATIVE_QUESTIONS = False
+    SPECULATION_DIFFICULTIES = ("harder", "same", "simpler")
+    SPECULATION_MAX_PER_SESSION = 30
+    SPECULATION_MAX_IN_FLIGHT = 8
+
+    # Трассировка: разбивка времени хода в логе и агрегаты p50/p95/p99 по действиям
+    # (GET /metrics в server.py; файл в формате Prometheus, если задан путь)
+    TRACING = True
+    TRACE_WINDOW = 10_000
+    TRACE_EXPORT_PATH = None
+
+    # Потоковый вывод вопроса в консоль по мере генерации
+    STREAM_QUESTIONS = True
+
+    # Фоновые задачи интервью (мысли для лога и т.п.)
+    BACKGROUND_WORKERS = 2
+
+    # Максимум одновременных запросов к LLM на процесс (все сессии вместе)
+    MAX_CONCURRENT_LLM_CALLS = 16
+    # Пул HTTP соединений: держим соединения открытыми между ходами
+    LLM_KEEPALIVE_CONNECTIONS = 32
+    LLM_KEEPALIVE_EXPIRY = 60
+    # Дедлайн вызова (включая повторы) и повторы на 429/5xx с паузой base * 2^n со случайным jitter
+    LLM_TIMEOUT_MS = 60_000
+    LLM_MAX_RETRIES = 3
+    LLM_BACKOFF_BASE = 0.5
+    LLM_BACKOFF_MAX = 8.0
+    # Token bucket на частоту запросов, общий для всех сессий процесса (0 — без ограничения)
+    LLM_RATE_LIMIT_RPS = 5
+    LLM_RATE_LIMIT_BURST = 10
+    # Хеджирование: агенты на критическом пути хода получают копию запроса, если ответа нет N мс
+    LLM_HEDGE_AGENTS = {"observer", "interviewer"}
+    LLM_HEDGE_AFTER_MS = 4000
+
+    # Серверный режим (server.py)
+    SERVER_HOST = "0.0.0.0"
+    SERVER_PORT = 8080
+    SERVER_MAX_SESSIONS = 100
+    SERVER_MAX_PENDING_TURNS = 64
+    SERVER_TURN_WORKERS = 32
+    SERVER_SESSION_TTL = 3600
+
+    # Кэш ответов LLM: какие агенты его используют, размер LRU и файл SQLite (None — только память)
+    LLM_CACHE_AGENTS = {"observer", "feedback"}
+    LLM_CACHE_SIZE = 1024
+    LLM_CACHE_SQLITE_PATH = None
 
     @staticmethod
     def get_mistral_client():
         """Создаёт клиент Mistral"""
         if not Config.MISTRAL_API_KEY:
             raise ValueError("MISTRAL_API_KEY не найден в .env")
-        return Mistral(api_key=Config.MISTRAL_API_KEY)
+        import httpx
+        from mistralai import Mistral
+        # Один пул keep-alive соединений на процесс: без TLS рукопожатия на каждый вызов
+        http_client = httpx.Client(
+            limits=httpx.Limits(max_connections=max(Config.LLM_KEEPALIVE_CONNECTIONS,
+                                                    Config.MAX_CONCURRENT_LLM_CALLS * 2),
+                                max_keepalive_connections=Config.LLM_KEEPALIVE_CONNECTIONS,
+                                keepalive_expiry=Config.LLM_KEEPALIVE_EXPIRY),
+            timeout=Config.LLM_TIMEOUT_MS / 1000
+        )
+        return Mistral(api_key=Config.MISTRAL_API_KEY, server_url=Config.MISTRAL_SERVER_URL, client=http_client)
+
+
+class LazyMistralClient:
+    """Клиент Mistral, который создаётся при первом обращении, а не при импорте"""
+
+    def __init__(self):
+        self._client = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = Config.get_mistral_client()
+        return self._client
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
 
 
 # Глобальный клиент
-MISTRAL_CLIENT = Config.get_mistral_client()
\ No newline at end of file
+MISTRAL_CLIENT = LazyMistralClient()
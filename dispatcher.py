@@ -1,20 +1,26 @@
 
 from agents import InterviewerAgent, ObserverAgent, FeedbackAgent
 from knowledge_base import ITKnowledgeBase
+from tracing import span
 
 
 class InterviewDispatcher:
-    def __init__(self):
+    def __init__(self, knowledge_base=None):
         self.interviewer = None
         self.observer = ObserverAgent()
-        self.feedback = FeedbackAgent()
-        self.knowledge_base = ITKnowledgeBase()
+        # База знаний может быть общей для нескольких сессий (серверный режим)
+        self.knowledge_base = knowledge_base or ITKnowledgeBase()
+        self.feedback = FeedbackAgent(self.knowledge_base)
 
     def init_interviewer(self, name, position):
         self.interviewer = InterviewerAgent(name, position, self.knowledge_base)
         return self.interviewer
 
     def dispatch(self, action, args):
+        with span(f"dispatch.{action}"):
+            return self._dispatch(action, args)
+
+    def _dispatch(self, action, args):
         if action == "analyze":
             return self.observer.analyze(
                 user_response=args["user_response"],
@@ -26,7 +32,10 @@ class InterviewDispatcher:
                 raise ValueError("Interviewer не инициализирован")
             return self.interviewer.generate_question(
                 instruction=args["instruction"],
-                question_count=args.get("question_count", 1)  # Исправлено здесь
+                question_count=args.get("question_count", 1),  # Исправлено здесь
+                on_token=args.get("on_token"),
+                record=args.get("record", True),
+                recent_answers=args.get("recent_answers")
             )
         elif action == "handle_offtopic":
             if not self.interviewer:
@@ -36,7 +45,21 @@ class InterviewDispatcher:
             return self.feedback.generate(
                 interview_log=args["interview_log"],
                 position=args["position"],
-                user_responses=args.get("user_responses", [])
+                user_responses=args.get("user_responses", []),
+                console=args.get("console", True)
+            )
+        elif action == "assess_turn":
+            return self.feedback.assess_turn(
+                question=args["question"],
+                answer=args["answer"],
+                position=args["position"]
+            )
+        elif action == "reduce_feedback":
+            return self.feedback.reduce(
+                interview_log=args["interview_log"],
+                position=args["position"],
+                assessments=args["assessments"],
+                console=args.get("console", True)
             )
         else:
             raise ValueError(f"Неизвестное действие: {action}")
\ No newline at end of file
@@ -0,0 +1,230 @@
+"""Загрузка документации из knowledge/ в базу знаний.
+
+Файлы читаются по одному, режутся на чанки, кодируются батчами фиксированного
+размера в пуле процессов и дописываются в индекс ITKnowledgeBase.
+Пример: python ingest.py --path knowledge/ --batch-size 64 --workers 4
+"""
+import argparse
+import os
+import re
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from html.parser import HTMLParser
+
+from config import Config
+from knowledge_base import ITKnowledgeBase
+from position_resolver import CATEGORY_POSITIONS, resolve_category, resolve_text_category
+
+SUPPORTED_EXTENSIONS = ('.md', '.txt', '.html', '.htm', '.pdf')
+
+
+class _TextExtractor(HTMLParser):
+    """Достаёт видимый текст из HTML"""
+
+    SKIP_TAGS = {'script', 'style', 'nav', 'header', 'footer'}
+    BLOCK_TAGS = {'p', 'div', 'li', 'br', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'pre', 'tr', 'section'}
+
+    def __init__(self):
+        super().__init__()
+        self.parts = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append("\n\n")
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self.parts.append(data)
+
+
+def read_text(path):
+    """Возвращает текст файла или None, если формат не поддерживается"""
+    extension = os.path.splitext(path)[1].lower()
+
+    if extension == '.pdf':
+        try:
+            from pypdf import PdfReader
+        except ImportError:
+            print(f"⚠️ Пропущен {path}: для PDF нужен пакет pypdf")
+            return None
+        reader = PdfReader(path)
+        return "\n\n".join(page.extract_text() or "" for page in reader.pages)
+
+    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+        text = f.read()
+
+    if extension in ('.html', '.htm'):
+        extractor = _TextExtractor()
+        extractor.feed(text)
+        text = "".join(extractor.parts)
+
+    return text
+
+
+def iter_files(root):
+    """Обходит каталог, пропуская скрытые папки (в т.ч. кэш индекса)"""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith('.'))
+        for filename in sorted(filenames):
+            if filename.lower().endswith(SUPPORTED_EXTENSIONS):
+                yield os.path.join(dirpath, filename)
+
+
+def chunk_text(text, max_chars=800, overlap=100):
+    """Режет текст на чанки по абзацам, длинные абзацы — по предложениям"""
+    paragraphs = [re.sub(r'\s+', ' ', p).strip() for p in re.split(r'\n\s*\n', text)]
+    pieces = []
+    for paragraph in paragraphs:
+        if len(paragraph) <= max_chars:
+            pieces.append(paragraph)
+        else:
+            pieces.extend(re.split(r'(?<=[.!?])\s+', paragraph))
+
+    chunks = []
+    current = ""
+    for piece in filter(None, pieces):
+        while len(piece) > max_chars:
+            chunks.append(piece[:max_chars])
+            piece = piece[max_chars - overlap:]
+        if current and len(current) + len(piece) + 1 > max_chars:
+            chunks.append(current)
+            # Хвост предыдущего чанка сохраняет контекст на границе
+            current = current[-overlap:] + " " + piece if overlap else piece
+        else:
+            current = f"{current} {piece}".strip()
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def infer_metadata(rel_path, text):
+    """Категория, тема и позиция по пути файла и его содержимому"""
+    parts = rel_path.replace('\\', '/').lower().split('/')
+    category = parts[0] if len(parts) > 1 and parts[0] in CATEGORY_POSITIONS else None
+
+    if not category:
+        # Имя файла — как название позиции; иначе ключевые слова в начале текста
+        category = (resolve_category(os.path.splitext(rel_path)[0].replace('_', ' '), default=None)
+                    or resolve_text_category(text[:2000]))
+
+    topic = re.sub(r'[_\-]+', ' ', os.path.splitext(os.path.basename(rel_path))[0]).strip()
+    return {"category": category, "topic": topic, "position": CATEGORY_POSITIONS[category]}
+
+
+# Модель в процессах пула загружается один раз на процесс
+_worker_model = None
+
+
+def _init_worker(model_name):
+    global _worker_model
+    try:
+        import torch
+        torch.set_num_threads(1)  # процессов уже несколько, потоки torch только мешают
+    except ImportError:
+        pass
+    from sentence_transformers import SentenceTransformer
+    _worker_model = SentenceTransformer(model_name)
+
+
+def _encode_batch(texts):
+    return _worker_model.encode(texts, batch_size=len(texts)).astype('float32')
+
+
+def iter_batches(root, kb, batch_size, max_chars, stats):
+    """Потоково отдаёт батчи новых чанков с метаданными"""
+    batch = []
+    for path in iter_files(root):
+        text = read_text(path)
+        stats["documents"] += 1
+        if not text:
+            continue
+
+        rel_path = os.path.relpath(path, root)
+        meta = infer_metadata(rel_path, text)
+        for chunk in chunk_text(text, max_chars=max_chars):
+            if kb.has_document(chunk):
+                stats["skipped"] += 1
+                continue
+            batch.append(dict(meta, text=chunk, source=rel_path))
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+def ingest(root, batch_size=64, workers=2, max_chars=800, report_every=5.0):
+    """Загружает каталог в базу знаний, возвращает статистику"""
+    # Добавленные тексты не нужны в памяти: чанки уходят в chunks.jsonl, эмбеддинги — на диск
+    kb = ITKnowledgeBase(Config.EMBEDDING_MODEL, keep_documents=False).ensure_loaded()
+    stats = {"documents": 0, "chunks": 0, "skipped": 0}
+    start = time.perf_counter()
+    last_report = start
+
+    def report(final=False):
+        elapsed = max(time.perf_counter() - start, 1e-9)
+        prefix = "✅ Готово" if final else "⏳"
+        print(f"{prefix}: документов {stats['documents']} ({stats['documents'] / elapsed:.1f}/с), "
+              f"чанков {stats['chunks']} ({stats['chunks'] / elapsed:.1f}/с), "
+              f"пропущено дубликатов {stats['skipped']}")
+
+    def append(batch, embeddings):
+        kb.add_documents(batch, embeddings)
+        stats["chunks"] += len(batch)
+
+    batches = iter_batches(root, kb, batch_size, max_chars, stats)
+
+    if workers <= 0:
+        for batch in batches:
+            append(batch, kb.model.encode([item["text"] for item in batch]))
+            if time.perf_counter() - last_report >= report_every:
+                report()
+                last_report = time.perf_counter()
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(Config.EMBEDDING_MODEL,)) as pool:
+            # Не больше 2 батчей на процесс в полёте — память не растёт с размером корпуса
+            in_flight = deque()
+            for batch in batches:
+                in_flight.append((batch, pool.submit(_encode_batch, [item["text"] for item in batch])))
+                if len(in_flight) >= workers * 2:
+                    done_batch, future = in_flight.popleft()
+                    append(done_batch, future.result())
+                if time.perf_counter() - last_report >= report_every:
+                    report()
+                    last_report = time.perf_counter()
+            while in_flight:
+                done_batch, future = in_flight.popleft()
+                append(done_batch, future.result())
+
+    kb.persist()
+    report(final=True)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Загрузка документации в базу знаний")
+    parser.add_argument("--path", default=Config.KNOWLEDGE_BASE_PATH)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help="процессов для эмбеддингов (0 — в текущем процессе)")
+    parser.add_argument("--chunk-chars", type=int, default=800)
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.path):
+        print(f"❌ Каталог {args.path} не найден")
+        return
+
+    ingest(args.path, batch_size=args.batch_size, workers=args.workers, max_chars=args.chunk_chars)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,47 @@
-
 import json
 import os
+import uuid
 from datetime import datetime
+from config import Config
+from session_store import JSONSessionStore, ensure_session_id, get_session_store
 
 
 class InterviewLogger:
-    def __init__(self, logs_dir="sessions"):
+    def __init__(self, logs_dir="sessions", wal=None, fsync_every=None, echo=True):
         self.logs_dir = logs_dir
+        # echo=False — ничего не печатаем в консоль (серверный режим)
+        self.echo = echo
         self.session_data = None
+        # Журнал JSONL: каждый ход дописывается сразу, финальный JSON собирается в save()
+        self.wal = Config.LOG_WAL if wal is None else wal
+        self.fsync_every = fsync_every or Config.LOG_FSYNC_EVERY
+        self.wal_path = None
+        self._wal_file = None
+        self._unsynced = 0
         if not os.path.exists(logs_dir):
             os.makedirs(logs_dir)
 
     def start_session(self, name, position):
         self.session_data = {
+            "session_id": uuid.uuid4().hex,
             "participant_name": name,
             "position": position,
             "start_time": datetime.now().isoformat(),
             "turns": []
         }
 
-    def add_turn(self, agent_msg, user_msg, internal):
+        if self.wal:
+            self.wal_path = self._new_wal_path()
+            self._open_wal()
+            self._append({
+                "type": "session",
+                "session_id": self.session_data["session_id"],
+                "participant_name": name,
+                "position": position,
+                "start_time": self.session_data["start_time"]
+            }, sync=True)
+
+    def add_turn(self, agent_msg, user_msg, internal, analysis=None, timings=None):
         if not self.session_data:
             return
 
@@ -30,20 +52,128 @@ class InterviewLogger:
             "internal_thoughts": internal,  # Сохраняем полные мысли
             "timestamp": datetime.now().isoformat()
         }
+        if analysis:
+            # Машиночитаемая оценка Observer (score, difficulty) для аналитики
+            turn["analysis"] = analysis
+        if timings:
+            # Разбивка времени хода по агентам, LLM, эмбеддингам и поиску (tracing.py)
+            turn["timings"] = timings
 
         self.session_data["turns"].append(turn)
+        self._append(dict(turn, type="turn"))
 
     def add_feedback(self, feedback):
         if self.session_data:
             self.session_data["final_feedback"] = feedback
+            self._append({"type": "feedback", "final_feedback": feedback}, sync=True)
 
     def save(self):
         if not self.session_data:
             return None
 
-        filename = f"sessions/Лобанова_Карина_Маратовна_сценарий_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(self.session_data, f, ensure_ascii=False, indent=2)
+        # Основное хранилище (SQLite по умолчанию); JSON файл — формат экспорта
+        store = get_session_store()
+        filename = store.save_session(self.session_data)
+        if Config.SESSION_EXPORT_JSON and not isinstance(store, JSONSessionStore):
+            filename = JSONSessionStore(self.logs_dir).save_session(self.session_data)
+
+        # Итоговый JSON записан — журнал больше не нужен
+        self._close_wal()
+        if self.wal_path and os.path.exists(self.wal_path):
+            os.remove(self.wal_path)
+        self.wal_path = None
+
+        if self.echo:
+            print(f"✅ Лог сохранён: {filename}")
+        return filename
+
+    def resume(self, wal_path):
+        """Восстанавливает сессию из журнала JSONL и продолжает дописывать в него"""
+        session_data, valid_length = self._read_wal(wal_path)
+        if session_data is None:
+            # Без заголовка сессии журнал не восстановить — и обрезать его нельзя
+            raise ValueError(f"В журнале {wal_path} нет заголовка сессии")
+        self.session_data = session_data
+        self.wal_path = wal_path
+        if self.wal:
+            # Отрезаем оборванную запись, иначе следующая строка склеится с ней
+            with open(wal_path, 'r+b') as f:
+                f.truncate(valid_length)
+            self._open_wal()
+        # Интервью продолжается — старый итог больше не актуален, в том числе при следующем чтении журнала
+        if session_data.pop("final_feedback", None) is not None and self.wal:
+            self._append({"type": "reopen"}, sync=True)
+        return self.session_data
+
+    def restore(self, session_data):
+        """Продолжает сессию из сохранённого JSON: журнал заводится заново со всеми ходами"""
+        self.session_data = session_data
+        ensure_session_id(session_data)
+        if self.wal:
+            self.wal_path = self._new_wal_path()
+            self._open_wal()
+            header = {key: value for key, value in session_data.items() if key not in ("turns", "final_feedback")}
+            self._append(dict(header, type="session"))
+            for turn in session_data["turns"]:
+                self._append(dict(turn, type="turn"))
+            self._sync()
+        return self.session_data
+
+    @staticmethod
+    def load_wal(wal_path):
+        """Собирает session_data из журнала; оборванная последняя строка игнорируется"""
+        return InterviewLogger._read_wal(wal_path)[0]
+
+    @staticmethod
+    def _read_wal(wal_path):
+        session_data = None
+        valid_length = 0
+        with open(wal_path, 'rb') as f:
+            for line in f:
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError
+                    record = json.loads(line.decode('utf-8'))
+                except ValueError:
+                    break  # запись прервана падением процесса
+                valid_length += len(line)
+                record_type = record.pop("type", None)
+                if record_type == "session":
+                    session_data = dict(record, turns=[])
+                elif record_type == "turn" and session_data is not None:
+                    session_data["turns"].append(record)
+                elif record_type == "feedback" and session_data is not None:
+                    session_data["final_feedback"] = record["final_feedback"]
+                elif record_type == "reopen" and session_data is not None:
+                    session_data.pop("final_feedback", None)
+        return session_data, valid_length
+
+    def _new_wal_path(self):
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        return os.path.join(self.logs_dir, f"session_{stamp}_{self.session_data['session_id'][:8]}.jsonl")
+
+    def _open_wal(self):
+        self._close_wal()
+        self._wal_file = open(self.wal_path, 'a', encoding='utf-8')
+
+    def _close_wal(self):
+        if self._wal_file:
+            self._sync()
+            self._wal_file.close()
+            self._wal_file = None
+
+    def _append(self, record, sync=False):
+        """Одна строка на событие: flush сразу, fsync — пачками по fsync_every"""
+        if not self._wal_file:
+            return
+
+        self._wal_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._wal_file.flush()
+        self._unsynced += 1
+        if sync or self._unsynced >= self.fsync_every:
+            self._sync()
 
-        print(f"✅ Лог сохранён: {filename}")
-        return filename
\ No newline at end of file
+    def _sync(self):
+        if self._unsynced:
+            os.fsync(self._wal_file.fileno())
+            self._unsynced = 0
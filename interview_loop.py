@@ -1,19 +1,33 @@
 
+from concurrent.futures import ThreadPoolExecutor
 from interview_logger import InterviewLogger
 from dispatcher import InterviewDispatcher
-import re
+from config import Config
+from session_store import get_session_store
+from speculation import QuestionSpeculator
+import tracing
+import json
+import os
 
 
 class InterviewSystem:
-    def __init__(self):
-        self.logger = InterviewLogger()
-        self.dispatcher = InterviewDispatcher()
+    def __init__(self, dispatcher=None, echo=True):
+        # echo=False — ничего не печатаем в консоль (серверный режим)
+        self.echo = echo
+        self.logger = InterviewLogger(echo=echo)
+        self.dispatcher = dispatcher or InterviewDispatcher()
         self.candidate_name = None
         self.position = None
         self.last_question = None
         self.user_responses = []
         self.question_count = 0
         self.max_questions = 10
+        # Пул для работы, которая не должна задерживать кандидата
+        self.executor = ThreadPoolExecutor(max_workers=Config.BACKGROUND_WORKERS)
+        # Фоновые оценки ответов для map-reduce фидбэка, по одной на ответ
+        self._assessments = []
+        # Варианты следующего вопроса, которые готовятся, пока кандидат печатает
+        self.speculator = QuestionSpeculator(self.dispatcher)
 
     def start_interview(self, name, position):
         self.candidate_name = name
@@ -22,6 +36,7 @@ class InterviewSystem:
 
         self.logger.start_session(name, position)
         self.dispatcher.init_interviewer(name, position)
+        self._warm_up_knowledge_base()
 
         greeting = f"Привет, {name}! Я провожу техническое интервью для позиции {position}. Давайте начнём."
         first_q = "Расскажите о вашем опыте работы с основными технологиями для этой позиции?"
@@ -33,7 +48,55 @@ class InterviewSystem:
         self.logger.add_turn(first_q, "", f"[Interviewer] Первый вопрос")
 
         # Выводим только вопрос
-        print(f"\n🤖: {first_q}")
+        if self.echo:
+            print(f"\n🤖: {first_q}")
+        self._speculate(first_q)
+        return ""
+
+    def resume_session(self, log_path):
+        """Продолжает интервью по сохранённому (.json), незавершённому (.jsonl) логу или ID сессии в хранилище.
+
+        Состояние восстанавливается прямо из ходов лога, без повторных вызовов моделей.
+        """
+        if log_path.endswith(".jsonl"):
+            session_data = self.logger.resume(log_path)
+        else:
+            if os.path.exists(log_path):
+                with open(log_path, 'r', encoding='utf-8') as f:
+                    session_data = json.load(f)
+            else:
+                # Не файл — ищем сессию по ID в хранилище
+                session_data = get_session_store().load_session(log_path)
+                if session_data is None:
+                    raise ValueError(f"Сессия не найдена: {log_path}")
+            # Интервью продолжается — старый итог больше не актуален
+            session_data.pop("final_feedback", None)
+            self.logger.restore(session_data)
+
+        turns = session_data.get("turns", [])
+        answered = [turn for turn in turns if turn.get("user_message")]
+
+        self.candidate_name = session_data.get("participant_name")
+        self.position = session_data.get("position")
+        self.user_responses = [turn["user_message"] for turn in answered]
+        self.last_question = turns[-1]["agent_visible_message"] if turns else None
+        # Первый вопрос задаётся при старте, каждый ответ добавляет следующий
+        self.question_count = 1 + len(answered)
+
+        interviewer = self.dispatcher.init_interviewer(self.candidate_name, self.position)
+        interviewer.asked_questions = [turn["agent_visible_message"] for turn in answered]
+        self._warm_up_knowledge_base()
+
+        # Ответ в ходе относится к вопросу из предыдущего хода; оценки пересчитываются в фоне
+        self._assessments = []
+        for previous, turn in zip(turns, turns[1:]):
+            if turn.get("user_message"):
+                self._assess_in_background(previous.get("agent_visible_message", ""), turn["user_message"])
+
+        if self.echo and self.last_question:
+            print(f"\n🤖: {self.last_question}")
+        if self.last_question:
+            self._speculate(self.last_question)
         return ""
 
     def process_response(self, user_input):
@@ -41,147 +104,127 @@ class InterviewSystem:
             return self._end_interview()
 
         if not user_input.strip():
-            print("🤖: Пожалуйста, дайте развернутый ответ.")
+            if self.echo:
+                print("🤖: Пожалуйста, дайте развернутый ответ.")
             return ""
 
-        self.user_responses.append(user_input)
+        with tracing.turn() as trace:
+            return self._process_answer(user_input, trace)
 
-        # Observer анализирует ответ
-        observer_analysis = self._get_observer_analysis(user_input)
+    def _process_answer(self, user_input, trace):
+        """Один ход: анализ ответа, следующий вопрос и запись в лог"""
+        self.user_responses.append(user_input)
+        self._assess_in_background(self.last_question, user_input)
 
-        # Генерация вопроса
-        question = self.dispatcher.dispatch("generate_question", {
-            "instruction": observer_analysis,
-            "question_count": self.question_count + 1
+        # Observer одним вызовом: оценка, направление сложности, инструкция и мысли для лога
+        analysis = self.dispatcher.dispatch("analyze", {
+            "user_response": user_input,
+            "position": self.position,
+            "question": self.last_question
         })
+        observer_analysis = analysis["instruction"]
 
-        # ОЧИСТКА: убираем всё, что не вопрос
-        clean_question = self._clean_question(question)
+        # Вопрос, заранее сгенерированный для этого исхода, отдаётся без ожидания
+        speculative_question = self.speculator.take(analysis["difficulty"])
 
-        # Генерация мыслей для лога
-        interviewer_thoughts = self._generate_interviewer_thoughts(observer_analysis, user_input)
-
-        # Сохраняем в лог
-        thoughts = f"[Observer]: {observer_analysis}\n[Interviewer]: {interviewer_thoughts}"
-        self.logger.add_turn(clean_question, user_input, thoughts)
+        # Генерация вопроса
+        if speculative_question:
+            self.dispatcher.interviewer.asked_questions.append(speculative_question)
+            clean_question = speculative_question
+            if self.echo:
+                print(f"\n🤖: {clean_question}")
+        elif Config.STREAM_QUESTIONS and self.echo:
+            # Вопрос печатается по мере генерации, уже очищенным
+            print("\n🤖: ", end="", flush=True)
+            clean_question = self.dispatcher.dispatch("generate_question", {
+                "instruction": observer_analysis,
+                "question_count": self.question_count + 1,
+                "on_token": self._print_token,
+                "recent_answers": self.user_responses
+            })
+            print()
+        else:
+            # Вопрос приходит уже очищенным от пояснений и маркеров
+            clean_question = self.dispatcher.dispatch("generate_question", {
+                "instruction": observer_analysis,
+                "question_count": self.question_count + 1,
+                "recent_answers": self.user_responses
+            })
+
+            # В консоль ТОЛЬКО чистый вопрос
+            if self.echo:
+                print(f"\n🤖: {clean_question}")
+
+        thoughts = (f"[Observer]: {observer_analysis} (оценка: {analysis['score']}/10, "
+                    f"сложность: {analysis['difficulty']})\n[Interviewer]: {analysis['thoughts']}")
+        self.logger.add_turn(clean_question, user_input, thoughts, analysis=analysis,
+                             timings=trace.breakdown() if trace else None)
 
         self.last_question = clean_question
         self.question_count += 1
-
-        # В консоль ТОЛЬКО чистый вопрос
-        print(f"\n🤖: {clean_question}")
+        self._speculate(clean_question)
         return ""
 
-    def _get_observer_analysis(self, user_response):
-        """Анализ ответа кандидата"""
-        from config import MISTRAL_CLIENT
-
-        prompt = f"""Анализируй ответ кандидата на позицию {self.position}.
-
-Вопрос: {self.last_question}
-Ответ: {user_response}
-
-Проанализируй качество ответа и дай инструкцию для следующего вопроса:
-1. Если ответ хороший (глубокий, с примерами) - предложи повысить сложность
-2. Если ответ средний (знает основы) - предложи сохранить уровень
-3. Если ответ слабый (поверхностный) - предложи упростить вопрос
-4. Если ответ не по теме - предложи вернуть к теме
-
-Примеры инструкций:
-- "Кандидат хорошо ответил. Похвали его.  Задай более сложный вопрос о {self.position}."
-- "Ответ поверхностный. Поддержи. Задай более простой вопрос об основах."
-- "Ответ не по теме. Вежливо верни к теме {self.position}."
-
-Твоя инструкция (2-3 предложения):"""
-
-        response = MISTRAL_CLIENT.chat.complete(
-            model="mistral-large-latest",
-            messages=[
-                {"role": "system", "content": "Ты аналитик собеседований. Анализируй ответы кандидатов."},
-                {"role": "user", "content": prompt}
-            ]
-        )
-
-        return response.choices[0].message.content.strip()
-
-    def _clean_question(self, question):
-        """Очистка вопроса от пояснений"""
-        # Убираем всё после маркеров пояснений
-        stop_markers = [
-            'Почему', 'Например', 'Пример:', 'Если',
-            'Задача:', 'Цель:', '---', '###', '**Почему',
-            '📌', '💡', '🎯', '🤔', '🔍'
-        ]
-
-        clean_q = question.strip()
-
-        # Ищем настоящий вопрос (обычно это первое предложение/абзац)
-        lines = clean_q.split('\n')
-        for line in lines:
-            line = line.strip()
-            if line and len(line) > 10:
-                # Убираем маркеры
-                if not any(marker in line for marker in ['---', '###', '***']):
-                    clean_q = line
-                    break
-
-        # Убираем всё после стоп-слов
-        for marker in stop_markers:
-            if marker in clean_q:
-                clean_q = clean_q.split(marker)[0].strip()
-
-        # Убираем кавычки и лишние пробелы
-        clean_q = clean_q.replace('"', '').replace("'", "")
-        clean_q = re.sub(r'\s+', ' ', clean_q)
-
-        # Если вопрос слишком короткий, возвращаем первую осмысленную часть
-        if len(clean_q) < 15 and len(question) > 30:
-            # Берем первую строку без маркеров
-            for line in question.split('\n'):
-                line = line.strip()
-                if len(line) > 20 and not line.startswith(('*', '-', '#', 'Почему')):
-                    clean_q = line
-                    break
-
-        return clean_q.strip()
-
-    def _generate_interviewer_thoughts(self, observer_analysis, user_response):
-        """Генерация мыслей интервьюера для лога"""
-        from config import MISTRAL_CLIENT
-
-        prompt = f"""Ты - интервьюер. Сформулируй мысли для лога.
-
-Анализ Observer: {observer_analysis}
-Ответ кандидата: {user_response}
-
-Опиши свои мысли о качестве ответа и почему следующий вопрос будет такой сложности.
-(2 предложения):"""
-
-        response = MISTRAL_CLIENT.chat.complete(
-            model="mistral-large-latest",
-            messages=[
-                {"role": "system", "content": "Ты интервьюер. Пиши мысли для внутреннего лога."},
-                {"role": "user", "content": prompt}
-            ]
-        )
-
-        return response.choices[0].message.content.strip()
+    def _speculate(self, question):
+        """Готовит варианты следующего вопроса, если после этого ответа интервью продолжится"""
+        if self.question_count < self.max_questions:
+            self.speculator.start(question, self.question_count + 1, self.user_responses)
+
+    def _warm_up_knowledge_base(self):
+        """Модель и индекс базы знаний грузятся в фоне: до этого контекст позиции идёт без ранжирования"""
+        tracing.submit(self.executor, "background.kb_warm_up", self._warm_up)
+
+    def _warm_up(self):
+        knowledge_base = self.dispatcher.knowledge_base
+        if not knowledge_base.warm_up() and self.echo:
+            print(f"⚠️ Модель эмбеддингов недоступна, контекст позиции без ранжирования: "
+                  f"{knowledge_base.model_error}")
+
+    def _assess_in_background(self, question, answer):
+        """Map-шаг фидбэка: ответ оценивается, пока кандидат думает над следующим вопросом"""
+        if Config.FEEDBACK_MODE != "map_reduce":
+            return
+        self._assessments.append(tracing.submit(
+            self.executor, "background.assess_turn", self.dispatcher.dispatch, "assess_turn", {
+                "question": question,
+                "answer": answer,
+                "position": self.position
+            }))
+
+    def _print_token(self, text):
+        print(text, end="", flush=True)
 
     def _end_interview(self):
         """Завершение интервью"""
-        feedback = self.dispatcher.dispatch("generate_feedback", {
-            "interview_log": self.logger.session_data,
-            "position": self.position,
-            "user_responses": self.user_responses
-        })
+        self.speculator.discard()
+        if Config.SPECULATIVE_QUESTIONS and self.logger.session_data:
+            self.logger.session_data["speculation"] = self.speculator.stats.snapshot()
+        if Config.FEEDBACK_MODE == "map_reduce":
+            # К этому моменту почти все оценки готовы — остаётся дождаться последней
+            feedback = self.dispatcher.dispatch("reduce_feedback", {
+                "interview_log": self.logger.session_data,
+                "position": self.position,
+                "assessments": [future.result() for future in self._assessments],
+                "console": self.echo
+            })
+        else:
+            feedback = self.dispatcher.dispatch("generate_feedback", {
+                "interview_log": self.logger.session_data,
+                "position": self.position,
+                "user_responses": self.user_responses,
+                "console": self.echo
+            })
 
         if not isinstance(feedback, dict) or 'verdict' not in feedback:
             feedback = self._get_default_feedback()
 
         self.logger.add_feedback(feedback)
         log_file = self.logger.save()
+        self.executor.shutdown(wait=False)
+        tracing.export_metrics()
         candidate_name = self.candidate_name
-        self.dispatcher.feedback._print_feedback_to_console(candidate_name, self.position, feedback)
+        if self.echo:
+            self.dispatcher.feedback._print_feedback_to_console(candidate_name, self.position, feedback)
 
         result = f"\n{'=' * 50}"
         result += f"\n✅ ИНТЕРВЬЮ ЗАВЕРШЕНО!"
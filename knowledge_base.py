@@ -1,23 +1,210 @@
 
 import os
 import json
-import faiss
+import hashlib
+import threading
+import heapq
+from itertools import islice
 import numpy as np
-from sentence_transformers import SentenceTransformer
+from config import Config
+from lexical_index import LexicalIndex, reciprocal_rank_fusion
+from position_resolver import CATEGORY_POSITIONS, resolve_category
+from tracing import span
+
+
+# PQ с 8 битами на подвектор обучает 256 центроидов — точек нужно не меньше
+IVFPQ_MIN_TRAIN_DOCS = 256
+
+
+def _ivfpq_nlist(n_docs):
+    return max(1, int(4 * np.sqrt(n_docs)))
+
+
+def ivfpq_trainable(n_docs):
+    """Хватит ли документов на обучение IVF-PQ (кодбуки PQ и грубый квантизатор)"""
+    return n_docs >= max(IVFPQ_MIN_TRAIN_DOCS, _ivfpq_nlist(n_docs))
+
+
+def choose_index_backend(n_docs):
+    """Выбирает тип индекса по размеру корпуса"""
+    if Config.INDEX_BACKEND != "auto":
+        if Config.INDEX_BACKEND == "ivfpq" and not ivfpq_trainable(n_docs):
+            print(f"⚠️ IVF-PQ не обучить на {n_docs} документах (нужно от {IVFPQ_MIN_TRAIN_DOCS}) — "
+                  f"используется flat индекс")
+            return "flat"
+        return Config.INDEX_BACKEND
+    if n_docs >= Config.INDEX_IVFPQ_MIN_DOCS:
+        return "ivfpq"
+    if n_docs >= Config.INDEX_HNSW_MIN_DOCS:
+        return "hnsw"
+    return "flat"
+
+
+def build_faiss_index(embeddings, backend):
+    """Создаёт и заполняет FAISS индекс нужного типа"""
+    import faiss
+
+    n_docs, dimension = embeddings.shape
+    if backend == "flat":
+        index = faiss.IndexFlatL2(dimension)
+    elif backend == "hnsw":
+        index = faiss.IndexHNSWFlat(dimension, Config.HNSW_M)
+        index.hnsw.efConstruction = Config.HNSW_EF_CONSTRUCTION
+    elif backend == "ivfpq" and not ivfpq_trainable(n_docs):
+        print(f"⚠️ IVF-PQ не обучить на {n_docs} документах (нужно от {IVFPQ_MIN_TRAIN_DOCS}) — "
+              f"используется flat индекс")
+        index = faiss.IndexFlatL2(dimension)
+    elif backend == "ivfpq":
+        nlist = _ivfpq_nlist(n_docs)
+        # Число подвекторов PQ должно делить размерность
+        m = next(m for m in (48, 32, 24, 16, 12, 8, 4, 2, 1) if dimension % m == 0)
+        quantizer = faiss.IndexFlatL2(dimension)
+        index = faiss.IndexIVFPQ(quantizer, dimension, nlist, m, 8)
+        sample = embeddings[np.random.default_rng(0).permutation(n_docs)[:nlist * 64]]
+        index.train(np.ascontiguousarray(sample, dtype='float32'))
+    else:
+        raise ValueError(f"Неизвестный тип индекса: {backend}")
+
+    index.add(np.ascontiguousarray(embeddings, dtype='float32'))
+    return tune_faiss_index(index)
+
+
+def tune_faiss_index(index):
+    """Выставляет параметры поиска из Config (они не сохраняются в файле индекса)"""
+    backend = index_backend_of(index)
+    if backend == "hnsw":
+        index.hnsw.efSearch = Config.HNSW_EF_SEARCH
+    elif backend == "ivfpq":
+        index.nprobe = Config.IVF_NPROBE
+    return index
+
+
+def rerank_exact(queries, labels, embeddings, k):
+    """Точное L2 переранжирование кандидатов приближённого поиска"""
+    distances = np.full((len(queries), k), np.inf, dtype='float32')
+    result = np.full((len(queries), k), -1, dtype='int64')
+    for i, (query, candidates) in enumerate(zip(queries, labels)):
+        candidates = candidates[candidates >= 0]
+        if not len(candidates):
+            continue
+        vectors = np.asarray(embeddings[np.sort(candidates)], dtype='float32')
+        candidate_distances = ((vectors - query) ** 2).sum(axis=1)
+        order = np.argsort(candidate_distances)[:k]
+        distances[i, :len(order)] = candidate_distances[order]
+        result[i, :len(order)] = np.sort(candidates)[order]
+    return distances, result
+
+
+def index_backend_of(index):
+    """Определяет тип уже построенного индекса"""
+    import faiss
+
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivfpq"
+    return "flat"
 
 
 class ITKnowledgeBase:
     """RAG база знаний для всех IT собеседований"""
 
-    def __init__(self, model_name="sentence-transformers/all-MiniLM-L6-v2"):
-        self.model = SentenceTransformer(model_name)
+    INDEX_FILE = "index.faiss"
+    EMBEDDINGS_FILE = "embeddings.npy"
+    # Эмбеддинги из add_documents до persist: float32 строки подряд, дописываются батчами
+    PENDING_EMBEDDINGS_FILE = "embeddings.pending.f32"
+    # Строк за одну копию при сборке embeddings.npy в persist
+    PERSIST_BLOCK_ROWS = 65536
+    MANIFEST_FILE = "manifest.json"
+    # Чанки, добавленные через ingest.py (по одному JSON на строку)
+    CHUNKS_FILE = "chunks.jsonl"
+    INDEXED_FIELDS = ("category", "position", "topic")
+    # Документы из этой позиции подходят любой позиции
+    COMMON_POSITION = "All IT"
+
+    def __init__(self, model_name="sentence-transformers/all-MiniLM-L6-v2", index_dir=None, keep_documents=True):
+        # Модель и индекс тяжёлые (torch/faiss) — создаются при первом использовании
+        self.model_name = model_name
+        # False — тексты и метаданные из add_documents не держатся в памяти (ingest.py: база
+        # только пополняется и сохраняется, поиска по ней в этом процессе нет)
+        self.keep_documents = keep_documents
+        self.index_dir = index_dir or Config.KNOWLEDGE_INDEX_DIR
+        self._model = None
+        self._lock = threading.RLock()
         self.index = None
+        self.embeddings = None
         self.documents = []
         self.metadata = []
+        self._doc_hashes = []
+        self._doc_hash_set = set()
+        self.lexical = None
+        self._documents_loaded = False
+        # Ошибка загрузки модели в warm_up: повторно её не загружаем
+        self.model_error = None
+        self._ingested_count = 0
+        # Число строк в PENDING_EMBEDDINGS_FILE, ещё не перенесённых в embeddings.npy
+        self._pending_rows = 0
+        self._unsaved = False
+        # Инвертированные индексы: поле метаданных -> значение -> ID документов по возрастанию
+        self._postings = {field: {} for field in self.INDEXED_FIELDS}
+        # Те же списки ID как numpy массивы для фильтра FAISS (собираются при первом запросе)
+        self._posting_arrays = {}
 
-    def load_default_knowledge(self):
-        """Загружает базовые IT знания для всех направлений"""
-        it_knowledge = [
+    @property
+    def model(self):
+        """SentenceTransformer, загружаемый при первом обращении"""
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    from sentence_transformers import SentenceTransformer
+                    self._model = SentenceTransformer(self.model_name)
+        return self._model
+
+    @property
+    def model_loaded(self):
+        """Модель эмбеддингов уже в памяти (обращение к model её не загрузит)"""
+        return self._model is not None
+
+    @property
+    def vector_ready(self):
+        """Модель и векторный индекс в памяти — поиск по эмбеддингам ничего не загружает"""
+        return self._model is not None and self.index is not None
+
+    def warm_up(self):
+        """Загружает модель и векторный индекс (вызывается в фоне); False — модель недоступна"""
+        if self.model_error is not None:
+            return False
+        try:
+            self.ensure_loaded()
+            # Индекс мог подняться из кэша на диске без модели
+            self.model
+        except (ImportError, OSError) as e:
+            # sentence_transformers не установлен или модель не скачивается
+            self.model_error = e
+            return False
+        return True
+
+    def ensure_documents(self):
+        """Загружает документы и метаданные без модели и FAISS индекса (BM25 их достаточно)"""
+        if not self._documents_loaded:
+            with self._lock:
+                if not self._documents_loaded:
+                    self._load_documents()
+        return self
+
+    def ensure_loaded(self):
+        """Загружает документы и строит индекс, если это ещё не сделано"""
+        if self.index is None:
+            with self._lock:
+                if self.index is None:
+                    self.ensure_documents()
+                    self._load_vector_index()
+        return self
+
+    @staticmethod
+    def default_knowledge():
+        """Базовые IT знания для всех направлений (документы с метаданными)"""
+        return [
             # Backend разработка
             {
                 "text": "Java Spring Framework: фреймворк для создания enterprise приложений на Java. Основные модули: Spring Core, Spring MVC, Spring Boot.",
@@ -124,44 +311,466 @@ class ITKnowledgeBase:
              "category": "general", "topic": "methodologies", "position": "All IT"},
         ]
 
+    def load_default_knowledge(self):
+        """Загружает базовые IT знания для всех направлений"""
+        with self._lock:
+            self._load_documents()
+            self._load_vector_index()
+        return self
+
+    def _load_documents(self):
+        """Тексты и метаданные документов с инвертированными индексами — без модели"""
+        it_knowledge = self.default_knowledge()
+        ingested = self._load_ingested()
+        it_knowledge = it_knowledge + ingested
+
         self.documents = [item["text"] for item in it_knowledge]
         self.metadata = it_knowledge
+        # BM25 индекс строится при первом лексическом запросе
+        self.lexical = None
+        self._build_postings()
+        self._ingested_count = len(ingested)
+        self._documents_loaded = True
 
-        # Создаём векторный индекс
-        embeddings = self.model.encode(self.documents)
-        dimension = embeddings.shape[1]
-        self.index = faiss.IndexFlatL2(dimension)
-        self.index.add(embeddings.astype('float32'))
+    def _load_vector_index(self):
+        """Векторный индекс по загруженным документам (или из кэша на диске)"""
+        encoded = self._build_index()
+        print(f"✅ Загружено {len(self.documents)} документов IT знаний для всех направлений "
+              f"(из {Config.KNOWLEDGE_BASE_PATH}: {self._ingested_count}, перекодировано: {encoded})")
 
-        print(f"✅ Загружено {len(self.documents)} документов IT знаний для всех направлений")
-        return self
+    def _load_ingested(self):
+        """Читает чанки, ранее добавленные через ingest.py"""
+        chunks_path = os.path.join(self.index_dir, self.CHUNKS_FILE)
+        if not os.path.exists(chunks_path):
+            return []
 
-    def get_position_context(self, position):
-        """Возвращает контекст для конкретной позиции"""
-        relevant_docs = []
-        for i, meta in enumerate(self.metadata):
-            if meta["position"] == position or meta["position"] == "All IT":
-                relevant_docs.append(self.documents[i])
+        items = []
+        with open(chunks_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    items.append(json.loads(line))
+        return items
 
-        if relevant_docs:
-            return "Контекст для позиции:\n" + "\n".join(relevant_docs[:5])
-        return ""
+    def has_document(self, text):
+        """Есть ли документ с таким текстом в базе"""
+        self.ensure_loaded()
+        return self._hash_text(text) in self._doc_hash_set
 
-    def search_by_position(self, position, query, k=3):
-        """Ищет знания для конкретной позиции"""
-        # Сначала находим категорию позиции
-        category_map = {
-            "backend": ["backend developer", "бэкенд", "back-end"],
-            "frontend": ["frontend developer", "фронтенд", "front-end"],
-            "qa": ["qa engineer", "тестировщик", "quality assurance"],
-            "devops": ["devops engineer", "инфраструктура"],
-            "ml": ["data scientist", "ml engineer", "data engineer", "машинное обучение"]
+    def add_documents(self, items, embeddings):
+        """Дописывает документы с готовыми эмбеддингами в индекс без его перестройки"""
+        self.ensure_loaded()
+        embeddings = np.ascontiguousarray(embeddings, dtype='float32')
+
+        with self._lock:
+            self.index.add(embeddings)
+            if self.keep_documents:
+                self.documents.extend(item["text"] for item in items)
+                self.metadata.extend(items)
+                if self.lexical is not None:
+                    self.lexical.add(item["text"] for item in items)
+                self._index_metadata(len(self.metadata) - len(items))
+            for item in items:
+                doc_hash = self._hash_text(item["text"])
+                self._doc_hashes.append(doc_hash)
+                self._doc_hash_set.add(doc_hash)
+
+            os.makedirs(self.index_dir, exist_ok=True)
+            # Эмбеддинги батча сразу на диск — в памяти они не копятся до persist
+            with open(os.path.join(self.index_dir, self.PENDING_EMBEDDINGS_FILE), 'ab') as f:
+                f.write(embeddings.tobytes())
+            self._pending_rows += len(embeddings)
+            self._unsaved = True
+
+            with open(os.path.join(self.index_dir, self.CHUNKS_FILE), 'a', encoding='utf-8') as f:
+                for item in items:
+                    f.write(json.dumps(item, ensure_ascii=False) + "\n")
+
+    def persist(self):
+        """Сохраняет на диск индекс и эмбеддинги документов, добавленных через add_documents"""
+        with self._lock:
+            if not self._unsaved:
+                return
+            embeddings_path = os.path.join(self.index_dir, self.EMBEDDINGS_FILE)
+            self._write_merged_embeddings(embeddings_path + ".tmp")
+            self.embeddings = None
+            self._save_cache(None, self._doc_hashes, self._corpus_key(self._doc_hashes))
+            self.embeddings = np.load(embeddings_path, mmap_mode='r')
+            self._discard_pending_embeddings()
+            self._unsaved = False
+
+    def _write_merged_embeddings(self, path):
+        """Сохранённые и дописанные эмбеддинги в новый .npy — блоками, без матрицы целиком в памяти"""
+        dimension = self.index.d
+        pending_path = os.path.join(self.index_dir, self.PENDING_EMBEDDINGS_FILE)
+        sources = [self.embeddings] if self.embeddings is not None else []
+        if self._pending_rows:
+            sources.append(np.memmap(pending_path, dtype='float32', mode='r', shape=(self._pending_rows, dimension)))
+
+        merged = np.lib.format.open_memmap(path, mode='w+', dtype='float32',
+                                           shape=(sum(len(source) for source in sources), dimension))
+        row = 0
+        for source in sources:
+            for start in range(0, len(source), self.PERSIST_BLOCK_ROWS):
+                block = source[start:start + self.PERSIST_BLOCK_ROWS]
+                merged[row:row + len(block)] = block
+                row += len(block)
+        merged.flush()
+        del merged, sources
+
+    def _discard_pending_embeddings(self):
+        pending_path = os.path.join(self.index_dir, self.PENDING_EMBEDDINGS_FILE)
+        if os.path.exists(pending_path):
+            os.remove(pending_path)
+        self._pending_rows = 0
+
+    def _build_index(self):
+        """Строит индекс по self.documents, перекодируя только новые и изменённые тексты"""
+        import faiss
+
+        doc_hashes = [self._hash_text(text) for text in self.documents]
+        corpus_key = self._corpus_key(doc_hashes)
+        backend = choose_index_backend(len(self.documents))
+        manifest = self._read_manifest()
+        index_path = os.path.join(self.index_dir, self.INDEX_FILE)
+        embeddings_path = os.path.join(self.index_dir, self.EMBEDDINGS_FILE)
+
+        # Корпус не изменился — индекс и эмбеддинги просто читаются с диска
+        self._doc_hashes = doc_hashes
+        self._doc_hash_set = set(doc_hashes)
+        # Несохранённые строки прошлого запуска не соответствуют новому корпусу
+        self._discard_pending_embeddings()
+        self._unsaved = False
+
+        if (manifest.get("key") == corpus_key and manifest.get("backend") == backend
+                and os.path.exists(index_path) and os.path.exists(embeddings_path)):
+            self.embeddings = np.load(embeddings_path, mmap_mode='r')
+            self.index = tune_faiss_index(faiss.read_index(index_path))
+            return 0
+
+        # Эмбеддинги неизменившихся документов берём из прошлого кэша
+        cached_rows = {}
+        cached_embeddings = None
+        if manifest.get("model") == self.model_name and os.path.exists(embeddings_path):
+            cached_embeddings = np.load(embeddings_path, mmap_mode='r')
+            for row, doc_hash in enumerate(manifest.get("doc_hashes", [])[:len(cached_embeddings)]):
+                cached_rows[doc_hash] = row
+
+        missing = [i for i, doc_hash in enumerate(doc_hashes) if doc_hash not in cached_rows]
+        new_embeddings = None
+        if missing:
+            new_embeddings = self.model.encode([self.documents[i] for i in missing]).astype('float32')
+            dimension = new_embeddings.shape[1]
+        else:
+            dimension = cached_embeddings.shape[1]
+
+        embeddings = np.empty((len(self.documents), dimension), dtype='float32')
+        for i, doc_hash in enumerate(doc_hashes):
+            if doc_hash in cached_rows:
+                embeddings[i] = cached_embeddings[cached_rows[doc_hash]]
+        if missing:
+            embeddings[missing] = new_embeddings
+        # Освобождаем mmap старого файла до перезаписи
+        cached_embeddings = None
+        self.embeddings = None
+
+        self.index = build_faiss_index(embeddings, backend)
+
+        self._save_cache(embeddings, doc_hashes, corpus_key)
+        self.embeddings = np.load(embeddings_path, mmap_mode='r')
+        return len(missing)
+
+    def _save_cache(self, embeddings, doc_hashes, corpus_key):
+        """Атомарно сохраняет индекс, эмбеддинги и манифест.
+
+        embeddings=None — embeddings.npy.tmp уже записан (persist собирает его блоками).
+        """
+        import faiss
+
+        os.makedirs(self.index_dir, exist_ok=True)
+        index_path = os.path.join(self.index_dir, self.INDEX_FILE)
+        embeddings_path = os.path.join(self.index_dir, self.EMBEDDINGS_FILE)
+        manifest_path = os.path.join(self.index_dir, self.MANIFEST_FILE)
+
+        # Старый манифест описывает старые файлы: удаляем его до замены, чтобы
+        # после падения посередине кэш считался невалидным, а не сопоставлял
+        # старые doc_hashes со строками новых эмбеддингов
+        if os.path.exists(manifest_path):
+            os.remove(manifest_path)
+
+        faiss.write_index(self.index, index_path + ".tmp")
+        os.replace(index_path + ".tmp", index_path)
+
+        if embeddings is not None:
+            with open(embeddings_path + ".tmp", 'wb') as f:
+                np.save(f, embeddings)
+        os.replace(embeddings_path + ".tmp", embeddings_path)
+
+        # Манифест пишется последним: пока его нет, кэш считается невалидным (см. выше)
+        manifest = {
+            "model": self.model_name,
+            "key": corpus_key,
+            "backend": index_backend_of(self.index),
+            "doc_hashes": doc_hashes
         }
+        with open(manifest_path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        os.replace(manifest_path + ".tmp", manifest_path)
+
+    def _build_postings(self):
+        """Строит инвертированные индексы по всем документам"""
+        self._postings = {field: {} for field in self.INDEXED_FIELDS}
+        self._posting_arrays = {}
+        self._index_metadata(0)
+
+    def _index_metadata(self, start):
+        """Добавляет в инвертированные индексы документы начиная с ID start (ID только растут)"""
+        for doc_id in range(start, len(self.metadata)):
+            meta = self.metadata[doc_id]
+            for field in self.INDEXED_FIELDS:
+                value = meta.get(field)
+                self._postings[field].setdefault(value, []).append(doc_id)
+                self._posting_arrays.pop((field, value), None)
+
+    def _posting_ids(self, field, value):
+        """ID документов с meta[field] == value (numpy массив, по возрастанию)"""
+        key = (field, value)
+        ids = self._posting_arrays.get(key)
+        if ids is None:
+            # Под блокировкой: add_documents не допишет список, пока из него строится массив
+            with self._lock:
+                ids = np.array(self._postings[field].get(value, ()), dtype='int64')
+                self._posting_arrays[key] = ids
+        return ids
+
+    def _filter_ids(self, category=None, position=None, topic=None):
+        """ID документов, подходящих под фильтр (None — фильтра нет)"""
+        ids = None
+        for field, value in (("category", category), ("position", position), ("topic", topic)):
+            if value:
+                field_ids = self._posting_ids(field, value)
+                ids = field_ids if ids is None else np.intersect1d(ids, field_ids, assume_unique=True)
+        return ids
+
+    def encode(self, texts):
+        """Эмбеддинги списка текстов за один проход модели"""
+        texts = list(texts)
+        with span("embedding.encode", texts=len(texts)):
+            return np.asarray(self.model.encode(texts), dtype='float32')
+
+    def search(self, queries, category=None, k=3, position=None, topic=None, mode=None):
+        """Поиск в режиме mode (по умолчанию Config.RETRIEVAL_MODE).
+
+        Принимает строку или список строк. Список кодируется одним вызовом
+        model.encode и ищется одним index.search; для списка возвращается
+        список результатов на каждый запрос. В режиме "lexical" модель и FAISS
+        индекс не загружаются — BM25 строится по текстам документов.
+        """
+        single = isinstance(queries, str)
+        query_list = [queries] if single else list(queries)
+        if not query_list:
+            return []
+
+        mode = mode or Config.RETRIEVAL_MODE
+        embeddings = self.encode(query_list) if mode != "lexical" else None
+        results = self.search_encoded(query_list, embeddings, category=category, k=k, position=position,
+                                      topic=topic, mode=mode)
+        return results[0] if single else results
+
+    def search_encoded(self, queries, query_embeddings, category=None, k=3, position=None, topic=None, mode=None):
+        """Поиск по текстам запросов и их готовым эмбеддингам в режиме mode.
+
+        "hybrid" берёт k * HYBRID_FETCH_FACTOR кандидатов из FAISS и из BM25 и
+        сливает списки через reciprocal rank fusion.
+        """
+        mode = mode or Config.RETRIEVAL_MODE
+        if mode == "vector":
+            return self.search_embeddings(query_embeddings, category=category, k=k, position=position, topic=topic)
+        if mode == "lexical":
+            return self.search_lexical(queries, category=category, k=k, position=position, topic=topic)
+        if mode != "hybrid":
+            raise ValueError(f"Неизвестный режим поиска: {mode}")
 
-        category = "general"
-        for cat, keywords in category_map.items():
-            if any(keyword in position.lower() for keyword in keywords):
-                category = cat
-                break
+        fetch_k = k * Config.HYBRID_FETCH_FACTOR
+        vector_results = self.search_embeddings(query_embeddings, category=category, k=fetch_k, position=position,
+                                                topic=topic)
+        lexical_results = self.search_lexical(queries, category=category, k=fetch_k, position=position, topic=topic)
+        with span("retrieval.fuse", queries=len(queries), k=k):
+            results = []
+            for vector_hits, lexical_hits in zip(vector_results, lexical_results):
+                by_id = {hit["id"]: hit for hit in lexical_hits}
+                for hit in vector_hits:
+                    by_id.setdefault(hit["id"], {}).update(hit)
+                fused = reciprocal_rank_fusion([[hit["id"] for hit in vector_hits],
+                                                [hit["id"] for hit in lexical_hits]], limit=k)
+                hits = []
+                for rank, (doc_id, score) in enumerate(fused, 1):
+                    hit = dict(by_id[doc_id], rank=rank, score=score)
+                    hits.append(hit)
+                results.append(hits)
+        return results
+
+    def _lexical_index(self):
+        """BM25 индекс по self.documents (строится один раз, дальше дополняется в add_documents)"""
+        self.ensure_documents()
+        if self.lexical is None:
+            with self._lock:
+                if self.lexical is None:
+                    lexical = LexicalIndex()
+                    lexical.add(self.documents)
+                    self.lexical = lexical
+        return self.lexical
+
+    def search_lexical(self, queries, category=None, k=3, position=None, topic=None):
+        """BM25 поиск по списку запросов: результаты в том же формате, что у search_embeddings"""
+        lexical = self._lexical_index()
+        ids = self._filter_ids(category, position, topic)
+        results = []
+        with span("bm25.search", queries=len(queries), k=k):
+            for query in queries:
+                hits = []
+                for doc_id, score in lexical.search(query, k=k, ids=ids):
+                    hit = dict(self.metadata[doc_id])
+                    hit.update({"id": doc_id, "rank": len(hits) + 1, "bm25": score, "score": score})
+                    hits.append(hit)
+                results.append(hits)
+        return results
+
+    def search_embeddings(self, query_embeddings, category=None, k=3, position=None, topic=None, ids=None):
+        """Поиск по готовым эмбеддингам запросов: результаты с рангом, оценкой и метаданными.
+
+        ids — явный список ID кандидатов вместо фильтра по метаданным.
+        """
+        with span("faiss.search", queries=len(np.atleast_2d(query_embeddings)), k=k) as trace:
+            distances, labels = self._search_embeddings(query_embeddings, k=k, category=category, position=position,
+                                                        topic=topic, ids=ids)
+            trace.set("backend", index_backend_of(self.index))
+
+        results = []
+        for row_distances, row_labels in zip(distances, labels):
+            hits = []
+            for distance, doc_id in zip(row_distances, row_labels):
+                if doc_id < 0:
+                    continue
+                hit = dict(self.metadata[doc_id])
+                hit.update({
+                    "id": int(doc_id),
+                    "rank": len(hits) + 1,
+                    "distance": float(distance),
+                    "score": float(1.0 / (1.0 + max(float(distance), 0.0)))
+                })
+                hits.append(hit)
+            results.append(hits)
+        return results
+
+    def _search_embeddings(self, query_embeddings, k=3, category=None, position=None, topic=None, ids=None):
+        """Поиск по индексу с фильтром, применяемым внутри поиска, а не после него"""
+        import faiss
+
+        self.ensure_loaded()
+        queries = np.ascontiguousarray(np.atleast_2d(query_embeddings), dtype='float32')
+        if self._unsaved:
+            # Точный перебор и переранжирование читают эмбеддинги с диска
+            self.persist()
+        if ids is None:
+            ids = self._filter_ids(category, position, topic)
+
+        backend = index_backend_of(self.index)
+        # PQ-расстояния грубые: берём больше кандидатов и уточняем по эмбеддингам
+        fetch_k = k * Config.IVF_RERANK_FACTOR if backend == "ivfpq" else k
+
+        if ids is None:
+            distances, labels = self.index.search(queries, fetch_k)
+            if backend == "ivfpq":
+                return rerank_exact(queries, labels, self.embeddings, k)
+            return distances, labels
+
+        if len(ids) == 0:
+            empty = np.full((len(queries), k), -1, dtype='int64')
+            return np.full((len(queries), k), np.inf, dtype='float32'), empty
+
+        # Маленькое подмножество дешевле и точнее перебрать целиком
+        if len(ids) <= Config.INDEX_EXACT_FILTER_MAX:
+            subset = np.asarray(self.embeddings[ids], dtype='float32')
+            distances = ((queries ** 2).sum(axis=1)[:, None] - 2 * queries @ subset.T
+                         + (subset ** 2).sum(axis=1)[None, :])
+            order = np.argsort(distances, axis=1)[:, :k]
+            top_distances = np.take_along_axis(distances, order, axis=1)
+            labels = ids[order]
+            if order.shape[1] < k:
+                pad = k - order.shape[1]
+                top_distances = np.pad(top_distances, ((0, 0), (0, pad)), constant_values=np.inf)
+                labels = np.pad(labels, ((0, 0), (0, pad)), constant_values=-1)
+            return top_distances.astype('float32'), labels
+
+        selector = faiss.IDSelectorBatch(ids)
+        if backend == "hnsw":
+            params = faiss.SearchParametersHNSW(sel=selector, efSearch=Config.HNSW_EF_SEARCH)
+        elif backend == "ivfpq":
+            params = faiss.SearchParametersIVF(sel=selector, nprobe=Config.IVF_NPROBE)
+        else:
+            params = faiss.SearchParameters(sel=selector)
+
+        distances, labels = self.index.search(queries, fetch_k, params=params)
+        if backend == "ivfpq":
+            return rerank_exact(queries, labels, self.embeddings, k)
+        return distances, labels
+
+    def _read_manifest(self):
+        manifest_path = os.path.join(self.index_dir, self.MANIFEST_FILE)
+        if not os.path.exists(manifest_path):
+            return {}
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _corpus_key(self, doc_hashes):
+        """Ключ кэша: модель эмбеддингов + тексты всех документов по порядку"""
+        digest = hashlib.sha256(self.model_name.encode('utf-8'))
+        for doc_hash in doc_hashes:
+            digest.update(doc_hash.encode('ascii'))
+        return digest.hexdigest()
+
+    @staticmethod
+    def _hash_text(text):
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def get_position_context(self, position, recent_answers=None, limit=5):
+        """Возвращает контекст для конкретной позиции.
+
+        Кандидаты берутся из инвертированного индекса: документы позиции (если
+        их нет — категории позиции) и общие документы. С recent_answers они
+        ранжируются по близости к последним ответам кандидата, иначе идут по
+        порядку. Ранжирование — только когда модель и индекс уже загружены
+        (warm_up): сам вызов их не загружает.
+        """
+        self.ensure_documents()
+        positions = self._postings["position"]
+        if not positions.get(position):
+            position = CATEGORY_POSITIONS.get(resolve_category(position, self))
+        own_ids = positions.get(position, ())
+        common_ids = positions.get(self.COMMON_POSITION, ()) if position != self.COMMON_POSITION else ()
+        if not own_ids and not common_ids:
+            return ""
+
+        doc_ids = None
+        answers = [answer for answer in (recent_answers or []) if answer and answer.strip()]
+        if answers and self.vector_ready:
+            candidates = np.union1d(self._posting_ids("position", position),
+                                    self._posting_ids("position", self.COMMON_POSITION))
+            # Одно среднее по ответам: контекст должен подходить интервью в целом
+            query = self.encode(answers).mean(axis=0, keepdims=True)
+            doc_ids = [hit["id"] for hit in self.search_embeddings(query, k=limit, ids=candidates)[0]]
+        if doc_ids is None:
+            # Порядок документов в базе; heapq.merge не разворачивает списки целиком
+            doc_ids = list(islice(heapq.merge(own_ids, common_ids), limit))
+
+        return "Контекст для позиции:\n" + "\n".join(self.documents[i] for i in doc_ids)
+
+    def search_by_position(self, position, query, k=3):
+        """Ищет знания для конкретной позиции"""
+        self.ensure_loaded()
 
-        return self.search(query, category=category, k=k)
\ No newline at end of file
+        return self.search(query, category=resolve_category(position, self), k=k)
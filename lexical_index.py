@@ -0,0 +1,117 @@
+"""Лексический поиск BM25 по документам базы знаний и слияние с векторным поиском.
+
+Эмбеддинги MiniLM плохо различают точные технические термины ("IndexFlatL2",
+"Spring Boot", "LSTM"), особенно в смешанном русско-английском тексте.
+BM25 находит их по совпадению токенов, а reciprocal rank fusion объединяет
+оба списка без подбора весов: документ получает сумму 1 / (RRF_K + ранг).
+"""
+import math
+import re
+import threading
+from collections import Counter
+
+import numpy as np
+
+from config import Config
+
+# Слово с внутренними . - / и хвостовыми + # целиком: node.js, c++, c#, ci-cd, tcp/ip
+_TOKEN_RE = re.compile(r"[^\W_]+(?:[./\-][^\W_]+)*[+#]*")
+_PART_RE = re.compile(r"[./\-]")
+_CYRILLIC_RE = re.compile(r"[а-яё]")
+# Русские слова сравниваются по началу: "индексы", "индексов" -> "индек"
+STEM_LENGTH = 5
+
+
+def tokenize(text):
+    """Токены для BM25: составной термин и его части, русские слова — по основе"""
+    tokens = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        parts = _PART_RE.split(token)
+        if len(parts) > 1:
+            tokens.extend(part for part in parts if len(part) > 1)
+        if _CYRILLIC_RE.search(token) and len(token) > STEM_LENGTH:
+            token = token[:STEM_LENGTH]
+        if len(token) > 1 or token.isdigit():
+            tokens.append(token)
+    return tokens
+
+
+def reciprocal_rank_fusion(rankings, limit, rrf_k=None):
+    """Сливает списки ID (каждый по убыванию релевантности): [(id, score)] по убыванию score"""
+    rrf_k = Config.RRF_K if rrf_k is None else rrf_k
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, 1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (rrf_k + rank)
+    return sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+
+
+class LexicalIndex:
+    """Инвертированный индекс терм -> (ID документов, частоты) с ранжированием BM25"""
+
+    def __init__(self, k1=None, b=None):
+        self.k1 = Config.BM25_K1 if k1 is None else k1
+        self.b = Config.BM25_B if b is None else b
+        self._lock = threading.Lock()
+        self._postings = {}
+        # Постинги как numpy массивы (собираются при первом запросе терма)
+        self._arrays = {}
+        self._lengths = []
+        self._lengths_array = None
+        self._total_length = 0
+
+    def __len__(self):
+        return len(self._lengths)
+
+    def add(self, texts):
+        """Добавляет документы; их ID продолжают нумерацию (как в FAISS индексе)"""
+        with self._lock:
+            for text in texts:
+                doc_id = len(self._lengths)
+                tokens = tokenize(text)
+                for term, tf in Counter(tokens).items():
+                    postings = self._postings.get(term)
+                    if postings is None:
+                        postings = self._postings[term] = ([], [])
+                    postings[0].append(doc_id)
+                    postings[1].append(tf)
+                    self._arrays.pop(term, None)
+                self._lengths.append(len(tokens))
+                self._total_length += len(tokens)
+            self._lengths_array = None
+
+    def _term_arrays(self, term):
+        arrays = self._arrays.get(term)
+        if arrays is None:
+            doc_ids, tfs = self._postings[term]
+            arrays = self._arrays[term] = (np.array(doc_ids, dtype='int64'), np.array(tfs, dtype='float32'))
+        return arrays
+
+    def search(self, query, k=3, ids=None):
+        """Top-k [(id, score)] по BM25; ids — ограничение кандидатов (фильтр по метаданным)"""
+        with self._lock:
+            n_docs = len(self._lengths)
+            terms = [term for term in dict.fromkeys(tokenize(query)) if term in self._postings]
+            if not n_docs or not terms:
+                return []
+            if self._lengths_array is None:
+                self._lengths_array = np.array(self._lengths, dtype='float32')
+            lengths = self._lengths_array
+            average_length = self._total_length / n_docs or 1.0
+
+            scores = np.zeros(n_docs, dtype='float32')
+            for term in terms:
+                doc_ids, tfs = self._term_arrays(term)
+                idf = math.log(1.0 + (n_docs - len(doc_ids) + 0.5) / (len(doc_ids) + 0.5))
+                norm = self.k1 * (1.0 - self.b + self.b * lengths[doc_ids] / average_length)
+                scores[doc_ids] += idf * tfs * (self.k1 + 1.0) / (tfs + norm)
+
+        if ids is not None:
+            candidates = np.asarray(ids, dtype='int64')
+            candidates = candidates[scores[candidates] > 0]
+        else:
+            candidates = np.flatnonzero(scores)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        order = np.lexsort((candidates, -scores[candidates]))
+        return [(int(candidates[i]), float(scores[candidates[i]])) for i in order]
@@ -0,0 +1,128 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from config import Config
+from llm_client import chat_complete
+from tracing import span
+
+
+class CompletionCache:
+    """Кэш ответов LLM по хэшу запроса (модель, сообщения, параметры сэмплирования).
+
+    Первый уровень — LRU в памяти процесса, второй (опционально) — файл SQLite,
+    который переживает перезапуск и может использоваться несколькими процессами.
+    Все операции потокобезопасны.
+    """
+
+    def __init__(self, max_entries=1024, sqlite_path=None):
+        self.max_entries = max_entries
+        self.sqlite_path = sqlite_path
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._db = None
+        if sqlite_path:
+            self._db = sqlite3.connect(sqlite_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS completions ("
+                "key TEXT PRIMARY KEY, content TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    @staticmethod
+    def make_key(model, messages, params):
+        payload = json.dumps(
+            {"model": model, "messages": messages, "params": params},
+            sort_keys=True, ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key, agent):
+        """Текст ответа из кэша или None"""
+        with self._lock:
+            content = self._memory.get(key)
+            if content is not None:
+                self._memory.move_to_end(key)
+            elif self._db is not None:
+                row = self._db.execute("SELECT content FROM completions WHERE key = ?", (key,)).fetchone()
+                if row:
+                    content = row[0]
+                    self._remember(key, content)
+
+            counters = self._stats.setdefault(agent, {"hits": 0, "misses": 0})
+            counters["hits" if content is not None else "misses"] += 1
+            return content
+
+    def put(self, key, content):
+        with self._lock:
+            self._remember(key, content)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO completions (key, content, created) VALUES (?, ?, ?)",
+                    (key, content, time.time())
+                )
+                self._db.commit()
+
+    def stats(self):
+        """Попадания, промахи и hit rate по каждому агенту"""
+        with self._lock:
+            result = {}
+            for agent, counters in self._stats.items():
+                lookups = counters["hits"] + counters["misses"]
+                result[agent] = dict(counters, hit_rate=counters["hits"] / lookups if lookups else 0.0)
+            return result
+
+    def _remember(self, key, content):
+        self._memory[key] = content
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_completion_cache():
+    """Общий для всех сессий процесса кэш ответов"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = CompletionCache(Config.LLM_CACHE_SIZE, Config.LLM_CACHE_SQLITE_PATH)
+    return _cache
+
+
+def complete(agent, model, messages, validate=None, use_cache=True, **params):
+    """chat.complete с кэшем для агентов из Config.LLM_CACHE_AGENTS; возвращает текст ответа.
+
+    validate(content) должен бросить исключение, если ответ не разбирается: такой
+    ответ не кэшируется, исключение уходит вызывающему (повтор спросит модель заново).
+    use_cache=False — не читать кэш (повторная попытка); годный ответ всё равно сохраняется.
+    Агенты из Config.LLM_HEDGE_AGENTS на критическом пути хода и вызываются с хеджированием.
+    """
+    with span(f"llm.{agent}", model=model) as trace:
+        hedge = agent in Config.LLM_HEDGE_AGENTS
+        if agent not in Config.LLM_CACHE_AGENTS:
+            response = chat_complete(model=model, messages=messages, hedge=hedge, **params)
+            content = response.choices[0].message.content
+            if validate is not None:
+                validate(content)
+            return content
+
+        cache = get_completion_cache()
+        key = cache.make_key(model, messages, params)
+        content = cache.get(key, agent) if use_cache else None
+        trace.add("cache_misses" if content is None else "cache_hits", 1)
+        if content is None:
+            response = chat_complete(model=model, messages=messages, hedge=hedge, **params)
+            content = response.choices[0].message.content
+            if validate is not None:
+                validate(content)
+            cache.put(key, content)
+        return content
@@ -0,0 +1,276 @@
+"""Единая точка вызовов Mistral для всех агентов.
+
+Поверх общего клиента (пул keep-alive соединений, см. Config.get_mistral_client):
+- ограничение числа одновременных запросов на процесс;
+- общий для всех сессий token bucket на частоту запросов;
+- дедлайн на вызов (timeout_ms) с учётом повторов;
+- повторы с экспоненциальной паузой и jitter на 429/5xx и сетевые ошибки;
+- хеджирование: если отправленный запрос задерживается, параллельно уходит
+  его копия — только когда есть свободный слот и токен частоты.
+"""
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from contextlib import contextmanager
+
+import tracing
+from config import Config, MISTRAL_CLIENT
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+_call_slots = None
+_slots_lock = threading.Lock()
+_bucket = None
+_hedge_pool = None
+_stats = {"calls": 0, "retries": 0, "failures": 0, "hedges": 0, "hedge_wins": 0, "hedges_skipped": 0,
+          "throttled": 0}
+_stats_lock = threading.Lock()
+
+
+def _slots():
+    """Семафор на число одновременных запросов к LLM в процессе (общий для всех сессий)"""
+    global _call_slots
+    if _call_slots is None:
+        with _slots_lock:
+            if _call_slots is None:
+                _call_slots = threading.BoundedSemaphore(Config.MAX_CONCURRENT_LLM_CALLS)
+    return _call_slots
+
+
+class TokenBucket:
+    """Не больше rate запросов в секунду в среднем, с пиком до capacity (rate=0 — без ограничения)"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate or 0.0
+        self.capacity = max(capacity or 1.0, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        return now
+
+    def try_acquire(self):
+        """Берёт токен без ожидания; False, если свободного токена сейчас нет"""
+        if not self.rate:
+            return True
+        with self._lock:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+    def acquire(self, deadline=None):
+        """Ждёт свободный токен; False, если дедлайн наступит раньше"""
+        if not self.rate:
+            return True
+        while True:
+            with self._lock:
+                now = self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                delay = (1 - self._tokens) / self.rate
+            if deadline is not None and now + delay > deadline:
+                return False
+            time.sleep(delay)
+
+
+def get_rate_limiter():
+    """Ограничитель частоты запросов, общий для всех сессий процесса"""
+    global _bucket
+    if _bucket is None:
+        with _slots_lock:
+            if _bucket is None:
+                _bucket = TokenBucket(Config.LLM_RATE_LIMIT_RPS, Config.LLM_RATE_LIMIT_BURST)
+    return _bucket
+
+
+def _get_hedge_pool():
+    global _hedge_pool
+    if _hedge_pool is None:
+        with _slots_lock:
+            if _hedge_pool is None:
+                # Основные запросы и копии; одновременно к API всё равно не больше MAX_CONCURRENT_LLM_CALLS
+                _hedge_pool = ThreadPoolExecutor(max_workers=Config.MAX_CONCURRENT_LLM_CALLS * 2,
+                                                 thread_name_prefix="llm-hedge")
+    return _hedge_pool
+
+
+def _count(field, value=1):
+    with _stats_lock:
+        _stats[field] += value
+
+
+def get_client_stats():
+    """Счётчики вызовов, повторов и хеджирования с начала работы процесса"""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def _status_of(error):
+    return getattr(error, "status_code", None) or getattr(getattr(error, "raw_response", None), "status_code", None)
+
+
+def _is_retryable(error):
+    if _status_of(error) in RETRYABLE_STATUS:
+        return True
+    import httpx
+    # Таймаут, обрыв соединения или пустой ответ сервера
+    return isinstance(error, httpx.TransportError) or type(error).__name__ == "NoResponseError"
+
+
+def _retry_after(error):
+    """Пауза из заголовка Retry-After, если сервер её указал"""
+    headers = getattr(getattr(error, "raw_response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _with_retries(call, request, timeout_ms, retries):
+    """Вызывает call(**request) до retries+1 раз в пределах общего дедлайна timeout_ms"""
+    timeout_ms = timeout_ms or Config.LLM_TIMEOUT_MS
+    retries = Config.LLM_MAX_RETRIES if retries is None else retries
+    deadline = time.monotonic() + timeout_ms / 1000
+
+    trace = tracing.current()
+    for attempt in range(retries + 1):
+        waited = time.perf_counter()
+        acquired = get_rate_limiter().acquire(deadline)
+        trace.add("queue_ms", round((time.perf_counter() - waited) * 1000, 1))
+        if acquired:
+            remaining_ms = int((deadline - time.monotonic()) * 1000)
+        else:
+            remaining_ms = 0
+        if remaining_ms <= 0:
+            _count("failures")
+            raise TimeoutError(f"Дедлайн запроса к LLM ({timeout_ms} мс) истёк")
+        try:
+            return call(**dict(request, timeout_ms=remaining_ms))
+        except Exception as e:
+            if attempt == retries or not _is_retryable(e):
+                _count("failures")
+                raise
+            if _status_of(e) == 429:
+                _count("throttled")
+            # Full jitter: случайная пауза до base * 2^attempt, но не меньше Retry-After
+            backoff = random.uniform(0, min(Config.LLM_BACKOFF_MAX, Config.LLM_BACKOFF_BASE * 2 ** attempt))
+            backoff = max(backoff, _retry_after(e))
+            if time.monotonic() + backoff >= deadline:
+                _count("failures")
+                raise
+            _count("retries")
+            trace.add("retries", 1)
+            time.sleep(backoff)
+
+
+def _complete_once(on_start=None, **request):
+    """on_start вызывается, когда слот получен и запрос действительно уходит в API"""
+    waited = time.perf_counter()
+    with _slots():
+        tracing.current().add("queue_ms", round((time.perf_counter() - waited) * 1000, 1))
+        if on_start is not None:
+            on_start()
+        return MISTRAL_CLIENT.chat.complete(**request)
+
+
+def _reserve_hedge():
+    """Слот и токен частоты для копии запроса — только если они свободны прямо сейчас"""
+    slots = _slots()
+    if not slots.acquire(blocking=False):
+        return False
+    if not get_rate_limiter().try_acquire():
+        slots.release()
+        return False
+    return True
+
+
+def _hedge_once(request, timeout_ms):
+    """Копия запроса: слот и токен уже взяты в _reserve_hedge, повторов нет"""
+    try:
+        return MISTRAL_CLIENT.chat.complete(**dict(request, timeout_ms=timeout_ms))
+    finally:
+        _slots().release()
+
+
+def _record_usage(response):
+    """Токены из ответа API — в текущий спан"""
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        trace = tracing.current()
+        trace.add("prompt_tokens", getattr(usage, "prompt_tokens", 0) or 0)
+        trace.add("completion_tokens", getattr(usage, "completion_tokens", 0) or 0)
+    return response
+
+
+def chat_complete(timeout_ms=None, retries=None, hedge=False, **request):
+    """chat.complete с ограничением параллельных запросов, дедлайном и повторами.
+
+    hedge=True — для вызовов на критическом пути: если ответа нет через
+    Config.LLM_HEDGE_AFTER_MS после отправки запроса (очередь пула, лимит
+    частоты и ожидание слота не считаются), отправляется копия запроса и
+    берётся первый ответ. Когда слотов или токенов частоты нет, копия не
+    отправляется: она лишь встала бы в ту же очередь.
+    """
+    _count("calls")
+    if not hedge or not Config.LLM_HEDGE_AFTER_MS:
+        return _record_usage(_with_retries(_complete_once, request, timeout_ms, retries))
+
+    deadline = time.monotonic() + (timeout_ms or Config.LLM_TIMEOUT_MS) / 1000
+    pool = _get_hedge_pool()
+    started = threading.Event()
+    # Запросы в пуле пишут ожидание и повторы в спан вызывающего хода
+    primary = tracing.run_in_context(pool, _with_retries, _complete_once, dict(request, on_start=started.set),
+                                     timeout_ms, retries)
+    # Завершение без отправки (дедлайн в очереди) тоже будит ожидание
+    primary.add_done_callback(lambda _: started.set())
+    started.wait()
+    done, _ = wait([primary], timeout=Config.LLM_HEDGE_AFTER_MS / 1000)
+    if done:
+        return _record_usage(primary.result())
+
+    # Копия получает тот же дедлайн, что и весь вызов
+    hedge_timeout = int((deadline - time.monotonic()) * 1000)
+    if hedge_timeout <= 0 or not _reserve_hedge():
+        _count("hedges_skipped")
+        return _record_usage(primary.result())
+
+    _count("hedges")
+    tracing.current().set("hedged", True)
+    backup = tracing.run_in_context(pool, _hedge_once, request, hedge_timeout)
+    pending = {primary, backup}
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                if future is backup:
+                    _count("hedge_wins")
+                    tracing.current().set("hedge_won", True)
+                # Второй запрос не прервать — его результат просто отбрасывается
+                return _record_usage(future.result())
+            error = future.exception()
+    raise error
+
+
+@contextmanager
+def chat_stream(timeout_ms=None, retries=None, **request):
+    """chat.stream с ограничением параллельных запросов; слот держится до закрытия потока.
+
+    Повторы возможны только до первого полученного события — открытие потока.
+    """
+    _count("calls")
+    with tracing.span("llm.stream", model=request.get("model")):
+        waited = time.perf_counter()
+        with _slots():
+            tracing.current().add("queue_ms", round((time.perf_counter() - waited) * 1000, 1))
+            stream = _with_retries(MISTRAL_CLIENT.chat.stream, request, timeout_ms, retries)
+            with stream:
+                yield stream
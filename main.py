@@ -1,5 +1,6 @@
 
 import os
+import argparse
 from dotenv import load_dotenv
 from interview_loop import InterviewSystem
 
@@ -7,6 +8,10 @@ load_dotenv()
 
 
 def main():
+    parser = argparse.ArgumentParser(description="IT интервью система")
+    parser.add_argument("--resume", metavar="LOG", help="продолжить интервью по логу из sessions/ (.json, .jsonl или ID сессии)")
+    args = parser.parse_args()
+
     print("=" * 50)
     print("🤖 IT ИНТЕРВЬЮ СИСТЕМА")
     print("=" * 50)
@@ -14,11 +19,14 @@ def main():
     print("Для завершения напишите 'стоп'")
     print("=" * 50)
 
-    name = input("\n👤 Ваше имя: ").strip()
-    position = input("💼 Позиция (например, Data Scientist): ").strip()
-
     system = InterviewSystem()
-    system.start_interview(name, position)
+
+    if args.resume:
+        system.resume_session(args.resume)
+    else:
+        name = input("\n👤 Ваше имя: ").strip()
+        position = input("💼 Позиция (например, Data Scientist): ").strip()
+        system.start_interview(name, position)
 
     while True:
         user_input = input("\n📝 Ответ: ").strip()
@@ -0,0 +1,127 @@
+"""Категория IT позиции (ml / devops / qa / frontend / backend) — одна для всех агентов.
+
+Ключевые слова всех категорий собраны в одно регулярное выражение, результат
+запоминается по нормализованной строке позиции. Если ключевых слов нет
+(«Инженер по поиску», «Architect»), позиция сравнивается с описаниями
+категорий через уже загруженную модель эмбеддингов базы знаний — модель ради
+этого не загружается.
+"""
+import re
+import threading
+from collections import Counter
+from functools import lru_cache
+
+import numpy as np
+
+from config import Config
+
+# Фрагменты регулярных выражений, совпадающие с началом слова.
+# Порядок — приоритет: узкие направления раньше широкого backend
+# ("Java QA Automation" — qa, "Python ML Engineer" — ml)
+CATEGORY_KEYWORDS = {
+    'ml': ['ml', 'machine learning', 'machine-learning', 'машин', r'data\b', r'ai\b', 'нейрон', 'llm', 'nlp',
+           'computer vision', 'pandas', 'numpy', 'sklearn', 'pytorch'],
+    'devops': ['devops', 'sre', 'инфраструктур', 'docker', 'kubernetes', 'platform', 'terraform', 'ci-cd'],
+    'qa': ['qa', 'тестиров', 'test', 'quality', 'sdet', 'selenium'],
+    'frontend': ['frontend', 'front-end', 'фронтенд', 'верст', 'html', 'css', 'javascript', 'typescript', 'react', 'vue',
+                 'angular'],
+    'backend': ['backend', 'back-end', 'бэкенд', 'api', 'server', 'java', 'python', 'golang', 'sql', 'database',
+                'django', 'spring'],
+}
+
+CATEGORY_POSITIONS = {
+    'ml': "Data Scientist",
+    'backend': "Backend Developer",
+    'frontend': "Frontend Developer",
+    'qa': "QA Engineer",
+    'devops': "DevOps Engineer",
+    'general': "All IT",
+}
+
+# Описания категорий для сравнения эмбеддингов со свободной формулировкой позиции
+CATEGORY_DESCRIPTIONS = {
+    'ml': "Data Scientist, ML инженер: машинное обучение, нейронные сети, анализ данных, статистика",
+    'devops': "DevOps инженер: инфраструктура, CI/CD, контейнеры, облака, мониторинг, надёжность",
+    'qa': "QA инженер: тестирование, автотесты, качество продукта, поиск багов",
+    'frontend': "Frontend разработчик: интерфейсы, браузер, JavaScript, вёрстка, UI",
+    'backend': "Backend разработчик: серверная разработка, API, базы данных, микросервисы",
+}
+
+_PRIORITY = {category: rank for rank, category in enumerate(CATEGORY_KEYWORDS)}
+# 'ml' находит "ML Engineer", но не "HTML"; 'data' — "Data Engineer", но не "Database"
+_KEYWORDS_RE = re.compile('|'.join(
+    f"(?P<{category}>(?<!\\w)(?:{'|'.join(words)}))"
+    for category, words in CATEGORY_KEYWORDS.items()
+))
+
+_embedding_lock = threading.Lock()
+_category_embeddings = {}
+_embedding_matches = {}
+
+
+def normalize_position(position):
+    return ' '.join((position or '').lower().split())
+
+
+@lru_cache(maxsize=1024)
+def _match_keywords(normalized):
+    """Категория с наивысшим приоритетом среди найденных ключевых слов (None — не нашлось)"""
+    found = {match.lastgroup for match in _KEYWORDS_RE.finditer(normalized)}
+    return min(found, key=_PRIORITY.get) if found else None
+
+
+def resolve_text_category(text, default='general'):
+    """Категория документа по тем же ключевым словам: больше всего совпадений, при равенстве — приоритет"""
+    counts = Counter(match.lastgroup for match in _KEYWORDS_RE.finditer(normalize_position(text)))
+    if not counts:
+        return default
+    return max(counts, key=lambda category: (counts[category], -_PRIORITY[category]))
+
+
+def _category_matrix(knowledge_base):
+    """Нормированные эмбеддинги описаний категорий (считаются один раз на модель)"""
+    key = knowledge_base.model_name
+    if key not in _category_embeddings:
+        with _embedding_lock:
+            if key not in _category_embeddings:
+                vectors = knowledge_base.encode(list(CATEGORY_DESCRIPTIONS.values()))
+                _category_embeddings[key] = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    return _category_embeddings[key]
+
+
+def _match_embedding(normalized, knowledge_base):
+    """Ближайшая по смыслу категория или None, если близость ниже порога"""
+    key = (knowledge_base.model_name, normalized)
+    if key in _embedding_matches:
+        return _embedding_matches[key]
+
+    matrix = _category_matrix(knowledge_base)
+    vector = knowledge_base.encode([normalized])[0]
+    similarities = matrix @ (vector / np.linalg.norm(vector))
+    best = int(np.argmax(similarities))
+    category = None
+    if similarities[best] >= Config.POSITION_EMBEDDING_MIN_SIMILARITY:
+        category = list(CATEGORY_DESCRIPTIONS)[best]
+
+    if len(_embedding_matches) >= 1024:
+        _embedding_matches.clear()
+    _embedding_matches[key] = category
+    return category
+
+
+def resolve_category(position, knowledge_base=None, default='general'):
+    """Категория позиции: ключевые слова, затем (если модель уже загружена) эмбеддинги, иначе default"""
+    normalized = normalize_position(position)
+    if not normalized:
+        return default
+
+    category = _match_keywords(normalized)
+    if category:
+        return category
+
+    if knowledge_base is not None and knowledge_base.model_loaded:
+        try:
+            category = _match_embedding(normalized, knowledge_base)
+        except Exception:
+            category = None
+    return category or default
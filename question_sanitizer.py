@@ -0,0 +1,143 @@
+"""Очистка сгенерированного вопроса от пояснений, маркеров и оформления.
+
+Стоп-маркеры собраны в заранее скомпилированные регулярные выражения:
+точка обрезки находится одним поиском по строке вместо split по каждому
+маркеру, и вопрос очищается один раз, а не дважды (агентом и циклом
+интервью). sanitize_question — для готового ответа модели,
+StreamingQuestionCleaner — для потоковой генерации (те же маркеры).
+"""
+import re
+
+NUMBERING = re.compile(r'^\d+[\.\)]\s*')
+LEADING_NUMBERING = re.compile(r'^\s*\d+[\.\)]\s*')
+WHITESPACE = re.compile(r'\s+')
+
+# После этих слов модель уже объясняет вопрос, а не задаёт его
+EXPLANATION = re.compile(r'Почему|Например|Задача:|Цель:|Пример:|Если|//')
+# Заголовки и эмодзи-пометки режут только выбранную строку вопроса
+ANNOTATION = re.compile(r'###|📌|💡|🎯|🤔|🔍')
+
+MIN_QUESTION_LENGTH = 15
+
+
+def _strip_decoration(text):
+    """Кавычки и звёздочки (в том числе **жирный**).
+
+    Для удаления отдельных символов str.replace быстрее re.sub и translate.
+    """
+    return text.replace('"', '').replace("'", '').replace('*', '')
+
+
+def sanitize_question(text):
+    """Вопрос из ответа модели: без кавычек, нумерации, пояснений и переносов строк"""
+    question = _strip_decoration(text.strip()).replace('---', '').replace('___', '')
+    question = NUMBERING.sub('', question, count=1)
+
+    match = EXPLANATION.search(question)
+    if match:
+        question = question[:match.start()].strip()
+
+    # Настоящий вопрос — первая содержательная строка без заголовка
+    clean = question.strip()
+    for line in clean.split('\n'):
+        line = line.strip()
+        if len(line) > 10 and '###' not in line:
+            clean = line
+            break
+
+    match = ANNOTATION.search(clean)
+    if match:
+        clean = clean[:match.start()].strip()
+    # Схлопывает пробельные символы, как re.sub(r'\s+', ' ', ...) вместе со strip
+    clean = ' '.join(clean.split())
+
+    # Обрезали слишком много — берём первую длинную строку без маркеров
+    if len(clean) < MIN_QUESTION_LENGTH and len(question) > 30:
+        for line in question.split('\n'):
+            line = line.strip()
+            if len(line) > 20 and not line.startswith(('-', '#')):
+                clean = line
+                break
+
+    return clean.strip()
+
+
+class StreamingQuestionCleaner:
+    """Инкрементальная очистка вопроса при потоковой генерации"""
+
+    # Всё, что начинается с этих маркеров (включая перевод строки), — уже не вопрос
+    STOP_MARKERS = ('Почему', 'Например', 'Пример:', 'Если', 'Задача:', 'Цель:',
+                    '---', '###', '//', '📌', '💡', '🎯', '🤔', '🔍', '\n')
+    # Опережающая проверка даёт все позиции маркеров, в том числе перекрывающиеся
+    STOP = re.compile('(?=' + '|'.join(re.escape(marker) for marker in STOP_MARKERS) + ')')
+    HEADER = re.compile(r'---|###')
+    MIN_QUESTION_LENGTH = MIN_QUESTION_LENGTH
+
+    def __init__(self):
+        self.question = ""
+        self.stopped = False
+        self._tail = ""
+        self._started = False
+        self._hold = max(len(marker) for marker in self.STOP_MARKERS) - 1
+
+    def feed(self, chunk):
+        """Принимает фрагмент потока и возвращает текст, который точно войдёт в вопрос"""
+        if self.stopped or not chunk:
+            return ""
+
+        self._tail += _strip_decoration(chunk)
+
+        if not self._started and not self._find_question_start():
+            return ""
+
+        cut = self._find_stop()
+        if cut is not None:
+            self.stopped = True
+            return self._emit(self._tail[:cut])
+
+        # Хвост может оказаться началом стоп-маркера — придерживаем его
+        return self._emit_ready(len(self._tail) - self._hold)
+
+    def finish(self):
+        """Отдаёт остаток после окончания потока"""
+        if self.stopped or not self._started:
+            return ""
+        self.stopped = True
+        return self._emit(self._tail)
+
+    def _find_question_start(self):
+        """Пропускает пустые и служебные строки перед вопросом"""
+        while True:
+            line, newline, rest = self._tail.partition('\n')
+            if len(line.strip()) > 10 and not self.HEADER.search(line):
+                self._started = True
+                self._tail = LEADING_NUMBERING.sub('', self._tail, count=1)
+                return True
+            if not newline:
+                return False
+            self._tail = rest
+
+    def _find_stop(self):
+        """Первый стоп-маркер, после отсечения по которому вопрос не слишком короткий"""
+        for match in self.STOP.finditer(self._tail):
+            if len((self.question + self._tail[:match.start()]).strip()) >= self.MIN_QUESTION_LENGTH:
+                return match.start()
+        return None
+
+    def _emit_ready(self, end):
+        if end <= 0:
+            return ""
+        ready = self._tail[:end]
+        # Пробелы в конце придерживаем, чтобы вопрос не заканчивался пробелом
+        ready = ready.rstrip()
+        self._tail = self._tail[len(ready):]
+        return self._emit(ready)
+
+    def _emit(self, text):
+        text = WHITESPACE.sub(' ', text)
+        if not self.question:
+            text = text.lstrip()
+        if self.stopped:
+            text = text.rstrip()
+        self.question += text
+        return text
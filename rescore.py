@@ -0,0 +1,179 @@
+"""Пакетная переоценка архивных интервью текущим промптом FeedbackAgent.
+
+Сессии читаются из sessions/ по одной, фидбэк генерируется пулом потоков
+с ограничением частоты запросов и повторами. Результат пишется рядом
+с исходным логом (<имя>.rescored.json) вместе с исходным вердиктом и
+сводкой отличий.
+
+Повторяются только ответы, которые не удалось разобрать: повтор идёт
+мимо кэша LLM, а сетевые ошибки повторяет llm_client. Прогресс
+сохраняется в чекпоинт — прерванный запуск продолжается с того же места.
+
+Пример: python rescore.py --workers 4 --rpm 60
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from agents import FeedbackAgent, FeedbackParseError
+from config import Config
+from llm_client import TokenBucket
+
+RESCORED_SUFFIX = ".rescored.json"
+
+
+def iter_sessions(logs_dir, done):
+    """Потоково отдаёт пути к логам, ещё не переоценённым"""
+    for path in sorted(glob.glob(os.path.join(logs_dir, "*.json"))):
+        if path.endswith(RESCORED_SUFFIX) or os.path.abspath(path) in done:
+            continue
+        yield path
+
+
+def load_checkpoint(checkpoint_path):
+    done = set()
+    if os.path.exists(checkpoint_path):
+        with open(checkpoint_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # оборванная строка после падения
+                if record.get("status") == "ok":
+                    done.add(record["source"])
+    return done
+
+
+def diff_feedback(old, new):
+    """Краткая сводка отличий нового фидбэка от исходного"""
+    old, new = old or {}, new or {}
+    old_verdict, new_verdict = old.get("verdict", {}), new.get("verdict", {})
+    summary = {}
+
+    for field in ("grade", "recommendation"):
+        if old_verdict.get(field) != new_verdict.get(field):
+            summary[field] = {"old": old_verdict.get(field), "new": new_verdict.get(field)}
+
+    try:
+        delta = float(new_verdict.get("confidence_score")) - float(old_verdict.get("confidence_score"))
+        summary["confidence_delta"] = round(delta, 1)
+    except (TypeError, ValueError):
+        pass
+
+    for field in ("confirmed_skills", "knowledge_gaps"):
+        old_items = set(old.get("hard_skills", {}).get(field, []))
+        new_items = set(new.get("hard_skills", {}).get(field, []))
+        if old_items != new_items:
+            summary[field] = {"added": sorted(new_items - old_items), "removed": sorted(old_items - new_items)}
+
+    return summary
+
+
+def rescore_session(agent, path, limiter, retries):
+    """Переоценивает одну сессию; неразобранный ответ запрашивается заново с экспоненциальной паузой"""
+    with open(path, 'r', encoding='utf-8') as f:
+        session_data = json.load(f)
+
+    user_responses = [turn["user_message"] for turn in session_data.get("turns", []) if turn.get("user_message")]
+
+    for attempt in range(retries + 1):
+        limiter.acquire()
+        try:
+            feedback = agent.generate(session_data, session_data.get("position", ""), user_responses,
+                                      console=False, strict=True, use_cache=attempt == 0)
+            break
+        except FeedbackParseError:
+            if attempt == retries:
+                raise
+            time.sleep(min(30.0, 2 ** attempt) * (0.5 + random.random()))
+
+    original = session_data.get("final_feedback")
+    result = {
+        "source": os.path.basename(path),
+        "rescored_at": datetime.now().isoformat(),
+        "original_feedback": original,
+        "new_feedback": feedback,
+        "diff": diff_feedback(original, feedback),
+    }
+    output_path = path[:-len(".json")] + RESCORED_SUFFIX
+    with open(output_path + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    os.replace(output_path + ".tmp", output_path)
+    return output_path, result["diff"]
+
+
+def rescore(logs_dir, workers=4, rpm=60, retries=3, checkpoint_path=None, report_every=10.0):
+    checkpoint_path = checkpoint_path or os.path.join(logs_dir, "rescore_checkpoint.jsonl")
+    done = load_checkpoint(checkpoint_path)
+    if done:
+        print(f"↩️ Уже переоценено по чекпоинту: {len(done)}")
+
+    agent = FeedbackAgent()
+    # Свой лимит на пакетную переоценку; общий лимит процесса (Config.LLM_RATE_LIMIT_RPS) действует поверх
+    limiter = TokenBucket(rpm / 60.0 if rpm else 0)
+    stats = Counter()
+    start = time.perf_counter()
+    last_report = start
+
+    def record(path, future, checkpoint):
+        try:
+            output_path, diff = future.result()
+            entry = {"source": os.path.abspath(path), "status": "ok", "output": output_path}
+            stats["ok"] += 1
+            if "recommendation" in diff:
+                stats["recommendation_changed"] += 1
+            if "grade" in diff:
+                stats["grade_changed"] += 1
+        except Exception as e:
+            entry = {"source": os.path.abspath(path), "status": "error", "error": str(e)}
+            stats["error"] += 1
+            print(f"❌ {os.path.basename(path)}: {e}")
+        checkpoint.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        checkpoint.flush()
+
+    def report(final=False):
+        minutes = max(time.perf_counter() - start, 1e-9) / 60
+        processed = stats["ok"] + stats["error"]
+        prefix = "✅ Готово" if final else "⏳"
+        print(f"{prefix}: обработано {processed} ({processed / minutes:.1f} сессий/мин), "
+              f"ошибок {stats['error']}, сменилась рекомендация {stats['recommendation_changed']}, "
+              f"сменился грейд {stats['grade_changed']}")
+
+    with open(checkpoint_path, 'a', encoding='utf-8') as checkpoint, \
+            ThreadPoolExecutor(max_workers=workers) as pool:
+        # Ограниченное число задач в полёте — архив читается потоково
+        in_flight = deque()
+        for path in iter_sessions(logs_dir, done):
+            in_flight.append((path, pool.submit(rescore_session, agent, path, limiter, retries)))
+            if len(in_flight) >= workers * 2:
+                record(*in_flight.popleft(), checkpoint)
+            if time.perf_counter() - last_report >= report_every:
+                report()
+                last_report = time.perf_counter()
+        while in_flight:
+            record(*in_flight.popleft(), checkpoint)
+
+    report(final=True)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Пакетная переоценка архивных интервью")
+    parser.add_argument("--path", default=Config.LOGS_DIR)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--rpm", type=float, default=60, help="лимит запросов в минуту (0 — без лимита)")
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--checkpoint", default=None)
+    args = parser.parse_args()
+
+    rescore(args.path, workers=args.workers, rpm=args.rpm, retries=args.retries, checkpoint_path=args.checkpoint)
+
+
+if __name__ == "__main__":
+    main()
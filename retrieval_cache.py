@@ -0,0 +1,106 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from config import Config
+
+
+class RetrievalCache:
+    """Кэш результатов поиска по базе знаний.
+
+    Первый уровень — точное совпадение нормализованного текста запроса,
+    второй — косинусная близость эмбеддинга запроса к уже закэшированным.
+    Размер ограничен (LRU), записи устаревают по TTL.
+    """
+
+    def __init__(self, max_entries=None, ttl_seconds=None, similarity_threshold=None):
+        self.max_entries = max_entries or Config.RETRIEVAL_CACHE_SIZE
+        self.ttl_seconds = ttl_seconds or Config.RETRIEVAL_CACHE_TTL
+        self.similarity_threshold = similarity_threshold or Config.RETRIEVAL_CACHE_SIMILARITY
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits_exact = 0
+        self.hits_semantic = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalize(query):
+        """Регистр, пробелы и пунктуация по краям не влияют на ключ"""
+        return re.sub(r'\s+', ' ', query.lower()).strip(' .,!?;:"\'')
+
+    def get_exact(self, query, scope):
+        """Результат для того же (нормализованного) запроса или None"""
+        key = (scope, self.normalize(query))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or self._expired(entry):
+                self._entries.pop(key, None)
+                return None
+            self._entries.move_to_end(key)
+            self.hits_exact += 1
+            return entry["results"]
+
+    def get_similar(self, embedding, scope):
+        """Результат самого близкого запроса, если сходство выше порога, иначе None"""
+        query = self._unit(embedding)
+        with self._lock:
+            keys = [key for key, entry in self._entries.items()
+                    if key[0] == scope and entry["embedding"] is not None and not self._expired(entry)]
+            if keys:
+                matrix = np.stack([self._entries[key]["embedding"] for key in keys])
+                similarities = matrix @ query
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.similarity_threshold:
+                    self._entries.move_to_end(keys[best])
+                    self.hits_semantic += 1
+                    return self._entries[keys[best]]["results"]
+            self.misses += 1
+            return None
+
+    def record_miss(self):
+        """Промах без семантического уровня (запрос искали только по точному ключу)"""
+        with self._lock:
+            self.misses += 1
+
+    def put(self, query, scope, embedding, results):
+        """embedding=None — запись доступна только по точному совпадению"""
+        key = (scope, self.normalize(query))
+        with self._lock:
+            self._entries[key] = {
+                "results": results,
+                "embedding": self._unit(embedding) if embedding is not None else None,
+                "created": time.monotonic()
+            }
+            self._entries.move_to_end(key)
+            self._evict()
+
+    def stats(self):
+        """Счётчики попаданий и промахов"""
+        with self._lock:
+            lookups = self.hits_exact + self.hits_semantic + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits_exact": self.hits_exact,
+                "hits_semantic": self.hits_semantic,
+                "misses": self.misses,
+                "hit_rate": (self.hits_exact + self.hits_semantic) / lookups if lookups else 0.0
+            }
+
+    def _evict(self):
+        # Сначала устаревшие записи (они в начале LRU, но не обязательно все), затем самые старые
+        for key in [key for key, entry in self._entries.items() if self._expired(entry)]:
+            del self._entries[key]
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _expired(self, entry):
+        return time.monotonic() - entry["created"] > self.ttl_seconds
+
+    @staticmethod
+    def _unit(embedding):
+        vector = np.asarray(embedding, dtype='float32').ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
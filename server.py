@@ -0,0 +1,262 @@
+"""Серверный режим: много интервью в одном процессе (HTTP + WebSocket).
+
+База знаний (модель эмбеддингов и FAISS индекс), клиент Mistral и кэш ответов
+общие для всех сессий; состояние интервью у каждой сессии своё.
+
+HTTP:
+    POST   /sessions                 {"name", "position"}  -> {"session_id", "question"}
+    POST   /sessions/{id}/answers    {"answer"}            -> {"question"} или {"finished", "result", "feedback"}
+    DELETE /sessions/{id}                                  -> завершение интервью
+    GET    /health
+    GET    /metrics                                        -> p50/p95/p99 по действиям (Prometheus)
+WebSocket /ws: {"type": "start", "name", "position"}, {"type": "answer", "answer"}, {"type": "stop"}
+
+Пример: python server.py --port 8080
+"""
+import argparse
+import asyncio
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from aiohttp import web, WSMsgType
+
+from config import Config
+from dispatcher import InterviewDispatcher
+from interview_loop import InterviewSystem
+from knowledge_base import ITKnowledgeBase
+from llm_client import get_client_stats
+from speculation import get_speculation_stats
+from tracing import prometheus_text
+
+
+class Busy(Exception):
+    """Сервер перегружен — клиенту стоит повторить запрос позже"""
+
+
+class InterviewSession:
+    def __init__(self, system):
+        self.id = uuid.uuid4().hex
+        self.system = system
+        self.lock = asyncio.Lock()
+        self.last_active = time.monotonic()
+        self.finished = False
+        # Итог интервью: повторное завершение возвращает его же
+        self.result = None
+
+
+class InterviewServer:
+    def __init__(self):
+        self.knowledge_base = ITKnowledgeBase(Config.EMBEDDING_MODEL)
+        self.sessions = {}
+        # Блокирующие вызовы LLM выполняются в пуле, event loop остаётся свободным
+        self.executor = ThreadPoolExecutor(max_workers=Config.SERVER_TURN_WORKERS)
+        self.pending_turns = 0
+
+    # --- жизненный цикл сессий ---
+
+    async def start_session(self, name, position):
+        if len(self.sessions) >= Config.SERVER_MAX_SESSIONS:
+            raise Busy("Достигнут лимит одновременных интервью")
+
+        system = InterviewSystem(InterviewDispatcher(self.knowledge_base), echo=False)
+        session = InterviewSession(system)
+        self.sessions[session.id] = session
+        try:
+            await self._run(system.start_interview, name, position)
+        except BaseException:
+            self.sessions.pop(session.id, None)
+            raise
+        return session, {"session_id": session.id, "question": system.last_question}
+
+    async def answer(self, session, text):
+        if session.lock.locked():
+            raise Busy("Предыдущий ответ ещё обрабатывается")
+
+        async with session.lock:
+            if session.finished:
+                return session.result
+            session.last_active = time.monotonic()
+            result = await self._run(session.system.process_response, text)
+
+            if result:
+                return self._finish(session, result)
+            return {"question": session.system.last_question}
+
+    async def stop(self, session):
+        async with session.lock:
+            # Интервью могло завершиться, пока ждали блокировку
+            if session.finished:
+                return session.result
+            result = await self._run(session.system.process_response, "стоп")
+            return self._finish(session, result)
+
+    def _finish(self, session, result):
+        session.finished = True
+        self.sessions.pop(session.id, None)
+        session_data = session.system.logger.session_data or {}
+        session.result = {"finished": True, "result": result, "feedback": session_data.get("final_feedback")}
+        return session.result
+
+    async def _run(self, func, *args):
+        """Backpressure: ограничиваем число ходов, ожидающих свободный поток"""
+        if self.pending_turns >= Config.SERVER_MAX_PENDING_TURNS:
+            raise Busy("Слишком много ответов в обработке")
+
+        self.pending_turns += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+        finally:
+            self.pending_turns -= 1
+
+    async def expire_idle_sessions(self):
+        """Удаляет брошенные сессии"""
+        while True:
+            await asyncio.sleep(60)
+            now = time.monotonic()
+            for session_id, session in list(self.sessions.items()):
+                if now - session.last_active > Config.SERVER_SESSION_TTL and not session.lock.locked():
+                    self.sessions.pop(session_id, None)
+
+    # --- HTTP ---
+
+    async def handle_start(self, request):
+        body = await self._read_json(request)
+        if body is None:
+            return self._bad_json()
+        try:
+            _, payload = await self.start_session(body.get("name", "Кандидат"), body.get("position", ""))
+        except Busy as e:
+            return self._busy(e)
+        return web.json_response(payload)
+
+    async def handle_answer(self, request):
+        session = self.sessions.get(request.match_info["session_id"])
+        if session is None:
+            return web.json_response({"error": "Сессия не найдена"}, status=404)
+
+        body = await self._read_json(request)
+        if body is None:
+            return self._bad_json()
+        try:
+            payload = await self.answer(session, body.get("answer", ""))
+        except Busy as e:
+            return self._busy(e)
+        return web.json_response(payload)
+
+    async def handle_stop(self, request):
+        session = self.sessions.get(request.match_info["session_id"])
+        if session is None:
+            return web.json_response({"error": "Сессия не найдена"}, status=404)
+        try:
+            payload = await self.stop(session)
+        except Busy as e:
+            return self._busy(e)
+        return web.json_response(payload)
+
+    async def handle_health(self, request):
+        return web.json_response({
+            "sessions": len(self.sessions),
+            "pending_turns": self.pending_turns,
+            "max_sessions": Config.SERVER_MAX_SESSIONS,
+            "speculation": get_speculation_stats(),
+            "llm": get_client_stats(),
+        })
+
+    async def handle_metrics(self, request):
+        return web.Response(text=prometheus_text(), content_type="text/plain", charset="utf-8")
+
+    async def handle_ws(self, request):
+        ws = web.WebSocketResponse(heartbeat=30)
+        await ws.prepare(request)
+        session = None
+
+        async for message in ws:
+            if message.type != WSMsgType.TEXT:
+                continue
+            try:
+                data = message.json()
+            except ValueError:
+                data = None
+            if not isinstance(data, dict):
+                await ws.send_json({"type": "error", "error": "Ожидался JSON"})
+                continue
+
+            try:
+                if data.get("type") == "start" and session is None:
+                    session, payload = await self.start_session(data.get("name", "Кандидат"),
+                                                                data.get("position", ""))
+                    await ws.send_json(dict(payload, type="question"))
+                elif data.get("type") in ("answer", "stop") and session is not None:
+                    if data["type"] == "answer":
+                        payload = await self.answer(session, data.get("answer", ""))
+                    else:
+                        payload = await self.stop(session)
+                    await ws.send_json(dict(payload, type="finished" if payload.get("finished") else "question"))
+                    if payload.get("finished"):
+                        break
+                else:
+                    await ws.send_json({"type": "error", "error": "Неожиданное сообщение"})
+            except Busy as e:
+                await ws.send_json({"type": "busy", "error": str(e)})
+
+        if session is not None and not session.finished:
+            # Соединение оборвалось — сессию можно продолжить по HTTP до истечения TTL
+            session.last_active = time.monotonic()
+        await ws.close()
+        return ws
+
+    @staticmethod
+    async def _read_json(request):
+        """Тело запроса как JSON объект; None — если это не JSON объект"""
+        try:
+            body = await request.json()
+        except ValueError:
+            return None
+        return body if isinstance(body, dict) else None
+
+    @staticmethod
+    def _bad_json():
+        return web.json_response({"error": "Ожидался JSON объект"}, status=400)
+
+    @staticmethod
+    def _busy(error):
+        return web.json_response({"error": str(error)}, status=429, headers={"Retry-After": "1"})
+
+    def create_app(self):
+        app = web.Application()
+        app.add_routes([
+            web.post("/sessions", self.handle_start),
+            web.post("/sessions/{session_id}/answers", self.handle_answer),
+            web.delete("/sessions/{session_id}", self.handle_stop),
+            web.get("/health", self.handle_health),
+            web.get("/metrics", self.handle_metrics),
+            web.get("/ws", self.handle_ws),
+        ])
+
+        async def start_background(app):
+            app["expire_task"] = asyncio.create_task(self.expire_idle_sessions())
+
+        async def stop_background(app):
+            app["expire_task"].cancel()
+            self.executor.shutdown(wait=False)
+
+        app.on_startup.append(start_background)
+        app.on_cleanup.append(stop_background)
+        return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Серверный режим IT интервью")
+    parser.add_argument("--host", default=Config.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=Config.SERVER_PORT)
+    parser.add_argument("--max-llm-calls", type=int, default=Config.MAX_CONCURRENT_LLM_CALLS,
+                        help="максимум одновременных запросов к LLM на процесс")
+    args = parser.parse_args()
+
+    Config.MAX_CONCURRENT_LLM_CALLS = args.max_llm_calls
+    web.run_app(InterviewServer().create_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
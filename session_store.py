@@ -0,0 +1,297 @@
+"""Хранилища завершённых сессий интервью.
+
+SQLiteSessionStore (по умолчанию) держит сессии, ходы и фидбэк в таблицах
+с индексами по позиции, дате и вердикту; JSONSessionStore пишет прежние
+JSON файлы и используется как формат экспорта.
+
+Пример:
+    python session_store.py import sessions/
+    python session_store.py query --position "Data Scientist" --recommendation "No Hire" --since 2026-10-01
+"""
+import abc
+import argparse
+import glob
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from datetime import datetime
+
+from config import Config
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    participant_name TEXT,
+    position TEXT COLLATE NOCASE,
+    start_time TEXT,
+    saved_time TEXT,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS turns (
+    session_id TEXT NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,
+    turn_id INTEGER NOT NULL,
+    agent_visible_message TEXT,
+    user_message TEXT,
+    internal_thoughts TEXT,
+    timestamp TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (session_id, turn_id)
+);
+CREATE TABLE IF NOT EXISTS feedback (
+    session_id TEXT PRIMARY KEY REFERENCES sessions(id) ON DELETE CASCADE,
+    grade TEXT,
+    recommendation TEXT COLLATE NOCASE,
+    confidence_score REAL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_position_start ON sessions(position, start_time);
+CREATE INDEX IF NOT EXISTS idx_sessions_start ON sessions(start_time);
+CREATE INDEX IF NOT EXISTS idx_feedback_recommendation ON feedback(recommendation);
+CREATE INDEX IF NOT EXISTS idx_feedback_grade ON feedback(grade);
+"""
+
+
+class SessionStore(abc.ABC):
+    """Интерфейс хранилища сессий"""
+
+    def save_session(self, session_data):
+        """Сохраняет сессию, возвращает ссылку на неё (путь или ID)"""
+        return self.save_sessions([session_data])[0]
+
+    @abc.abstractmethod
+    def save_sessions(self, sessions):
+        """Сохраняет список сессий, возвращает ссылки на них в том же порядке"""
+
+    @abc.abstractmethod
+    def load_session(self, ref):
+        """Сессия по ссылке, которую вернул save_session"""
+
+
+def ensure_session_id(session_data):
+    """У каждой сессии есть стабильный ID — повторное сохранение не создаёт дубликат"""
+    if not session_data.get("session_id"):
+        session_data["session_id"] = uuid.uuid4().hex
+    return session_data["session_id"]
+
+
+class JSONSessionStore(SessionStore):
+    """Прежний формат: один JSON файл на сессию"""
+
+    def __init__(self, logs_dir=None, prefix="Лобанова_Карина_Маратовна_сценарий"):
+        self.logs_dir = logs_dir or Config.LOGS_DIR
+        self.prefix = prefix
+        os.makedirs(self.logs_dir, exist_ok=True)
+
+    def save_sessions(self, sessions):
+        paths = []
+        for session_data in sessions:
+            session_id = ensure_session_id(session_data)
+            # ID в имени — две сессии в одну секунду больше не перезаписывают друг друга
+            stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            filename = os.path.join(self.logs_dir, f"{self.prefix}_{stamp}_{session_id[:8]}.json")
+            with open(filename + ".tmp", 'w', encoding='utf-8') as f:
+                json.dump(session_data, f, ensure_ascii=False, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(filename + ".tmp", filename)
+            paths.append(filename)
+        return paths
+
+    def load_session(self, ref):
+        with open(ref, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+
+class SQLiteSessionStore(SessionStore):
+    """Сессии, ходы и фидбэк в SQLite с индексами для аналитических запросов"""
+
+    def __init__(self, path=None):
+        self.path = path or Config.SESSION_DB_PATH
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA foreign_keys=ON")
+        self._db.executescript(SCHEMA)
+        self._db.commit()
+
+    def save_sessions(self, sessions):
+        """Пачка сессий записывается одной транзакцией"""
+        session_rows, turn_rows, feedback_rows, ids = [], [], [], []
+        saved_time = datetime.now().isoformat()
+
+        for session_data in sessions:
+            session_id = ensure_session_id(session_data)
+            ids.append(session_id)
+            session_rows.append((
+                session_id,
+                session_data.get("participant_name"),
+                session_data.get("position"),
+                session_data.get("start_time"),
+                saved_time,
+                json.dumps({k: v for k, v in session_data.items() if k not in ("turns", "final_feedback")},
+                           ensure_ascii=False)
+            ))
+            for turn in session_data.get("turns", []):
+                turn_rows.append((
+                    session_id,
+                    turn.get("turn_id"),
+                    turn.get("agent_visible_message"),
+                    turn.get("user_message"),
+                    turn.get("internal_thoughts"),
+                    turn.get("timestamp"),
+                    json.dumps(turn, ensure_ascii=False)
+                ))
+            feedback = session_data.get("final_feedback")
+            if feedback:
+                verdict = feedback.get("verdict", {})
+                feedback_rows.append((
+                    session_id,
+                    verdict.get("grade"),
+                    verdict.get("recommendation"),
+                    _to_float(verdict.get("confidence_score")),
+                    json.dumps(feedback, ensure_ascii=False)
+                ))
+
+        with self._lock, self._db:
+            # Повторное сохранение сессии заменяет её целиком
+            self._db.executemany("DELETE FROM turns WHERE session_id = ?", [(i,) for i in ids])
+            self._db.executemany("DELETE FROM feedback WHERE session_id = ?", [(i,) for i in ids])
+            self._db.executemany("INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?, ?, ?)", session_rows)
+            self._db.executemany("INSERT INTO turns VALUES (?, ?, ?, ?, ?, ?, ?)", turn_rows)
+            self._db.executemany("INSERT INTO feedback VALUES (?, ?, ?, ?, ?)", feedback_rows)
+        return ids
+
+    def load_session(self, ref):
+        with self._lock:
+            row = self._db.execute("SELECT data FROM sessions WHERE id = ?", (ref,)).fetchone()
+            if row is None:
+                return None
+            session_data = json.loads(row[0])
+            session_data["turns"] = [
+                json.loads(data) for (data,) in self._db.execute(
+                    "SELECT data FROM turns WHERE session_id = ? ORDER BY turn_id", (ref,))
+            ]
+            feedback = self._db.execute("SELECT data FROM feedback WHERE session_id = ?", (ref,)).fetchone()
+        if feedback:
+            session_data["final_feedback"] = json.loads(feedback[0])
+        return session_data
+
+    def find_sessions(self, position=None, recommendation=None, grade=None, since=None, until=None, limit=None):
+        """Краткие записи сессий по фильтрам (даты — ISO строки, until не включительно)"""
+        query = ("SELECT s.id, s.participant_name, s.position, s.start_time, "
+                 "f.grade, f.recommendation, f.confidence_score "
+                 "FROM sessions s LEFT JOIN feedback f ON f.session_id = s.id WHERE 1 = 1")
+        params = []
+        for clause, value in (("s.position = ?", position), ("f.recommendation = ?", recommendation),
+                              ("f.grade = ?", grade), ("s.start_time >= ?", since), ("s.start_time < ?", until)):
+            if value is not None:
+                query += f" AND {clause}"
+                params.append(value)
+        query += " ORDER BY s.start_time DESC"
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+
+        columns = ("session_id", "participant_name", "position", "start_time",
+                   "grade", "recommendation", "confidence_score")
+        with self._lock:
+            return [dict(zip(columns, row)) for row in self._db.execute(query, params)]
+
+    def import_json_files(self, paths, batch_size=200):
+        """Переносит JSON логи в базу пачками, возвращает число сессий; битые логи пропускаются"""
+        batch, total = [], 0
+        for path in paths:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    session_data = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Пропущен {path}: {e}")
+                continue
+            # Стабильный ID из имени файла — повторный импорт не создаёт дубликатов
+            session_data.setdefault("session_id", uuid.uuid5(uuid.NAMESPACE_URL, os.path.abspath(path)).hex)
+            batch.append((path, session_data))
+            if len(batch) >= batch_size:
+                total += self._import_batch(batch)
+                batch = []
+        if batch:
+            total += self._import_batch(batch)
+        return total
+
+    def _import_batch(self, batch):
+        """Пачка одной транзакцией; если она откатилась — по одной сессии, чтобы найти и пропустить битые"""
+        try:
+            return len(self.save_sessions([session_data for _, session_data in batch]))
+        except (sqlite3.Error, AttributeError, TypeError):
+            pass
+
+        saved = 0
+        for path, session_data in batch:
+            try:
+                self.save_sessions([session_data])
+                saved += 1
+            except (sqlite3.Error, AttributeError, TypeError) as e:
+                # Повтор turn_id, ход без turn_id, фидбэк не объектом и т.п.
+                print(f"⚠️ Пропущен {path}: {e}")
+        return saved
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_session_store():
+    """Хранилище по Config.SESSION_STORE, общее для всех сессий процесса"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if Config.SESSION_STORE == "sqlite":
+                    _store = SQLiteSessionStore()
+                elif Config.SESSION_STORE == "json":
+                    _store = JSONSessionStore()
+                else:
+                    raise ValueError(f"Неизвестное хранилище сессий: {Config.SESSION_STORE}")
+    return _store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Хранилище сессий интервью")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = subparsers.add_parser("import", help="перенести JSON логи в SQLite")
+    import_parser.add_argument("path", nargs="?", default=Config.LOGS_DIR)
+
+    query_parser = subparsers.add_parser("query", help="найти сессии")
+    query_parser.add_argument("--position")
+    query_parser.add_argument("--recommendation")
+    query_parser.add_argument("--grade")
+    query_parser.add_argument("--since", help="ISO дата, например 2026-10-01")
+    query_parser.add_argument("--until")
+    query_parser.add_argument("--limit", type=int)
+
+    args = parser.parse_args()
+    store = SQLiteSessionStore()
+
+    if args.command == "import":
+        count = store.import_json_files(sorted(glob.glob(os.path.join(args.path, "*.json"))))
+        print(f"✅ Импортировано сессий: {count}")
+    else:
+        for row in store.find_sessions(args.position, args.recommendation, args.grade,
+                                       args.since, args.until, args.limit):
+            print(json.dumps(row, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Спекулятивная генерация следующего вопроса, пока кандидат печатает ответ.
+
+Для каждого исхода Observer (harder / same / simpler) вопрос генерируется
+заранее в общем пуле; после анализа реального ответа подходящий вопрос
+отдаётся сразу, остальные отменяются или отбрасываются. Стоимость ограничена
+лимитом генераций на сессию и числом одновременных спекуляций на процесс.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from agents.observer_agent import DIFFICULTY_INSTRUCTIONS
+from config import Config
+from tracing import submit
+
+
+class SpeculationStats:
+    """Счётчики попаданий спекуляции (на процесс или на сессию)"""
+
+    FIELDS = ("hits", "misses", "generated", "wasted", "skipped")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = dict.fromkeys(self.FIELDS, 0)
+
+    def add(self, field, value=1):
+        with self._lock:
+            self.counts[field] += value
+
+    def snapshot(self):
+        with self._lock:
+            counts = dict(self.counts)
+        served = counts["hits"] + counts["misses"]
+        counts["hit_rate"] = round(counts["hits"] / served, 3) if served else 0.0
+        return counts
+
+
+_global_stats = SpeculationStats()
+_pool = None
+_slots = None
+_pool_lock = threading.Lock()
+
+
+def get_speculation_stats():
+    """Сводка по всем сессиям процесса"""
+    return _global_stats.snapshot()
+
+
+def _get_pool():
+    """Общий пул: число одновременных спекуляций на процесс не больше SPECULATION_MAX_IN_FLIGHT"""
+    global _pool, _slots
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _slots = threading.BoundedSemaphore(Config.SPECULATION_MAX_IN_FLIGHT)
+                _pool = ThreadPoolExecutor(max_workers=Config.SPECULATION_MAX_IN_FLIGHT,
+                                           thread_name_prefix="speculation")
+    return _pool, _slots
+
+
+class QuestionSpeculator:
+    def __init__(self, dispatcher):
+        self.dispatcher = dispatcher
+        self.stats = SpeculationStats()
+        self._futures = {}
+        self._generated = 0
+
+    def start(self, last_question, question_count, recent_answers=None):
+        """Запускает генерацию вариантов следующего вопроса сразу после показа текущего"""
+        self.discard()
+        if not Config.SPECULATIVE_QUESTIONS:
+            return
+
+        pool, slots = _get_pool()
+        for difficulty in Config.SPECULATION_DIFFICULTIES:
+            if self._generated >= Config.SPECULATION_MAX_PER_SESSION or not slots.acquire(blocking=False):
+                # Лимит стоимости — этот исход обработается обычным путём
+                self._count("skipped")
+                continue
+            self._generated += 1
+            self._count("generated")
+            instruction = (f"{DIFFICULTY_INSTRUCTIONS[difficulty]} "
+                           f"Продолжи тему предыдущего вопроса: {last_question}")
+            future = submit(pool, "background.speculation", self.dispatcher.dispatch, "generate_question", {
+                "instruction": instruction,
+                "question_count": question_count,
+                "record": False,
+                # Копия: список ответов сессии дополняется, пока вариант генерируется
+                "recent_answers": list(recent_answers or [])
+            })
+            future.add_done_callback(lambda _: slots.release())
+            self._futures[difficulty] = future
+
+    def take(self, difficulty):
+        """Готовый вопрос для исхода Observer или None; остальные варианты отбрасываются"""
+        if not Config.SPECULATIVE_QUESTIONS:
+            return None
+        future = self._futures.pop(difficulty, None)
+        self.discard()
+
+        question = None
+        if future is not None and not future.cancelled():
+            try:
+                # Даже незавершённая генерация началась раньше, чем начался бы обычный вызов
+                question = future.result()
+            except Exception:
+                question = None
+
+        self._count("hits" if question else "misses")
+        return question
+
+    def discard(self):
+        """Отменяет ещё не начатые варианты; уже идущие досчитаются и будут отброшены"""
+        for future in self._futures.values():
+            future.cancel()
+            self._count("wasted")
+        self._futures = {}
+
+    def _count(self, field):
+        self.stats.add(field)
+        _global_stats.add(field)
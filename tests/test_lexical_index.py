@@ -0,0 +1,39 @@
+from lexical_index import LexicalIndex, reciprocal_rank_fusion, tokenize
+
+
+def test_tokenize_keeps_plus_and_hash_suffixes():
+    assert tokenize("C++ и C#") == ["c++", "c#"]
+
+
+def test_tokenize_keeps_compound_term_and_its_parts():
+    assert tokenize("Node.js") == ["node", "js", "node.js"]
+    assert tokenize("CI-CD") == ["ci", "cd", "ci-cd"]
+
+
+def test_tokenize_stems_russian_words():
+    assert tokenize("индексы индексов") == ["индек", "индек"]
+    # Короткие русские слова не обрезаются
+    assert tokenize("сеть") == ["сеть"]
+
+
+def test_tokenize_drops_single_letters_but_keeps_digits():
+    assert tokenize("a b 7") == ["7"]
+
+
+def test_rrf_orders_by_summed_reciprocal_rank():
+    fused = reciprocal_rank_fusion([[1, 2, 3], [3, 4]], limit=4, rrf_k=0)
+    # 3: 1/3 + 1, 1: 1, 2: 1/2, 4: 1/2 (при равенстве — меньший ID)
+    assert [doc_id for doc_id, _ in fused] == [3, 1, 2, 4]
+    assert fused[0][1] == 1 + 1 / 3
+
+
+def test_rrf_breaks_ties_by_id_and_applies_limit():
+    fused = reciprocal_rank_fusion([[5, 7], [7, 5]], limit=1, rrf_k=60)
+    assert fused == [(5, 1 / 61 + 1 / 62)]
+
+
+def test_lexical_index_matches_exact_terms():
+    index = LexicalIndex()
+    index.add(["Docker и Kubernetes", "Spring Boot на Java", "Node.js и Express"])
+    assert [doc_id for doc_id, _ in index.search("node.js", k=3)] == [2]
+    assert index.search("spring", k=3, ids=[0, 2]) == []
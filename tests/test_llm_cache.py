@@ -0,0 +1,86 @@
+from types import SimpleNamespace
+
+import pytest
+
+import llm_cache
+from llm_cache import CompletionCache, complete
+
+MESSAGES = [{"role": "user", "content": "Оцени ответ"}]
+
+
+def test_lru_hit_and_eviction():
+    cache = CompletionCache(max_entries=2)
+    cache.put("a", "ответ a")
+    cache.put("b", "ответ b")
+    assert cache.get("a", "observer") == "ответ a"
+    # "a" только что прочитан — вытесняется самый старый, "b"
+    cache.put("c", "ответ c")
+    assert cache.get("b", "observer") is None
+    assert cache.get("a", "observer") == "ответ a"
+    assert cache.get("c", "observer") == "ответ c"
+    assert cache.stats()["observer"] == {"hits": 3, "misses": 1, "hit_rate": 0.75}
+
+
+def test_make_key_depends_on_request():
+    key = CompletionCache.make_key("m", MESSAGES, {"temperature": 0.3})
+    assert key == CompletionCache.make_key("m", list(MESSAGES), {"temperature": 0.3})
+    assert key != CompletionCache.make_key("m", MESSAGES, {"temperature": 0.7})
+    assert key != CompletionCache.make_key("other", MESSAGES, {"temperature": 0.3})
+
+
+def test_sqlite_round_trip(tmp_path):
+    path = str(tmp_path / "llm.sqlite")
+    CompletionCache(max_entries=1, sqlite_path=path).put("key", "сохранённый ответ")
+    # Новый процесс (пустой LRU) читает ответ из файла
+    assert CompletionCache(max_entries=1, sqlite_path=path).get("key", "feedback") == "сохранённый ответ"
+    assert CompletionCache(max_entries=1, sqlite_path=path).get("other", "feedback") is None
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    """Свежий кэш и chat_complete, отдающий ответы по очереди"""
+    monkeypatch.setattr(llm_cache, "_cache", CompletionCache(max_entries=16))
+    monkeypatch.setattr(llm_cache.Config, "LLM_CACHE_AGENTS", {"feedback"})
+    replies = []
+    calls = []
+
+    def chat_complete(**request):
+        calls.append(request)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=replies.pop(0)))])
+
+    monkeypatch.setattr(llm_cache, "chat_complete", chat_complete)
+    return SimpleNamespace(replies=replies, calls=calls)
+
+
+def test_complete_caches_only_for_cache_agents(fake_llm):
+    fake_llm.replies.extend(["первый", "второй", "третий"])
+    assert complete("feedback", "m", MESSAGES) == "первый"
+    assert complete("feedback", "m", MESSAGES) == "первый"
+    assert len(fake_llm.calls) == 1
+
+    assert complete("interviewer", "m", MESSAGES) == "второй"
+    assert complete("interviewer", "m", MESSAGES) == "третий"
+    assert len(fake_llm.calls) == 3
+
+
+def test_use_cache_false_bypasses_and_refreshes_cache(fake_llm):
+    fake_llm.replies.extend(["старый", "новый"])
+    assert complete("feedback", "m", MESSAGES) == "старый"
+    assert complete("feedback", "m", MESSAGES, use_cache=False) == "новый"
+    assert len(fake_llm.calls) == 2
+    # Свежий ответ заменил закэшированный
+    assert complete("feedback", "m", MESSAGES) == "новый"
+    assert len(fake_llm.calls) == 2
+
+
+def test_rejected_response_is_not_cached(fake_llm):
+    def validate(content):
+        if not content.startswith("{"):
+            raise ValueError("не JSON")
+
+    fake_llm.replies.extend(["не JSON", '{"ok": true}'])
+    with pytest.raises(ValueError):
+        complete("feedback", "m", MESSAGES, validate=validate)
+    assert complete("feedback", "m", MESSAGES, validate=validate) == '{"ok": true}'
+    assert complete("feedback", "m", MESSAGES, validate=validate) == '{"ok": true}'
+    assert len(fake_llm.calls) == 2
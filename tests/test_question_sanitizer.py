@@ -0,0 +1,40 @@
+import json
+import os
+
+import pytest
+
+from question_sanitizer import StreamingQuestionCleaner, sanitize_question
+
+GOLDEN_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                           "benchmarks", "data", "question_sanitizer_golden.json")
+
+with open(GOLDEN_PATH, encoding='utf-8') as f:
+    GOLDEN = json.load(f)
+
+
+def stream_sanitize(text, chunk_size=3):
+    """Потоковая очистка фрагментами по chunk_size символов (как при генерации эталонов)"""
+    cleaner = StreamingQuestionCleaner()
+    for i in range(0, len(text), chunk_size):
+        cleaner.feed(text[i:i + chunk_size])
+        if cleaner.stopped:
+            break
+    cleaner.finish()
+    return cleaner.question
+
+
+@pytest.mark.parametrize("case", GOLDEN, ids=lambda case: case["input"][:40])
+def test_sanitize_question_matches_golden(case):
+    assert sanitize_question(case["input"]) == case["expected"]
+
+
+@pytest.mark.parametrize("case", GOLDEN, ids=lambda case: case["input"][:40])
+def test_streaming_cleaner_matches_golden(case):
+    assert stream_sanitize(case["input"]) == case["expected_stream"]
+
+
+def test_streaming_cleaner_returns_only_emitted_text():
+    cleaner = StreamingQuestionCleaner()
+    emitted = "".join(cleaner.feed(chunk) for chunk in ("Как работает ", "индекс в БД? ", "Почему это важно"))
+    emitted += cleaner.finish()
+    assert emitted == cleaner.question == "Как работает индекс в БД?"
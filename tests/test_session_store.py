@@ -0,0 +1,93 @@
+import json
+
+import pytest
+
+from session_store import JSONSessionStore, SQLiteSessionStore
+
+
+def make_session(name, position, start_time, grade=None, recommendation=None, turns=2):
+    session_data = {
+        "participant_name": name,
+        "position": position,
+        "start_time": start_time,
+        "turns": [{"turn_id": i, "agent_visible_message": f"вопрос {i}", "user_message": f"ответ {i}",
+                   "internal_thoughts": "", "timestamp": start_time} for i in range(1, turns + 1)],
+    }
+    if grade:
+        session_data["final_feedback"] = {"verdict": {"grade": grade, "recommendation": recommendation,
+                                                      "confidence_score": "80"}}
+    return session_data
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SQLiteSessionStore(str(tmp_path / "sessions.db"))
+
+
+def test_save_and_load_round_trip(store):
+    session_data = make_session("Анна", "QA Engineer", "2026-10-01T10:00:00", "Middle", "Hire")
+    session_id = store.save_session(session_data)
+
+    loaded = store.load_session(session_id)
+    assert loaded["session_id"] == session_id
+    assert loaded["participant_name"] == "Анна"
+    assert [turn["turn_id"] for turn in loaded["turns"]] == [1, 2]
+    assert loaded["final_feedback"] == session_data["final_feedback"]
+    assert store.load_session("нет такой") is None
+
+
+def test_save_again_replaces_session(store):
+    session_data = make_session("Анна", "QA Engineer", "2026-10-01T10:00:00", turns=3)
+    session_id = store.save_session(session_data)
+    session_data["turns"] = session_data["turns"][:1]
+    session_data["final_feedback"] = {"verdict": {"grade": "Junior", "recommendation": "No Hire"}}
+    assert store.save_session(session_data) == session_id
+
+    loaded = store.load_session(session_id)
+    assert len(loaded["turns"]) == 1
+    assert loaded["final_feedback"]["verdict"]["grade"] == "Junior"
+
+
+def test_find_sessions_filters(store):
+    store.save_sessions([
+        make_session("Анна", "QA Engineer", "2026-10-01T10:00:00", "Middle", "Hire"),
+        make_session("Борис", "QA Engineer", "2026-10-05T10:00:00", "Junior", "No Hire"),
+        make_session("Вера", "Backend Developer", "2026-10-07T10:00:00", "Senior", "Strong Hire"),
+        make_session("Глеб", "Backend Developer", "2026-10-09T10:00:00"),
+    ])
+
+    def names(**filters):
+        return [row["participant_name"] for row in store.find_sessions(**filters)]
+
+    # Новые сначала; сессия без фидбэка тоже находится
+    assert names() == ["Глеб", "Вера", "Борис", "Анна"]
+    assert names(position="qa engineer") == ["Борис", "Анна"]
+    assert names(recommendation="hire") == ["Анна"]
+    assert names(grade="Senior") == ["Вера"]
+    assert names(since="2026-10-05", until="2026-10-09") == ["Вера", "Борис"]
+    assert names(limit=1) == ["Глеб"]
+    assert store.find_sessions(grade="Middle")[0]["confidence_score"] == 80.0
+
+
+def test_import_json_files_skips_broken_logs(store, tmp_path):
+    logs = JSONSessionStore(str(tmp_path / "logs"))
+    good = [logs.save_session(make_session(f"Кандидат {i}", "QA Engineer", f"2026-10-0{i}T10:00:00"))
+            for i in range(1, 4)]
+    duplicate = make_session("Дубль", "QA Engineer", "2026-10-04T10:00:00")
+    duplicate["turns"][1]["turn_id"] = 1
+    missing = make_session("Без ID", "QA Engineer", "2026-10-05T10:00:00")
+    del missing["turns"][0]["turn_id"]
+    broken = [logs.save_session(duplicate), logs.save_session(missing)]
+    not_json = tmp_path / "logs" / "oborvan.json"
+    not_json.write_text('{"turns": [', encoding='utf-8')
+
+    paths = [good[0], broken[0], good[1], str(not_json), broken[1], good[2]]
+    assert store.import_json_files(paths, batch_size=4) == 3
+    assert sorted(row["participant_name"] for row in store.find_sessions()) == [
+        "Кандидат 1", "Кандидат 2", "Кандидат 3"]
+
+    # Повторный импорт не создаёт дубликатов
+    assert store.import_json_files(good) == 3
+    assert len(store.find_sessions()) == 3
+    with open(good[0], encoding='utf-8') as f:
+        assert store.load_session(json.load(f)["session_id"])["participant_name"] == "Кандидат 1"
@@ -0,0 +1,66 @@
+from config import Config
+from token_budget import count_tokens, pack_transcript, summarize
+
+SENTENCES = [
+    "Python использует GIL, поэтому потоки не ускоряют CPU-bound задачи.",
+    "Для параллельных вычислений лучше подходит multiprocessing или asyncio для I/O.",
+    "В CPython 3.12 появились отдельные интерпретаторы с собственным GIL.",
+    "Словари сохраняют порядок вставки начиная с версии 3.7.",
+    "Генераторы экономят память, потому что выдают элементы по одному.",
+]
+
+
+def _transcript(turns, repeat):
+    pairs = []
+    for i in range(turns):
+        answer = " ".join(SENTENCES * repeat) + f" Ход номер {i + 1}."
+        pairs.append({"question": f"Вопрос {i + 1} про Python и GIL?", "answer": answer})
+    return pairs
+
+
+def test_summarize_fits_limit_and_keeps_short_text():
+    text = " ".join(SENTENCES * 4)
+    short = summarize(text, 40, "GIL")
+    assert count_tokens(short) <= 40 + 2  # разделители « … » между предложениями
+    assert short.endswith("…")
+    assert summarize(SENTENCES[0], 100) == SENTENCES[0]
+
+
+def test_pack_transcript_stays_within_budget():
+    pairs = _transcript(30, 4)
+    assert sum(count_tokens(p["answer"]) for p in pairs) > Config.FEEDBACK_TOKEN_BUDGET
+
+    text, stats = pack_transcript(pairs)
+    assert stats["budget"] == Config.FEEDBACK_TOKEN_BUDGET
+    assert stats["tokens"] <= Config.FEEDBACK_TOKEN_BUDGET
+    assert count_tokens(text) <= Config.FEEDBACK_TOKEN_BUDGET
+    assert stats["turns"] == 30 and stats["compressed_turns"] > 0
+    # Ни один ход не выброшен
+    for i in range(30):
+        assert f"Вопрос {i + 1}:" in text
+
+
+def test_pack_transcript_keeps_recent_turns_verbatim():
+    pairs = _transcript(12, 3)
+    text, stats = pack_transcript(pairs)
+    assert stats["tokens"] <= Config.FEEDBACK_TOKEN_BUDGET
+
+    recent = pairs[-Config.FEEDBACK_RECENT_TURNS:]
+    for pair in recent:
+        assert pair["answer"] in text
+    assert stats["compressed_turns"] <= len(pairs) - Config.FEEDBACK_RECENT_TURNS
+    assert pairs[0]["answer"] not in text
+
+
+def test_pack_transcript_untouched_when_fits():
+    pairs = _transcript(2, 1)
+    text, stats = pack_transcript(pairs)
+    assert stats["compressed_turns"] == 0
+    assert all(pair["answer"] in text for pair in pairs)
+
+
+def test_pack_transcript_tight_budget_shares_equally():
+    pairs = _transcript(20, 2)
+    text, stats = pack_transcript(pairs, budget=800, recent_turns=2, summary_tokens=60)
+    assert count_tokens(text) == stats["tokens"] <= 800
+    assert stats["compressed_turns"] == 20
@@ -0,0 +1,147 @@
+"""Подсчёт токенов и упаковка транскрипта интервью в бюджет промпта.
+
+Токены считаются токенайзером Mistral (пакет mistral_common), без него —
+приближённо по словам. В промпт попадают все ходы: последние целиком,
+старые и малоинформативные ответы сжимаются до ключевых предложений.
+"""
+import re
+import threading
+
+from config import Config
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+_SENTENCE_RE = re.compile(r"(?<=[.!?…;])\s+|\n+")
+# Технические термины: латиница, версии, числа — то, что стоит сохранить при сжатии
+_TERM_RE = re.compile(r"[A-Za-z][A-Za-z0-9_+#.\-]*|\d+(?:[.,]\d+)?")
+_WORD_RE = re.compile(r"\w{4,}")
+_LOW_SIGNAL_RE = re.compile(r"не знаю|не помню|не уверен|затрудняюсь|без понятия|пропуст|сложно сказать",
+                            re.IGNORECASE)
+
+_tokenizer = None
+_tokenizer_lock = threading.Lock()
+_NO_TOKENIZER = object()
+
+
+def _get_tokenizer():
+    """Токенайзер Mistral грузится один раз; если пакета нет — работаем приближённо"""
+    global _tokenizer
+    if _tokenizer is None:
+        with _tokenizer_lock:
+            if _tokenizer is None:
+                try:
+                    from mistral_common.tokens.tokenizers.mistral import MistralTokenizer
+                    _tokenizer = MistralTokenizer.v7().instruct_tokenizer.tokenizer
+                except Exception:
+                    _tokenizer = _NO_TOKENIZER
+    return None if _tokenizer is _NO_TOKENIZER else _tokenizer
+
+
+def count_tokens(text):
+    """Число токенов текста"""
+    if not text:
+        return 0
+    tokenizer = _get_tokenizer()
+    if tokenizer is not None:
+        return len(tokenizer.encode(text, bos=False, eos=False))
+    # Приближение: кириллица и термины дробятся примерно по 3 символа на токен
+    return sum((len(token) + 2) // 3 for token in _TOKEN_RE.findall(text))
+
+
+def split_sentences(text):
+    return [s.strip() for s in _SENTENCE_RE.split(text or "") if s.strip()]
+
+
+def signal_density(question, answer):
+    """Информативность ответа: термины и пересечение с вопросом на токен"""
+    if not answer or _LOW_SIGNAL_RE.search(answer):
+        return 0.0
+    question_words = {w.lower() for w in _WORD_RE.findall(question or "")}
+    terms = len(_TERM_RE.findall(answer))
+    overlap = sum(1 for w in _WORD_RE.findall(answer) if w.lower() in question_words)
+    return (terms + overlap) / max(count_tokens(answer), 1)
+
+
+def summarize(text, max_tokens, query=""):
+    """Извлекающее сжатие: ключевые предложения в исходном порядке в пределах max_tokens"""
+    if count_tokens(text) <= max_tokens:
+        return text
+
+    query_words = {w.lower() for w in _WORD_RE.findall(query)}
+    sentences = split_sentences(text)
+    scored = []
+    for i, sentence in enumerate(sentences):
+        score = len(_TERM_RE.findall(sentence)) + sum(
+            1 for w in _WORD_RE.findall(sentence) if w.lower() in query_words)
+        # Первое предложение обычно содержит суть ответа
+        scored.append((score + (1 if i == 0 else 0), -i, i, sentence))
+
+    chosen, used = [], 0
+    for _, _, i, sentence in sorted(scored, reverse=True):
+        tokens = count_tokens(sentence)
+        if used + tokens <= max_tokens:
+            chosen.append(i)
+            used += tokens
+
+    if not chosen:
+        # Ни одно предложение не помещается — обрезаем лучшее по словам
+        best = max(scored)[3]
+        words = best.split()
+        while len(words) > 1 and count_tokens(" ".join(words)) > max_tokens - 1:
+            words = words[:max(1, len(words) * 3 // 4)]
+        return " ".join(words) + " …"
+
+    return " … ".join(sentences[i] for i in sorted(chosen)) + (" …" if len(chosen) < len(sentences) else "")
+
+
+def pack_transcript(qa_pairs, budget=None, recent_turns=None, summary_tokens=None):
+    """Форматирует все пары вопрос/ответ в пределах бюджета токенов.
+
+    Возвращает (текст, статистика). Сжатие идёт по шагам, пока транскрипт не уложится:
+    малоинформативные и старые ответы -> последние ответы -> равный лимит на все ходы.
+    """
+    budget = budget or Config.FEEDBACK_TOKEN_BUDGET
+    recent_turns = Config.FEEDBACK_RECENT_TURNS if recent_turns is None else recent_turns
+    summary_tokens = summary_tokens or Config.FEEDBACK_SUMMARY_TOKENS
+
+    if not qa_pairs:
+        return "Нет вопросов и ответов в логе.", {"turns": 0, "compressed_turns": 0, "tokens": 0, "budget": budget}
+
+    questions = [pair["question"] for pair in qa_pairs]
+    answers = [pair["answer"] for pair in qa_pairs]
+    originals = list(answers)
+
+    def render(i):
+        return f"Вопрос {i + 1}: {questions[i]}\nОтвет {i + 1}: {answers[i]}\n"
+
+    def assemble():
+        return "\n".join(render(i) for i in range(len(qa_pairs)))
+
+    def compress(i, limit):
+        answers[i] = summarize(originals[i], limit, questions[i])
+
+    # Токены по ходам не складываются точно (склейка и переводы строк),
+    # поэтому бюджет сверяется с собранным текстом
+    older = range(max(len(qa_pairs) - recent_turns, 0))
+    recent = range(max(len(qa_pairs) - recent_turns, 0), len(qa_pairs))
+    order = sorted(older, key=lambda i: (signal_density(questions[i], originals[i]), i)) + list(recent)
+
+    tokens = count_tokens(assemble())
+    for i in order:
+        if tokens <= budget:
+            break
+        compress(i, summary_tokens)
+        tokens = count_tokens(assemble())
+
+    share_budget = budget
+    while tokens > budget and share_budget > 16 * len(qa_pairs):
+        # Даже сжатые ответы не помещаются — делим бюджет поровну, вопросы тоже сокращаем
+        share = max(share_budget // len(qa_pairs), 16)
+        for i in range(len(qa_pairs)):
+            questions[i] = summarize(qa_pairs[i]["question"], share // 3)
+            compress(i, max(share - count_tokens(questions[i]) - 8, 4))
+        share_budget -= tokens - budget
+        tokens = count_tokens(assemble())
+
+    compressed = sum(1 for i in range(len(qa_pairs)) if answers[i] != originals[i])
+    return assemble(), {"turns": len(qa_pairs), "compressed_turns": compressed,
+                        "tokens": tokens, "budget": budget}
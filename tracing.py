@@ -0,0 +1,250 @@
+"""Трассировка: время, ожидание в очередях, токены и попадания в кэш по каждому действию.
+
+Спаны вложены через contextvars. Спаны внутри turn() собираются в разбивку
+хода для лога; все спаны попадают в агрегаты (p50/p95/p99 по имени), которые
+отдаются в формате Prometheus (GET /metrics в server.py или файл
+Config.TRACE_EXPORT_PATH). При Config.TRACING = False span() возвращает
+общий пустой объект — накладные расходы сводятся к одной проверке.
+"""
+import contextvars
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from config import Config
+
+_current_turn = contextvars.ContextVar("trace_turn", default=None)
+_current_span = contextvars.ContextVar("trace_span", default=None)
+
+# Числовые атрибуты, которые суммируются в агрегатах
+COUNTERS = ("prompt_tokens", "completion_tokens", "cache_hits", "cache_misses", "retries")
+
+
+class _NoopSpan:
+    """Заглушка при выключенной трассировке"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, key, value):
+        pass
+
+    def add(self, key, value):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class Span:
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+        self.parent = None
+        self.start = 0.0
+        self.duration = 0.0
+        self._tokens = None
+
+    def __enter__(self):
+        parent = _current_span.get()
+        self.parent = parent.name if parent else None
+        self._tokens = _current_span.set(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self.start
+        _current_span.reset(self._tokens)
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        _metrics.record(self)
+        turn = _current_turn.get()
+        if turn is not None:
+            turn.append(self)
+        return False
+
+    def set(self, key, value):
+        self.attrs[key] = value
+
+    def add(self, key, value):
+        self.attrs[key] = self.attrs.get(key, 0) + value
+
+    def to_dict(self):
+        entry = {"name": self.name, "ms": round(self.duration * 1000, 1)}
+        if self.parent:
+            entry["parent"] = self.parent
+        entry.update(self.attrs)
+        return entry
+
+
+def span(name, **attrs):
+    """Контекстный менеджер спана: with span("faiss.search", k=3) as s: ..."""
+    if not Config.TRACING:
+        return _NOOP
+    return Span(name, attrs)
+
+
+def current():
+    """Текущий спан (или заглушка) — чтобы дописать атрибуты из вложенного кода"""
+    return _current_span.get() or _NOOP
+
+
+class TurnTrace:
+    """Спаны одного хода интервью"""
+
+    def __init__(self):
+        self.spans = []
+        self.start = time.perf_counter()
+
+    def append(self, finished_span):
+        self.spans.append(finished_span)
+
+    def breakdown(self):
+        """Разбивка хода для лога: общее время и спаны в порядке завершения"""
+        return {
+            "total_ms": round((time.perf_counter() - self.start) * 1000, 1),
+            "spans": [s.to_dict() for s in list(self.spans)],
+        }
+
+
+@contextmanager
+def turn():
+    """Собирает спаны хода; при выключенной трассировке отдаёт None"""
+    if not Config.TRACING:
+        yield None
+        return
+    trace = TurnTrace()
+    token = _current_turn.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_turn.reset(token)
+
+
+def submit(executor, name, fn, *args):
+    """executor.submit, фиксирующий время ожидания задачи в очереди пула.
+
+    Потоки пула не наследуют контекст хода — фоновые задачи попадают только в агрегаты.
+    """
+    if not Config.TRACING:
+        return executor.submit(fn, *args)
+    queued_at = time.perf_counter()
+
+    def run():
+        with span(name, queue_ms=round((time.perf_counter() - queued_at) * 1000, 1)):
+            return fn(*args)
+
+    return executor.submit(run)
+
+
+def run_in_context(executor, fn, *args):
+    """executor.submit с текущим контекстом: спаны внутри fn остаются в текущем ходе"""
+    return executor.submit(contextvars.copy_context().run, fn, *args)
+
+
+class Metrics:
+    """Агрегаты по именам спанов: скользящее окно длительностей и суммы счётчиков"""
+
+    def __init__(self, window=None):
+        self.window = window or Config.TRACE_WINDOW
+        self._lock = threading.Lock()
+        self._durations = {}
+        self._totals = {}
+
+    def record(self, finished_span):
+        with self._lock:
+            durations = self._durations.get(finished_span.name)
+            if durations is None:
+                durations = self._durations[finished_span.name] = deque(maxlen=self.window)
+                self._totals[finished_span.name] = dict.fromkeys(("count", "sum", "errors") + COUNTERS, 0)
+            durations.append(finished_span.duration)
+            totals = self._totals[finished_span.name]
+            totals["count"] += 1
+            totals["sum"] += finished_span.duration
+            if "error" in finished_span.attrs:
+                totals["errors"] += 1
+            for key in COUNTERS:
+                value = finished_span.attrs.get(key)
+                if isinstance(value, (int, float)):
+                    totals[key] += value
+
+    def summary(self):
+        """{имя: {count, sum, p50, p95, p99 (секунды), счётчики}}"""
+        with self._lock:
+            snapshot = {name: (sorted(d), dict(self._totals[name])) for name, d in self._durations.items()}
+        result = {}
+        for name, (durations, totals) in snapshot.items():
+            for q in (0.5, 0.95, 0.99):
+                totals[f"p{int(q * 100)}"] = _quantile(durations, q)
+            result[name] = totals
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._durations.clear()
+            self._totals.clear()
+
+
+def _quantile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, max(0, math.ceil(q * len(sorted_values)) - 1))]
+
+
+_metrics = Metrics()
+
+
+def get_metrics():
+    return _metrics
+
+
+def prometheus_text():
+    """Агрегаты в текстовом формате Prometheus"""
+    lines = [
+        "# HELP interview_action_duration_seconds Время действий интервью (агенты, LLM, эмбеддинги, FAISS)",
+        "# TYPE interview_action_duration_seconds summary",
+    ]
+    summary = _metrics.summary()
+    for name, totals in sorted(summary.items()):
+        label = f'action="{name}"'
+        for q in ("0.5", "0.95", "0.99"):
+            lines.append(f'interview_action_duration_seconds{{{label},quantile="{q}"}} '
+                         f'{totals["p" + str(int(float(q) * 100))]:.6f}')
+        lines.append(f"interview_action_duration_seconds_sum{{{label}}} {totals['sum']:.6f}")
+        lines.append(f"interview_action_duration_seconds_count{{{label}}} {totals['count']}")
+
+    for metric, key, help_text in (
+        ("interview_action_errors_total", "errors", "Действия, завершившиеся исключением"),
+        ("interview_llm_prompt_tokens_total", "prompt_tokens", "Токены промптов LLM"),
+        ("interview_llm_completion_tokens_total", "completion_tokens", "Токены ответов LLM"),
+        ("interview_cache_hits_total", "cache_hits", "Попадания в кэши (LLM, RAG)"),
+        ("interview_cache_misses_total", "cache_misses", "Промахи кэшей (LLM, RAG)"),
+        ("interview_llm_retries_total", "retries", "Повторы запросов к LLM"),
+    ):
+        rows = [(name, totals[key]) for name, totals in sorted(summary.items()) if totals[key]]
+        if not rows:
+            continue
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} counter")
+        lines.extend(f'{metric}{{action="{name}"}} {value}' for name, value in rows)
+    return "\n".join(lines) + "\n"
+
+
+def export_metrics(path=None):
+    """Пишет агрегаты в файл (формат textfile collector node_exporter)"""
+    path = path or Config.TRACE_EXPORT_PATH
+    if not path or not Config.TRACING:
+        return None
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path + ".tmp", 'w', encoding='utf-8') as f:
+        f.write(prometheus_text())
+    os.replace(path + ".tmp", path)
+    return path